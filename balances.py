@@ -0,0 +1,90 @@
+"""Running balances for cashbook and bankbook, maintained by triggers.
+
+Every row carries `balance`, the book's balance after that row in
+(date, id) order, and book_balances holds each book's current total.
+Appends (the normal case) cost one indexed lookup; back-dated inserts,
+edits and deletes also shift the balance of the later rows. The column,
+book_balances and the triggers are created by migration 5.
+"""
+from typing import Dict
+
+import db
+
+BOOKS = ("cashbook", "bankbook")
+
+
+def _signed(row: str) -> str:
+    return f"(CASE {row}.type WHEN 'in' THEN {row}.amount WHEN 'out' THEN -{row}.amount ELSE 0 END)"
+
+
+def _add_total(book: str, delta: str) -> str:
+    return (
+        f"INSERT INTO book_balances (book, balance) VALUES ('{book}', {delta}) "
+        f"ON CONFLICT(book) DO UPDATE SET balance = balance + excluded.balance;"
+    )
+
+
+def _set_own(book: str) -> str:
+    """Set new row's balance from the row before it."""
+    return f"""
+        UPDATE {book} SET balance = COALESCE(
+            (SELECT p.balance FROM {book} p WHERE (p.date, p.id) < (new.date, new.id)
+              ORDER BY p.date DESC, p.id DESC LIMIT 1), 0) + {_signed('new')}
+         WHERE id = new.id;
+    """
+
+
+def _triggers(book: str) -> Dict[str, str]:
+    new, old = _signed("new"), _signed("old")
+    return {
+        f"{book}_balance_ai": f"""
+            CREATE TRIGGER IF NOT EXISTS {book}_balance_ai AFTER INSERT ON {book} BEGIN
+                UPDATE {book} SET balance = balance + {new} WHERE (date, id) > (new.date, new.id);
+                {_set_own(book)}
+                {_add_total(book, new)}
+            END
+        """,
+        f"{book}_balance_ad": f"""
+            CREATE TRIGGER IF NOT EXISTS {book}_balance_ad AFTER DELETE ON {book} BEGIN
+                UPDATE {book} SET balance = balance - {old} WHERE (date, id) > (old.date, old.id);
+                {_add_total(book, '-' + old)}
+            END
+        """,
+        f"{book}_balance_au": f"""
+            CREATE TRIGGER IF NOT EXISTS {book}_balance_au AFTER UPDATE OF date, type, amount ON {book} BEGIN
+                UPDATE {book} SET balance = balance - {old} WHERE (date, id) > (old.date, old.id) AND id <> new.id;
+                UPDATE {book} SET balance = balance + {new} WHERE (date, id) > (new.date, new.id) AND id <> new.id;
+                {_set_own(book)}
+                {_add_total(book, f'{new} - {old}')}
+            END
+        """,
+    }
+
+
+def rebuild_balances(cur, book: str) -> None:
+    """Recompute every row's balance and the book total in one pass."""
+    cur.execute("DROP TABLE IF EXISTS temp._running")
+    cur.execute(
+        f"CREATE TEMP TABLE _running AS SELECT id, "
+        f"SUM({_signed(book)}) OVER (ORDER BY date, id) AS running FROM {book}"
+    )
+    cur.execute("CREATE UNIQUE INDEX temp._running_id ON _running(id)")
+    cur.execute(f"UPDATE {book} SET balance = (SELECT running FROM temp._running r WHERE r.id = {book}.id)")
+    cur.execute("DROP TABLE temp._running")
+    cur.execute(
+        f"INSERT OR REPLACE INTO book_balances (book, balance) "
+        f"SELECT '{book}', COALESCE(SUM({_signed(book)}), 0) FROM {book}"
+    )
+
+
+def clear_book(cur, book: str) -> None:
+    """Delete every row of a book. The delete trigger is dropped for the
+    duration; it would otherwise shift all later rows once per deleted row."""
+    cur.execute(f"DROP TRIGGER IF EXISTS {book}_balance_ad")
+    cur.execute(f"DELETE FROM {book}")
+    cur.execute(_triggers(book)[f"{book}_balance_ad"])
+    cur.execute("INSERT OR REPLACE INTO book_balances (book, balance) VALUES (?, 0)", (book,))
+
+
+def balance(book: str) -> float:
+    return float(db.scalar("SELECT balance FROM book_balances WHERE book = ?", (book,), 0) or 0)
@@ -0,0 +1,324 @@
+"""Headless database benchmarks.
+
+    python bench.py profiles [--sales N] [--lines N]
+    python bench.py suite [--sizes small,medium] [--json out.json]
+                          [--baseline bench_baseline.json] [--update-baseline]
+
+`profiles` measures committed sales per second under each storage profile
+(db.STORAGE_PROFILES) on a scratch database, using the same statements a
+checkout issues. It never touches coop.db.
+
+`suite` times the code behind the hot screens. It calls the same loader
+functions the frames call:
+- scan lookup and typeahead;
+- checkout commit and return loading;
+- daily and monthly report, cash balances;
+- inventory valuation and investor shares.
+
+Each case runs against datasets from gen_dataset.py (cached in --data-dir)
+and reports p50/p95/p99 latency and throughput per dataset size. With
+--baseline it compares p95 against a stored run and exits 1 when a case got
+slower by more than --threshold (and by more than MIN_DELTA_MS).
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+import cart
+import db
+import gen_dataset
+import migrations
+import querylog
+import search
+from services import cash, catalog, checkout, returns
+from services import investors as investor_service
+
+
+def _scratch_db(path: str, profile: str, products: int = 500) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, isolation_level=None)
+    db.apply_profile(conn, profile)
+    cur = conn.cursor()
+    cur.execute("BEGIN")
+    for step in migrations.MIGRATIONS:
+        step(cur)
+    cur.executemany(
+        "INSERT INTO products (name, barcode, price, cost, stock) VALUES (?, ?, ?, ?, ?)",
+        [(f"Ürün {i}", f"869{i:010d}", 10.0 + i % 50, 5.0, 1_000_000) for i in range(products)],
+    )
+    conn.commit()
+    return conn
+
+
+def _one_sale(conn: sqlite3.Connection, n: int, lines: int, products: int) -> None:
+    basket = [checkout.CartLine((n * 7 + k * 13) % products + 1, 1.0, 12.5) for k in range(lines)]
+    cur = conn.cursor()
+    cur.execute("BEGIN IMMEDIATE")
+    # Same statements as checkout.complete_sale, on the scratch connection
+    sale_id = checkout._write(cur, basket, 1.0, checkout._now())
+    cash.post_cash(cur, "in", checkout.cart_total(basket), f"Satış #{sale_id}")
+    conn.commit()
+
+
+def bench_profiles(sales: int = 200, lines: int = 3, products: int = 500) -> List[Tuple[str, float]]:
+    """Return [(profile, commits_per_second)] for every storage profile."""
+    results = []
+    tmp = tempfile.mkdtemp(prefix="coop_bench_")
+    try:
+        for name in db.STORAGE_PROFILES:
+            path = os.path.join(tmp, f"{name}.db")
+            conn = _scratch_db(path, name, products)
+            try:
+                t0 = time.perf_counter()
+                for n in range(sales):
+                    _one_sale(conn, n, lines, products)
+                elapsed = time.perf_counter() - t0
+            finally:
+                conn.close()
+            results.append((name, sales / elapsed if elapsed > 0 else float("inf")))
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return results
+
+
+def format_profiles(results: List[Tuple[str, float]]) -> str:
+    return "\n".join(f"{name:<10} {cps:10.1f} commit/s" for name, cps in results)
+
+
+# gen_dataset.generate() arguments per dataset size
+SIZES: Dict[str, Dict[str, int]] = {
+    "small": {"products": 2_000, "sales": 20_000},
+    "medium": {"products": 10_000, "sales": 250_000},
+    "large": {"products": 20_000, "sales": 2_500_000},
+}
+SEED = 1
+WARMUP = 5
+# Sub-millisecond cases jitter; smaller p95 changes never count as regressions
+MIN_DELTA_MS = 0.2
+
+
+def _percentile(sorted_ms: List[float], p: float) -> float:
+    # Nearest rank
+    k = max(0, min(len(sorted_ms) - 1, int(round(p / 100.0 * len(sorted_ms) + 0.5)) - 1))
+    return sorted_ms[k]
+
+
+def _measure(fn: Callable[[], object], n: int) -> Dict[str, float]:
+    for _ in range(WARMUP):
+        fn()
+    times = []
+    t_all = time.perf_counter()
+    for _ in range(n):
+        t0 = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - t0) * 1000.0)
+    wall = time.perf_counter() - t_all
+    times.sort()
+    return {
+        "n": n,
+        "p50_ms": round(_percentile(times, 50), 4),
+        "p95_ms": round(_percentile(times, 95), 4),
+        "p99_ms": round(_percentile(times, 99), 4),
+        "mean_ms": round(sum(times) / n, 4),
+        "ops_per_s": round(n / wall, 1) if wall > 0 else 0.0,
+    }
+
+
+def _cases(rng: random.Random) -> Dict[str, Callable[[], object]]:
+    """name -> zero-argument callable; inputs are drawn from the open database."""
+    # UI modules import tkinter but need no display; the loaders are plain functions
+    import reports
+
+    barcodes = [r[0] for r in db.query("SELECT barcode FROM products WHERE barcode IS NOT NULL")]
+    pids = [r[0] for r in db.query("SELECT id FROM products")]
+    names = [r[0] for r in db.query("SELECT name FROM products LIMIT 500")]
+    prefixes = [n.split()[min(1, len(n.split()) - 1)][:rng.randint(3, 5)] for n in names]
+    first, last = db.query_one("SELECT MIN(day), MAX(day) FROM sales_daily")
+    span = max(0, (date.fromisoformat(last) - date.fromisoformat(first)).days) if first else 0
+    returned = [r[0] for r in db.query("SELECT original_sale_id FROM returns LIMIT 1000")] or [1]
+    max_sale = db.scalar("SELECT MAX(id) FROM sales", default=1)
+    prices = dict(db.query("SELECT id, price FROM products"))
+
+    def day() -> str:
+        return (date.fromisoformat(first) + timedelta(days=rng.randint(0, span))).isoformat() if first else date.today().isoformat()
+
+    def scan_lookup():
+        # The SQL behind catalog.by_barcode when the cache misses
+        return db.query_one(catalog._SELECT + " WHERE barcode = ?", (rng.choice(barcodes),))
+
+    def typeahead():
+        return search.search_products(rng.choice(prefixes), limit=10)
+
+    def checkout_commit():
+        # The till's path: the sale plus its cart's held_carts marker
+        lines = [checkout.CartLine(pid, 1.0, prices[pid]) for pid in rng.sample(pids, min(4, len(pids)))]
+        return cart.complete_sale(cart.TILL, "bench", cart.next_rev(), lines, time.strftime("%Y-%m-%d %H:%M:%S"))
+
+    def return_load_sale():
+        return returns.returnable_for_sale(rng.choice(returned) if rng.random() < 0.5 else rng.randint(1, max_sale))
+
+    def return_load_product():
+        return returns.returnable_for_product(rng.choice(pids))
+
+    def daily_report():
+        return reports._load_daily(day())
+
+    def monthly_report():
+        return reports._load_period("Aylık", day())
+
+    def cash_balances():
+        return reports._load_cash()
+
+    def inventory_valuation():
+        rows = reports._load_inventory()
+        return sum(float(r[5]) * float(r[3]) for r in rows), sum(float(r[6]) * float(r[3]) for r in rows)
+
+    def investor_shares():
+        _pool, rows = investor_service.load()
+        return [r.shop_share for r in rows]
+
+    return {
+        "scan_lookup": scan_lookup,
+        "typeahead": typeahead,
+        "return_load_sale": return_load_sale,
+        "return_load_product": return_load_product,
+        "daily_report": daily_report,
+        "monthly_report": monthly_report,
+        "cash_balances": cash_balances,
+        "inventory_valuation": inventory_valuation,
+        "investor_shares": investor_shares,
+        # Writes last; they run on a scratch copy of the dataset
+        "checkout_commit": checkout_commit,
+    }
+
+
+def dataset(size: str, data_dir: str) -> str:
+    """Path of the cached dataset for `size`, generating it on first use."""
+    os.makedirs(data_dir, exist_ok=True)
+    spec = SIZES[size]
+    path = os.path.join(data_dir, f"{size}_p{spec['products']}_s{spec['sales']}_seed{SEED}.db")
+    if not os.path.exists(path):
+        print(f"generating {path} ...", file=sys.stderr)
+        gen_dataset.generate(path + ".tmp", seed=SEED, **spec)
+        os.replace(path + ".tmp", path)
+    return path
+
+
+def run_suite(sizes: List[str], iterations: int = 200, data_dir: str = "bench_data",
+              profile: Optional[str] = None) -> Dict:
+    """Run every case against each size; returns the JSON-able result."""
+    results: Dict[str, Dict] = {}
+    tmp = tempfile.mkdtemp(prefix="coop_suite_")
+    try:
+        for size in sizes:
+            work = os.path.join(tmp, f"{size}.db")
+            shutil.copyfile(dataset(size, data_dir), work)
+            db.configure(path=work)
+            # Datasets cached by an older version lack the newer tables
+            migrations.migrate()
+            if profile:
+                db.set_storage_profile(profile)
+            try:
+                rng = random.Random(SEED)
+                results[size] = {name: _measure(fn, iterations) for name, fn in _cases(rng).items()}
+            finally:
+                db.close_all()
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return {
+        "meta": {
+            "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "iterations": iterations,
+            "profile": profile or db.DEFAULT_PROFILE,
+            "querylog": querylog.ENABLED,
+        },
+        "results": results,
+    }
+
+
+def format_suite(run: Dict) -> str:
+    lines = []
+    for size, cases in run["results"].items():
+        lines.append(f"[{size}]")
+        lines.append(f"  {'case':<22} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'ops/s':>10}")
+        for name, r in cases.items():
+            lines.append(f"  {name:<22} {r['p50_ms']:9.3f} {r['p95_ms']:9.3f} {r['p99_ms']:9.3f} {r['ops_per_s']:10.1f}")
+    return "\n".join(lines)
+
+
+def compare(run: Dict, baseline: Dict, threshold: float = 0.25,
+            min_delta_ms: float = MIN_DELTA_MS) -> Tuple[str, List[str]]:
+    """Compare p95 per (size, case). Returns (report, regressed case names)."""
+    lines, regressed = [], []
+    for size, cases in run["results"].items():
+        base = baseline.get("results", {}).get(size, {})
+        for name, r in cases.items():
+            b = base.get(name)
+            if not b or not b.get("p95_ms"):
+                lines.append(f"  {size}/{name:<22} {'new':>8}")
+                continue
+            ratio = r["p95_ms"] / b["p95_ms"]
+            flag = ""
+            if ratio > 1.0 + threshold and r["p95_ms"] - b["p95_ms"] > min_delta_ms:
+                flag = "  REGRESSION"
+                regressed.append(f"{size}/{name}")
+            lines.append(f"  {size}/{name:<22} {b['p95_ms']:9.3f} -> {r['p95_ms']:9.3f} ms  x{ratio:.2f}{flag}")
+    return "\n".join(lines), regressed
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("profiles", help="commits/sec per storage profile")
+    p.add_argument("--sales", type=int, default=200)
+    p.add_argument("--lines", type=int, default=3)
+    s = sub.add_parser("suite", help="latency of the canonical queries and write paths")
+    s.add_argument("--sizes", default="small,medium", help=f"comma list of {', '.join(SIZES)}")
+    s.add_argument("--iterations", type=int, default=200)
+    s.add_argument("--data-dir", default="bench_data")
+    s.add_argument("--profile", choices=list(db.STORAGE_PROFILES), default=None)
+    s.add_argument("--json", dest="json_out", default=None, help="write results to this file")
+    s.add_argument("--baseline", default=None, help="compare against this results file")
+    s.add_argument("--update-baseline", action="store_true", help="store this run as the baseline")
+    s.add_argument("--threshold", type=float, default=0.25, help="allowed p95 slowdown (0.25 = 25%%)")
+    args = ap.parse_args(argv)
+    if args.cmd == "profiles":
+        print(format_profiles(bench_profiles(args.sales, args.lines)))
+        return 0
+    sizes = [x.strip() for x in args.sizes.split(",") if x.strip()]
+    unknown = [x for x in sizes if x not in SIZES]
+    if unknown:
+        ap.error(f"unknown size: {', '.join(unknown)}")
+    run = run_suite(sizes, args.iterations, args.data_dir, args.profile)
+    print(format_suite(run))
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump(run, f, indent=2)
+    status = 0
+    if args.baseline and os.path.exists(args.baseline) and not args.update_baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            report, regressed = compare(run, json.load(f), args.threshold)
+        print("\np95 vs baseline:")
+        print(report)
+        if regressed:
+            print(f"\n{len(regressed)} regression(s): {', '.join(regressed)}")
+            status = 1
+    if args.update_baseline:
+        with open(args.baseline or "bench_baseline.json", "w", encoding="utf-8") as f:
+            json.dump(run, f, indent=2)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
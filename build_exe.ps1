@@ -239,6 +239,8 @@ function New-Exe {
     # Ensure all local scripts (modules) are included (hidden imports)
     try {
         $pyFiles = Get-ChildItem -File -Filter '*.py' -ErrorAction SilentlyContinue | Select-Object -ExpandProperty Name
+        # main.py opens its screens by module name (importlib), so list them explicitly
+        $optMods = $pyFiles | ForEach-Object { [IO.Path]::GetFileNameWithoutExtension($_) } | Where-Object { $_ -ne 'main' }
         foreach ($m in $optMods) {
             try {
                 $venvPy = Join-Path $VenvDir 'Scripts\python'
@@ -0,0 +1,348 @@
+"""In-memory sales carts; the sales screen's Treeview only displays them.
+
+Lines are keyed by product id, in the order first added. Prices are held
+as integer kuruş and quantities as integer thousandths, so line totals and
+the running cart total are exact and each change updates the total in
+O(1), with no re-parsing of formatted cells.
+
+A till can hold several named carts (CartBook): one is being rung up, the
+others are parked for customers who stepped aside. Every cart is kept in
+held_carts, keyed by till, so a restart or a crash loses none of them:
+CartJournal writes them behind the UI, batched on its own thread.
+"""
+import json
+import os
+import socket
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import db
+from services import checkout
+from services.checkout import CartLine
+
+# This terminal's name in held_carts; set COOP_TILL when two tills share a host
+TILL = os.environ.get("COOP_TILL") or socket.gethostname() or "kasa"
+
+# How long the journal gathers changes before writing them in one commit
+JOURNAL_DELAY_S = 0.2
+
+# Quantity resolution: grams for kg items, whole pieces otherwise
+_QTY_SCALE = 1000
+_PRICE_SCALE = 100
+
+
+class CartItem(NamedTuple):
+    product_id: int
+    name: str
+    barcode: str
+    price_kurus: int
+    qty_milli: int
+
+    @property
+    def price(self) -> float:
+        return self.price_kurus / _PRICE_SCALE
+
+    @property
+    def quantity(self) -> float:
+        return self.qty_milli / _QTY_SCALE
+
+    @property
+    def amount(self) -> int:
+        """Line total in kuruş x thousandths (exact)."""
+        return self.price_kurus * self.qty_milli
+
+    @property
+    def total(self) -> float:
+        return self.amount / (_PRICE_SCALE * _QTY_SCALE)
+
+
+def _qty(quantity: float) -> int:
+    return int(round(float(quantity) * _QTY_SCALE))
+
+
+class Cart:
+    def __init__(self) -> None:
+        self._items: Dict[int, CartItem] = {}
+        self._amount = 0
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __iter__(self) -> Iterator[CartItem]:
+        return iter(list(self._items.values()))
+
+    def __contains__(self, product_id) -> bool:
+        return int(product_id) in self._items
+
+    def get(self, product_id) -> Optional[CartItem]:
+        return self._items.get(int(product_id))
+
+    @property
+    def total(self) -> float:
+        return self._amount / (_PRICE_SCALE * _QTY_SCALE)
+
+    def _put(self, item: Optional[CartItem], product_id: int) -> Optional[CartItem]:
+        old = self._items.get(product_id)
+        if old is not None:
+            self._amount -= old.amount
+        if item is None or item.qty_milli <= 0:
+            self._items.pop(product_id, None)
+            return None
+        self._items[product_id] = item
+        self._amount += item.amount
+        return item
+
+    def add(self, product_id: int, name: str, barcode: Optional[str], price: float, quantity: float) -> CartItem:
+        """Add quantity of a product, merging into its line if present.
+        The line keeps the price it was first added at."""
+        pid = int(product_id)
+        old = self._items.get(pid)
+        if old is not None:
+            return self._put(old._replace(qty_milli=old.qty_milli + _qty(quantity)), pid)
+        item = CartItem(pid, name or "", barcode or "", int(round(float(price) * _PRICE_SCALE)), _qty(quantity))
+        return self._put(item, pid)
+
+    def set_quantity(self, product_id: int, quantity: float) -> Optional[CartItem]:
+        """New quantity for a line; zero or less removes it (returns None)."""
+        pid = int(product_id)
+        old = self._items.get(pid)
+        if old is None:
+            return None
+        return self._put(old._replace(qty_milli=_qty(quantity)), pid)
+
+    def remove(self, product_id: int) -> None:
+        self._put(None, int(product_id))
+
+    def clear(self) -> None:
+        self._items.clear()
+        self._amount = 0
+
+    def subtract(self, lines: Iterable[CartLine]) -> List[int]:
+        """Take sold lines out (what was scanned meanwhile stays); returns
+        the product ids whose lines changed."""
+        changed = []
+        for l in lines:
+            old = self._items.get(int(l.product_id))
+            if old is None:
+                continue
+            self._put(old._replace(qty_milli=old.qty_milli - _qty(l.quantity)), old.product_id)
+            changed.append(old.product_id)
+        return changed
+
+    def lines(self) -> List[CartLine]:
+        """(product_id, quantity, price) lines for services.checkout."""
+        return [CartLine(i.product_id, i.quantity, i.price) for i in self._items.values()]
+
+    def snapshot(self) -> List[CartItem]:
+        # One C-level copy; items are immutable, so the list is safe to
+        # hand to another thread
+        return list(self._items.values())
+
+    def without(self, lines: Iterable[CartLine]) -> "Cart":
+        """A copy with the given lines taken out (the cart minus a sale)."""
+        rest = Cart.from_snapshot(self._items.values())
+        rest.subtract(lines)
+        return rest
+
+    @classmethod
+    def from_snapshot(cls, items: Iterable) -> "Cart":
+        cart = cls()
+        for pid, name, barcode, price_kurus, qty_milli in items:
+            cart._put(CartItem(int(pid), name, barcode, int(price_kurus), int(qty_milli)), int(pid))
+        return cart
+
+
+class CartBook:
+    """A till's carts by name, in the order opened; `active` is on screen."""
+
+    def __init__(self) -> None:
+        self.carts: Dict[str, Cart] = {}
+        self.active = self.open()
+
+    @property
+    def cart(self) -> Cart:
+        return self.carts[self.active]
+
+    def new_name(self, taken: Iterable[str] = ()) -> str:
+        taken = set(taken)
+        n = 1
+        while f"Müşteri {n}" in self.carts or f"Müşteri {n}" in taken:
+            n += 1
+        return f"Müşteri {n}"
+
+    def open(self, name: Optional[str] = None, cart: Optional[Cart] = None) -> str:
+        """Add a cart (empty unless given); returns its name."""
+        name = (name or "").strip() or self.new_name()
+        if name in self.carts:
+            raise ValueError("Bu isimde bir sepet zaten var.")
+        self.carts[name] = cart if cart is not None else Cart()
+        return name
+
+    def switch(self, name: str) -> Optional[str]:
+        """Make `name` active. The cart left behind is dropped if empty;
+        returns its name if it was kept (parked)."""
+        if name not in self.carts:
+            raise ValueError(f"unknown cart: {name}")
+        prev = self.active
+        self.active = name
+        if prev == name:
+            return None
+        if not len(self.carts[prev]):
+            del self.carts[prev]
+            return None
+        return prev
+
+    def rename(self, old: str, new: str) -> None:
+        new = (new or "").strip()
+        if not new:
+            raise ValueError("Sepet adı boş olamaz.")
+        if new != old and new in self.carts:
+            raise ValueError("Bu isimde bir sepet zaten var.")
+        self.carts = {(new if k == old else k): v for k, v in self.carts.items()}
+        if self.active == old:
+            self.active = new
+
+    def parked(self) -> List[str]:
+        return [n for n in self.carts if n != self.active]
+
+
+_rev_lock = threading.Lock()
+_last_rev = 0
+
+
+def next_rev() -> int:
+    """Increasing revision for a cart snapshot (nanoseconds, so it keeps
+    growing across restarts)."""
+    global _last_rev
+    with _rev_lock:
+        _last_rev = max(_last_rev + 1, time.time_ns())
+        return _last_rev
+
+
+def load_held(till: str = TILL) -> List[Tuple[str, Cart, bool]]:
+    """This till's non-empty carts, oldest first, with the one that was
+    active flagged."""
+    rows = db.query(
+        "SELECT name, items, active FROM held_carts WHERE till = ? AND items != '[]' ORDER BY parked_at, name",
+        (till,),
+    )
+    return [(name, Cart.from_snapshot(json.loads(items)), bool(active)) for name, items, active in rows]
+
+
+def write_carts(till: str, carts: Dict[str, Tuple[int, List[tuple]]], active: Optional[str] = None,
+                prune_before: Optional[int] = None) -> None:
+    """Store (rev, snapshot) per cart name in one transaction. An empty
+    snapshot stays as a marker so an older write can't bring the lines
+    back; writes older than the stored rev are ignored. Markers older than
+    prune_before can no longer be overtaken and are deleted."""
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    with db.transaction() as cur:
+        cur.executemany(
+            "INSERT INTO held_carts (till, name, items, parked_at, rev) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (till, name) DO UPDATE SET items = excluded.items, rev = excluded.rev "
+            "WHERE excluded.rev > held_carts.rev",
+            [(till, n, json.dumps(items, ensure_ascii=False), now, rev) for n, (rev, items) in carts.items()],
+        )
+        if active is not None:
+            cur.execute("UPDATE held_carts SET active = (name = ?) WHERE till = ?", (active, till))
+        if prune_before is not None:
+            cur.execute("DELETE FROM held_carts WHERE till = ? AND items = '[]' AND rev < ?", (till, prune_before))
+
+
+def complete_sale(till: str, name: str, rev: int, lines: List[CartLine], date: str) -> int:
+    """Record a sale and mark its cart empty in the same transaction, so a
+    crash can't leave a sold cart to be restored and rung up twice. While
+    the sale is in flight the journal leaves its lines out of the cart
+    (see Cart.without), so a newer journal write can't bring them back."""
+    with db.transaction("IMMEDIATE"):
+        sale_id = checkout.complete_sale(lines, date)
+        write_carts(till, {name: (rev, [])})
+    return sale_id
+
+
+class CartJournal:
+    """Write-behind persistence of a till's carts.
+
+    record() is called on the Tk thread after every cart change; it only
+    swaps a snapshot into a dict, so a scan never waits on the disk. The
+    journal thread wakes on the first change, lets JOURNAL_DELAY_S worth
+    of further changes pile up, keeps only the newest snapshot per cart
+    and writes them in one transaction.
+    """
+
+    def __init__(self, till: str = TILL, delay: float = JOURNAL_DELAY_S) -> None:
+        self.till = till
+        self.delay = delay
+        self._pending: Dict[str, Tuple[int, List[tuple]]] = {}
+        self._active: Optional[str] = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="cart-journal", daemon=True)
+        self._thread.start()
+
+    def record(self, name: str, cart: Cart, active: Optional[str] = None) -> int:
+        """Queue the cart's current lines; returns the snapshot's rev."""
+        rev = next_rev()
+        with self._lock:
+            self._pending[name] = (rev, cart.snapshot())
+            if active is not None:
+                self._active = active
+        self._wake.set()
+        return rev
+
+    def forget(self, name: str) -> None:
+        """The cart is gone (renamed, or dropped while empty)."""
+        rev = next_rev()
+        with self._lock:
+            self._pending[name] = (rev, [])
+        self._wake.set()
+
+    def _take(self):
+        with self._lock:
+            pending, active = self._pending, self._active
+            self._pending, self._active = {}, None
+            # Every change recorded before this point is in `pending` or
+            # already written, so older markers have done their job
+            cutoff = next_rev()
+        return pending, active, cutoff
+
+    def _put_back(self, pending, active) -> None:
+        # Keep what failed to write unless a newer snapshot came meanwhile
+        with self._lock:
+            for name, entry in pending.items():
+                if name not in self._pending or self._pending[name][0] < entry[0]:
+                    self._pending[name] = entry
+            if self._active is None:
+                self._active = active
+
+    def _run(self) -> None:
+        try:
+            while True:
+                self._wake.wait()
+                if not self._closed:
+                    time.sleep(self.delay)
+                self._wake.clear()
+                pending, active, cutoff = self._take()
+                if pending or active is not None:
+                    try:
+                        write_carts(self.till, pending, active, prune_before=cutoff)
+                    except Exception:
+                        self._put_back(pending, active)
+                        if not self._closed:
+                            time.sleep(1.0)
+                            self._wake.set()
+                if self._closed:
+                    return
+        finally:
+            db.close()
+
+    def close(self, timeout: float = 2.0) -> None:
+        """Write what is still queued and stop the thread."""
+        if self._closed:
+            return
+        self._closed = True
+        self._wake.set()
+        self._thread.join(timeout)
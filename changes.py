@@ -0,0 +1,198 @@
+"""Table-level change notifications for the UI.
+
+Every watched table has a counter in `data_versions`, bumped by triggers
+on insert, update and delete, so any writer (this process, the DB worker
+or another copy of the app on the same file) publishes its changes just
+by committing. The Tk thread polls `PRAGMA data_version`, which only moves
+when another connection commits, plus its own connection's total_changes;
+the counters are read only when one of those moved, so an idle poll costs
+one PRAGMA. data_versions and its triggers are created by migration 6.
+
+Frames watch the tables they display and refresh only when one of them
+changed:
+
+    self._watch = changes.watch(self, ("products",), on_change=self.pager.reload)
+    ...
+    def on_show(self, **kwargs):
+        if self._watch.consume():
+            self.refresh()
+
+on_change runs while the frame is on screen; otherwise the watch stays
+dirty until the next consume().
+"""
+import sqlite3
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+import db
+
+POLL_MS = 500
+
+TABLES = (
+    "users", "user_permissions", "products", "ledger", "sales", "sale_items", "returns",
+    "cashbook", "bankbook", "investors", "investor_transactions", "settings",
+)
+
+
+class Watch:
+    """A frame's subscription. `dirty` is set when a watched table changes."""
+
+    def __init__(self, bus: Optional["ChangeBus"], tables: Iterable[str],
+                 on_change: Optional[Callable[[], None]] = None,
+                 visible: Optional[Callable[[], bool]] = None, widget=None) -> None:
+        self.bus = bus
+        self.tables = frozenset(tables)
+        self.on_change = on_change
+        self.visible = visible
+        self.widget = widget
+        self.dirty = True
+
+    def consume(self) -> bool:
+        """True if a watched table changed since the last consume() (always
+        True without a bus); clears the flag. Call when (re)loading."""
+        if self.bus is None:
+            return True
+        self.bus.check(skip=self)
+        was, self.dirty = self.dirty, False
+        return was
+
+    def close(self) -> None:
+        if self.bus is not None:
+            self.bus.unwatch(self)
+
+
+class ChangeBus:
+    def __init__(self, root=None, poll_ms: int = POLL_MS) -> None:
+        self.root = root
+        self.poll_ms = poll_ms
+        self._watches: List[Watch] = []
+        self._versions: Dict[str, int] = {}
+        self._marker = None
+        self._published: Set[str] = set()
+        self._lock = threading.Lock()
+        self._checking = False
+        self._after_id = None
+        if root is not None:
+            self._after_id = root.after(self.poll_ms, self._poll)
+
+    def watch(self, tables: Iterable[str], on_change: Optional[Callable[[], None]] = None,
+              visible: Optional[Callable[[], bool]] = None, widget=None) -> Watch:
+        w = Watch(self, tables, on_change, visible, widget)
+        self._watches.append(w)
+        return w
+
+    def unwatch(self, w: Watch) -> None:
+        try:
+            self._watches.remove(w)
+        except ValueError:
+            pass
+
+    def publish(self, *tables: str) -> None:
+        """Report a change the triggers cannot see (e.g. the DB file was
+        replaced). Safe from any thread; delivered on the next check."""
+        with self._lock:
+            self._published.update(tables or TABLES)
+
+    def _read_changes(self) -> Set[str]:
+        conn = db.get_conn()
+        try:
+            dv = conn.execute("PRAGMA data_version").fetchone()[0]
+            marker = (id(conn), dv, conn.total_changes)
+            if marker == self._marker:
+                return set()
+            versions = dict(conn.execute("SELECT tbl, version FROM data_versions").fetchall())
+        except sqlite3.Error:
+            # Not migrated yet
+            return set()
+        self._marker = marker
+        changed = {t for t in set(versions) | set(self._versions) if versions.get(t) != self._versions.get(t)}
+        first = not self._versions
+        self._versions = versions
+        # The first read only sets the baseline; new watches start dirty anyway
+        return set() if first else changed
+
+    def check(self, skip: Optional[Watch] = None) -> Set[str]:
+        """Pick up changes now and notify watches (Tk thread only). Returns
+        the changed tables."""
+        if self._checking:
+            return set()
+        self._checking = True
+        try:
+            changed = self._read_changes()
+            with self._lock:
+                changed |= self._published
+                self._published.clear()
+            if changed:
+                self._notify(changed, skip)
+            return changed
+        finally:
+            self._checking = False
+
+    def _notify(self, changed: Set[str], skip: Optional[Watch]) -> None:
+        for w in list(self._watches):
+            if w.widget is not None:
+                try:
+                    if not w.widget.winfo_exists():
+                        self.unwatch(w)
+                        continue
+                except Exception:
+                    self.unwatch(w)
+                    continue
+            if not (w.tables & changed):
+                continue
+            w.dirty = True
+            if w is skip or w.on_change is None:
+                continue
+            try:
+                shown = w.visible() if w.visible is not None else True
+            except Exception:
+                shown = False
+            if shown:
+                w.dirty = False
+                try:
+                    w.on_change()
+                except Exception:
+                    pass
+
+    def _poll(self) -> None:
+        try:
+            self.check()
+        except Exception:
+            pass
+        if self.root is not None and self._after_id is not None:
+            try:
+                self._after_id = self.root.after(self.poll_ms, self._poll)
+            except Exception:
+                self._after_id = None
+
+    def stop(self) -> None:
+        if self._after_id is not None and self.root is not None:
+            try:
+                self.root.after_cancel(self._after_id)
+            except Exception:
+                pass
+        self._after_id = None
+
+
+def watch(frame, tables: Iterable[str], on_change: Optional[Callable[[], None]] = None) -> Watch:
+    """Subscribe a frame through frame.controller.change_bus. on_change runs
+    only while the frame is the one on screen. Without a bus the watch is
+    always dirty, so frames keep refreshing on every show."""
+    ctrl = getattr(frame, "controller", None)
+    bus = getattr(ctrl, "change_bus", None)
+
+    def visible() -> bool:
+        return getattr(ctrl, "current_frame_class", None) is type(frame)
+
+    return Watch(None, tables) if bus is None else bus.watch(tables, on_change, visible, frame)
+
+
+def notify(frame, *tables: str) -> None:
+    """Deliver changes now instead of at the next poll (e.g. right after a
+    bulk delete), publishing `tables` on top of what the triggers saw."""
+    bus = getattr(getattr(frame, "controller", None), "change_bus", None)
+    if bus is None:
+        return
+    if tables:
+        bus.publish(*tables)
+    bus.check()
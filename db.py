@@ -0,0 +1,300 @@
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+
+import querylog
+
+DB_NAME = "coop.db"
+
+# Number of prepared statements kept per connection. The frames issue the
+# same handful of lookups over and over (scan, typeahead, refresh), so a
+# generous cache avoids re-preparing them on every keystroke.
+STATEMENT_CACHE_SIZE = 256
+
+# PRAGMAs applied to every new connection, in order.
+PRAGMAS: Dict[str, Any] = {
+    "busy_timeout": 5000,
+    "temp_store": "MEMORY",
+}
+
+# Storage profiles, applied per connection after PRAGMAS. journal_mode is
+# persistent in the file; the rest are per-connection.
+#   durable:  rollback journal, fsync on every commit (SQLite defaults)
+#   balanced: WAL, fsync at checkpoints only; a power cut can lose the last
+#             few commits but never corrupts the file
+#   fast:     WAL without fsync; for bulk loads and benchmarks
+STORAGE_PROFILES: Dict[str, Dict[str, Any]] = {
+    "durable": {
+        "journal_mode": "DELETE",
+        "synchronous": "FULL",
+        "cache_size": -2000,
+        "mmap_size": 0,
+        "temp_store": "DEFAULT",
+    },
+    "balanced": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -16000,
+        "mmap_size": 64 * 1024 * 1024,
+        "temp_store": "MEMORY",
+    },
+    "fast": {
+        "journal_mode": "WAL",
+        "synchronous": "OFF",
+        "cache_size": -64000,
+        "mmap_size": 256 * 1024 * 1024,
+        "temp_store": "MEMORY",
+    },
+}
+DEFAULT_PROFILE = "durable"
+PROFILE_SETTING = "db_storage_profile"
+
+# Statements issued from here are attributed to our caller
+querylog.skip_file(__file__)
+
+_local = threading.local()
+_lock = threading.RLock()
+_path = DB_NAME
+# Bumped by close_all() and set_storage_profile(); thread-local connections
+# from an older generation are reopened on next use (e.g. after the DB file
+# was reset), or after the open transaction when only the profile changed.
+_generation = 0
+# Last generation whose connections close_all() closed under their owners
+_closed_generation = 0
+_open: List[sqlite3.Connection] = []
+_profile: Optional[str] = None
+
+
+def configure(path: Optional[str] = None, pragmas: Optional[Dict[str, Any]] = None) -> None:
+    """Change the database path and/or PRAGMAs. Open connections are closed
+    so the next call to get_conn() picks up the new settings."""
+    global _path
+    with _lock:
+        if path is not None:
+            _path = path
+        if pragmas:
+            PRAGMAS.update(pragmas)
+    close_all()
+
+
+def db_path() -> str:
+    return _path
+
+
+def _apply_pragmas(conn: sqlite3.Connection) -> None:
+    for name, value in PRAGMAS.items():
+        try:
+            conn.execute(f"PRAGMA {name}={value}")
+        except sqlite3.Error:
+            pass
+
+
+def apply_profile(conn: sqlite3.Connection, name: str) -> None:
+    """Apply a STORAGE_PROFILES entry to an open connection."""
+    for pragma, value in STORAGE_PROFILES.get(name, STORAGE_PROFILES[DEFAULT_PROFILE]).items():
+        try:
+            # journal_mode returns a row; fetch it so the change takes effect
+            conn.execute(f"PRAGMA {pragma}={value}").fetchall()
+        except sqlite3.Error:
+            # e.g. leaving WAL while another connection is open
+            pass
+
+
+def _stored_profile(conn: sqlite3.Connection) -> str:
+    global _profile
+    if _profile is not None:
+        return _profile
+    try:
+        row = conn.execute("SELECT value FROM settings WHERE key=?", (PROFILE_SETTING,)).fetchone()
+    except sqlite3.Error:
+        # settings table not created yet (fresh file before migrate())
+        row = None
+    if row and row[0] in STORAGE_PROFILES:
+        _profile = row[0]
+        return _profile
+    return DEFAULT_PROFILE
+
+
+def storage_profile() -> str:
+    return _stored_profile(get_conn())
+
+
+def set_storage_profile(name: str) -> None:
+    """Persist the profile and reopen connections so it takes effect."""
+    global _profile, _generation
+    if name not in STORAGE_PROFILES:
+        raise ValueError(f"unknown storage profile: {name}")
+    set_setting(PROFILE_SETTING, name)
+    with _lock:
+        _profile = name
+        # Threads reopen lazily on their next get_conn() outside a transaction
+        _generation += 1
+    get_conn()
+
+
+def _open_conn() -> sqlite3.Connection:
+    # isolation_level=None: autocommit unless inside transaction(); reads
+    # never leave an implicit transaction (and its shared lock) open.
+    # check_same_thread=False only so close_all() can close connections
+    # owned by other threads; each connection is still used by one thread.
+    # querylog.Connection times and tags every statement (see querylog.py).
+    conn = sqlite3.connect(
+        _path,
+        isolation_level=None,
+        cached_statements=STATEMENT_CACHE_SIZE,
+        check_same_thread=False,
+        factory=querylog.Connection,
+    )
+    _apply_pragmas(conn)
+    apply_profile(conn, _stored_profile(conn))
+    return conn
+
+
+def get_conn() -> sqlite3.Connection:
+    """Return this thread's long-lived connection, opening it on first use."""
+    conn = getattr(_local, "conn", None)
+    if conn is not None and getattr(_local, "generation", -1) == _generation:
+        return conn
+    if getattr(_local, "depth", 0) > 0:
+        if conn is not None and getattr(_local, "generation", -1) >= _closed_generation:
+            # Only the profile changed: finish the transaction on this
+            # connection and reopen after it
+            return conn
+        # A new connection would silently detach the rest of the block
+        # from its open transaction; fail it instead (it rolls back)
+        raise sqlite3.ProgrammingError("database connection was closed during a transaction")
+    if conn is not None:
+        close()
+    conn = _open_conn()
+    with _lock:
+        _open.append(conn)
+    _local.conn = conn
+    _local.generation = _generation
+    _local.depth = 0
+    return conn
+
+
+def close() -> None:
+    """Close the calling thread's connection (if any)."""
+    conn = getattr(_local, "conn", None)
+    _local.conn = None
+    if conn is None:
+        return
+    with _lock:
+        try:
+            _open.remove(conn)
+        except ValueError:
+            pass
+    try:
+        conn.close()
+    except sqlite3.Error:
+        pass
+
+
+def close_all() -> None:
+    """Close every connection opened through this module. Needed before the
+    database file is replaced or deleted (backup restore, reset)."""
+    global _generation, _closed_generation, _profile
+    with _lock:
+        _generation += 1
+        _closed_generation = _generation
+        _profile = None
+        conns = list(_open)
+        _open.clear()
+    for conn in conns:
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+    _local.conn = None
+
+
+@contextmanager
+def transaction(mode: str = "DEFERRED") -> Iterator[sqlite3.Cursor]:
+    """Run a block in a transaction and yield a cursor.
+
+    Commits on success and rolls back on any exception. Nested use maps to
+    SAVEPOINTs, so helpers can open their own transaction and still be
+    composed into a caller's larger one.
+    """
+    conn = get_conn()
+    depth = getattr(_local, "depth", 0)
+    cur = conn.cursor()
+    if depth == 0:
+        cur.execute(f"BEGIN {mode}")
+    else:
+        cur.execute(f"SAVEPOINT sp_{depth}")
+    _local.depth = depth + 1
+    try:
+        yield cur
+    except BaseException:
+        _local.depth = depth
+        try:
+            if depth == 0:
+                conn.rollback()
+            else:
+                cur.execute(f"ROLLBACK TO sp_{depth}")
+                cur.execute(f"RELEASE sp_{depth}")
+        except sqlite3.ProgrammingError:
+            # Closed under us by close_all(); nothing left to roll back
+            pass
+        raise
+    else:
+        _local.depth = depth
+        if depth == 0:
+            conn.commit()
+        else:
+            cur.execute(f"RELEASE sp_{depth}")
+
+
+def backup_to(dst_path: str) -> None:
+    """Online copy via the SQLite backup API. Unlike a file copy this is
+    consistent while other connections write and includes WAL content."""
+    dst = sqlite3.connect(dst_path)
+    try:
+        get_conn().backup(dst)
+    finally:
+        dst.close()
+
+
+def in_transaction() -> bool:
+    return getattr(_local, "depth", 0) > 0
+
+
+def execute(sql: str, params: Sequence[Any] = ()) -> sqlite3.Cursor:
+    return get_conn().execute(sql, params)
+
+
+def executemany(sql: str, seq: Iterable[Sequence[Any]]) -> sqlite3.Cursor:
+    return get_conn().executemany(sql, seq)
+
+
+def query(sql: str, params: Sequence[Any] = ()) -> List[tuple]:
+    return get_conn().execute(sql, params).fetchall()
+
+
+def query_one(sql: str, params: Sequence[Any] = ()) -> Optional[tuple]:
+    return get_conn().execute(sql, params).fetchone()
+
+
+def scalar(sql: str, params: Sequence[Any] = (), default: Any = None) -> Any:
+    row = get_conn().execute(sql, params).fetchone()
+    if row is None or row[0] is None:
+        return default
+    return row[0]
+
+
+def get_setting(key: str, default: str = "") -> str:
+    try:
+        row = query_one("SELECT value FROM settings WHERE key=?", (key,))
+    except sqlite3.Error:
+        return default
+    return row[0] if row and row[0] is not None else default
+
+
+def set_setting(key: str, value: str) -> None:
+    execute(
+        "INSERT INTO settings(key, value) VALUES(?, ?) ON CONFLICT(key) DO UPDATE SET value=excluded.value",
+        (key, value),
+    )
@@ -0,0 +1,270 @@
+"""Synthetic coop.db generator for load tests.
+
+    python gen_dataset.py data/big.db --products 20000 --sales 2500000 --seed 7
+
+Builds a database with the same schema migrate() creates (all migrations,
+indexes and triggers) and fills it with:
+- products with skewed popularity;
+- sales with realistic basket sizes, plus returns linked through
+  `returns`;
+- the ledger/cashbook postings checkout makes for each sale and return;
+- daily bank deposits, monthly expenses;
+- investors with transactions.
+
+The same arguments always give the same data. Rows go in through chunked
+executemany with journaling off, triggers and secondary indexes dropped.
+Afterwards the indexes and triggers are recreated and the derived tables
+(sales_daily, running balances, products_fts) rebuilt in one pass each.
+About 2.5M sales come out at roughly 10M sale_items.
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+
+import balances
+import migrations
+import rollup
+import search
+
+CHUNK = 50_000
+
+_ITEMS = [
+    ("Süt", "1 L"), ("Ayran", "1 L"), ("Yoğurt", "1 kg"), ("Beyaz Peynir", "500 g"), ("Kaşar", "400 g"),
+    ("Ekmek", "adet"), ("Simit", "adet"), ("Çay", "1 kg"), ("Şeker", "1 kg"), ("Un", "2 kg"),
+    ("Pirinç", "1 kg"), ("Makarna", "500 g"), ("Mercimek", "1 kg"), ("Zeytinyağı", "1 L"), ("Ayçiçek Yağı", "2 L"),
+    ("Domates Salçası", "830 g"), ("Yumurta", "10'lu"), ("Bisküvi", "adet"), ("Çikolata", "80 g"), ("Gofret", "adet"),
+    ("Su", "0,5 L"), ("Meyve Suyu", "1 L"), ("Kola", "1 L"), ("Deterjan", "4 kg"), ("Sabun", "4'lü"),
+    ("Şampuan", "500 ml"), ("Defter", "adet"), ("Kalem", "adet"), ("Silgi", "adet"), ("Pil", "4'lü"),
+]
+_BRANDS = ["Pınar", "Sütaş", "Ülker", "Eti", "Torku", "Tat", "Tamek", "Bizim", "Doğadan", "Çaykur", "Öncü", "Şölen"]
+_BULK = [("Domates", "kg"), ("Patates", "kg"), ("Soğan", "kg"), ("Elma", "kg"), ("Muz", "kg"), ("Peynir (açık)", "kg")]
+_EXPENSES = [
+    ("Kira", "Emlak A.Ş.", 8000.0), ("Elektrik", "Enerjisa", 1500.0), ("Su", "İSKİ", 400.0),
+    ("Toptan alım", "Metro Gross", 25000.0), ("Toptan alım", "Bizim Toptan", 18000.0),
+]
+_NAMES = ["Ahmet", "Ayşe", "Mehmet", "Fatma", "Mustafa", "Emine", "Ali", "Hatice", "Hüseyin", "Zeynep", "İbrahim", "Elif"]
+_SURNAMES = ["Yılmaz", "Kaya", "Demir", "Şahin", "Çelik", "Yıldız", "Öztürk", "Aydın", "Özdemir", "Arslan"]
+# Items per basket: mostly small, a long tail of weekly shops (mean ~4)
+_BASKET = list(range(1, 16))
+_BASKET_CUM = [sum([22, 18, 14, 11, 8, 6, 5, 4, 3, 3, 2, 1.5, 1, 1, 0.5][:i + 1]) for i in range(15)]
+
+
+def _fast_pragmas(conn: sqlite3.Connection) -> None:
+    for p in ("journal_mode=OFF", "synchronous=OFF", "locking_mode=EXCLUSIVE",
+              "cache_size=-262144", "temp_store=MEMORY"):
+        conn.execute(f"PRAGMA {p}").fetchall()
+
+
+def _products(rng: random.Random, n: int) -> List[tuple]:
+    rows = []
+    for pid in range(1, n + 1):
+        if rng.random() < 0.08:
+            name, unit = rng.choice(_BULK)
+            price = round(rng.uniform(15, 120), 2)
+        else:
+            item, size = rng.choice(_ITEMS)
+            name, unit = f"{rng.choice(_BRANDS)} {item} {size}", "adet"
+            price = round(rng.lognormvariate(3.3, 0.8) + 1.0, 2)
+        cost = round(price * rng.uniform(0.6, 0.85), 2)
+        rows.append((pid, f"{name} #{pid}", f"869{pid:010d}", price, cost, float(rng.randint(50, 500)), unit))
+    return rows
+
+
+def _day_counts(rng: random.Random, days: List[date], sales: int) -> List[int]:
+    # Busier weekends and month starts (paydays)
+    w = [(1.4 if d.weekday() >= 5 else 1.0) * (1.2 if d.day <= 3 else 1.0) * rng.uniform(0.8, 1.2) for d in days]
+    total = sum(w)
+    counts = [int(sales * x / total) for x in w]
+    for i in range(sales - sum(counts)):
+        counts[i % len(counts)] += 1
+    return counts
+
+
+class _Writer:
+    """Buffers rows per table and flushes them with executemany."""
+
+    SQL = {
+        "sales": "INSERT INTO sales (id, date, total) VALUES (?, ?, ?)",
+        "sale_items": "INSERT INTO sale_items (sale_id, product_id, quantity, price) VALUES (?, ?, ?, ?)",
+        "returns": "INSERT INTO returns (original_sale_id, return_sale_id, date) VALUES (?, ?, ?)",
+        "ledger": "INSERT INTO ledger (date, type, amount, description, invoice_no, company) VALUES (?, ?, ?, ?, ?, ?)",
+        "cashbook": "INSERT INTO cashbook (date, type, amount, description) VALUES (?, ?, ?, ?)",
+        "bankbook": "INSERT INTO bankbook (date, type, amount, description) VALUES (?, ?, ?, ?)",
+    }
+
+    def __init__(self, cur) -> None:
+        self.cur = cur
+        self.buf: Dict[str, list] = {t: [] for t in self.SQL}
+        self.counts: Dict[str, int] = {t: 0 for t in self.SQL}
+
+    def add(self, table: str, row: tuple) -> None:
+        b = self.buf[table]
+        b.append(row)
+        if len(b) >= CHUNK:
+            self.flush(table)
+
+    def flush(self, table: Optional[str] = None) -> None:
+        for t in ([table] if table else list(self.buf)):
+            if self.buf[t]:
+                self.cur.executemany(self.SQL[t], self.buf[t])
+                self.counts[t] += len(self.buf[t])
+                self.buf[t] = []
+
+
+def _sale(w: _Writer, sale_id: int, when: str, lines: List[tuple], sign: float) -> float:
+    total = round(sum(q * p for _pid, q, p in lines), 2)
+    w.add("sales", (sale_id, when, sign * total))
+    for pid, q, p in lines:
+        w.add("sale_items", (sale_id, pid, sign * q, p))
+    # The postings cash.post_cash makes (ledger is dated by day)
+    text = f"{'Satış' if sign > 0 else 'İade'} #{sale_id}"
+    w.add("ledger", (when[:10], "gelir" if sign > 0 else "gider", total, text, None, None))
+    w.add("cashbook", (when, "in" if sign > 0 else "out", total, text))
+    return sign * total
+
+
+def generate(path: str, products: int = 5000, sales: int = 100_000, seed: int = 1,
+             days: int = 730, end: Optional[str] = None, return_rate: float = 0.02,
+             investors: int = 12) -> Dict[str, int]:
+    """Create `path` (must not exist) and return the row count per table."""
+    if os.path.exists(path):
+        raise FileExistsError(path)
+    rng = random.Random(seed)
+    last = date.fromisoformat(end) if end else date(2025, 12, 31)
+    calendar = [last - timedelta(days=days - 1 - i) for i in range(days)]
+
+    conn = sqlite3.connect(path, isolation_level=None)
+    _fast_pragmas(conn)
+    cur = conn.cursor()
+    cur.execute("BEGIN")
+    for step in migrations.MIGRATIONS:
+        step(cur)
+    cur.execute(f"PRAGMA user_version = {migrations.latest_version()}")
+    # Load without triggers and secondary indexes; both come back below
+    triggers = cur.execute("SELECT name, sql FROM sqlite_master WHERE type = 'trigger'").fetchall()
+    for name, _sql in triggers:
+        cur.execute(f"DROP TRIGGER {name}")
+    for name, _table, _cols in migrations.INDEXES:
+        cur.execute(f"DROP INDEX IF EXISTS {name}")
+
+    prows = _products(rng, products)
+    cur.executemany("INSERT INTO products (id, name, barcode, price, cost, stock, unit) VALUES (?, ?, ?, ?, ?, ?, ?)", prows)
+    # Popularity follows a Zipf-like curve over a shuffled product order
+    order = [r[0] for r in prows]
+    rng.shuffle(order)
+    cum, acc = [], 0.0
+    for rank in range(1, len(order) + 1):
+        acc += 1.0 / rank ** 0.9
+        cum.append(acc)
+    price = {r[0]: r[3] for r in prows}
+    by_kg = {r[0] for r in prows if r[6] == "kg"}
+
+    w = _Writer(cur)
+    sale_id = 0
+    pending: Dict[int, list] = {}  # day index -> [(original id, lines)]
+    for di, (day, n) in enumerate(zip(calendar, _day_counts(rng, calendar, sales))):
+        ds = day.isoformat()
+        cash = 0.0
+        due = pending.pop(di, [])
+        slots = n + len(due)
+        for k in range(slots):
+            sec = 9 * 3600 + (k * 43200) // max(1, slots)
+            when = f"{ds} {sec // 3600:02d}:{sec // 60 % 60:02d}:{sec % 60:02d}"
+            sale_id += 1
+            if k < n:
+                picked = dict.fromkeys(rng.choices(order, cum_weights=cum, k=rng.choices(_BASKET, cum_weights=_BASKET_CUM)[0]))
+                lines = [
+                    (pid, round(rng.uniform(0.3, 2.5), 3) if pid in by_kg else float(rng.choice((1, 1, 1, 1, 2, 2, 3))), price[pid])
+                    for pid in picked
+                ]
+                cash += _sale(w, sale_id, when, lines, 1.0)
+                if rng.random() < return_rate and di + 1 < days:
+                    back = min(days - 1, di + rng.randint(1, 14))
+                    pending.setdefault(back, []).append((sale_id, lines))
+            else:
+                orig, lines = due[k - n]
+                lines = rng.sample(lines, rng.randint(1, len(lines)))
+                cash += _sale(w, sale_id, when, lines, -1.0)
+                w.add("returns", (orig, sale_id, when))
+        # Evening deposit of most of the till
+        if cash > 0:
+            dep = round(cash * 0.7, 2)
+            w.add("cashbook", (f"{ds} 21:30:00", "out", dep, "Bankaya yatırılan"))
+            w.add("bankbook", (f"{ds} 21:30:00", "in", dep, "Kasadan yatırılan"))
+        if day.day == 1:
+            for desc, company, base in _EXPENSES:
+                amt = round(base * rng.uniform(0.8, 1.3), 2)
+                inv = f"F{day:%Y%m}-{rng.randint(1000, 9999)}"
+                w.add("ledger", (ds, "gider", amt, desc, inv, company))
+                w.add("bankbook", (f"{ds} 10:00:00", "out", amt, f"{company} {inv}"))
+    w.flush()
+
+    # Investors and their contributions/withdrawals
+    inv_rows, tx_rows = [], []
+    for i in range(1, investors + 1):
+        start = calendar[rng.randrange(0, max(1, days // 4))]
+        inv_rows.append((i, f"{rng.choice(_NAMES)} {rng.choice(_SURNAMES)}", f"05{rng.randint(300000000, 599999999)}",
+                         float(rng.randrange(5_000, 100_000, 500)), start.isoformat(), None))
+        for day in calendar:
+            if day > start and day.day == 15 and rng.random() < 0.15:
+                typ = "contribution" if rng.random() < 0.7 else "withdrawal"
+                tx_rows.append((i, day.isoformat(), typ, float(rng.randrange(500, 20_000, 250)), None))
+    cur.executemany("INSERT INTO investors (id, name, phone, initial_capital, initial_date, notes) VALUES (?, ?, ?, ?, ?, ?)", inv_rows)
+    cur.executemany("INSERT INTO investor_transactions (investor_id, date, type, amount, notes) VALUES (?, ?, ?, ?, ?)", tx_rows)
+    cur.executemany("INSERT OR IGNORE INTO users (username, password, role) VALUES (?, ?, ?)",
+                    [("kasiyer", "1234", "kasiyer"), ("muhasebe", "1234", "muhasebe")])
+
+    migrations.ensure_indexes(cur)
+    rollup.rebuild_rollup(cur)
+    for book in balances.BOOKS:
+        balances.rebuild_balances(cur, book)
+    if search.fts_supported() and cur.execute("SELECT 1 FROM sqlite_master WHERE name = 'products_fts'").fetchone():
+        search.rebuild_fts(cur)
+    for _name, sql in triggers:
+        cur.execute(sql)
+    cur.execute("COMMIT")
+    cur.execute("ANALYZE")
+    counts = {t: cur.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0]
+              for t in ("products", "sales", "sale_items", "returns", "ledger", "cashbook", "bankbook",
+                        "investors", "investor_transactions")}
+    # Leave the file in the app's default (rollback journal) mode
+    conn.execute("PRAGMA locking_mode=NORMAL")
+    conn.execute("PRAGMA journal_mode=DELETE").fetchall()
+    conn.close()
+    return counts
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("path", help="database file to create")
+    ap.add_argument("--products", type=int, default=5000)
+    ap.add_argument("--sales", type=int, default=100_000)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--days", type=int, default=730, help="days of history")
+    ap.add_argument("--end", default=None, help="last day, YYYY-MM-DD (default 2025-12-31)")
+    ap.add_argument("--return-rate", type=float, default=0.02)
+    ap.add_argument("--investors", type=int, default=12)
+    ap.add_argument("--force", action="store_true", help="overwrite an existing file")
+    args = ap.parse_args(argv)
+    if args.force and os.path.exists(args.path):
+        os.remove(args.path)
+    t0 = time.perf_counter()
+    try:
+        counts = generate(args.path, args.products, args.sales, args.seed, args.days, args.end,
+                          args.return_rate, args.investors)
+    except FileExistsError:
+        print(f"{args.path} already exists (use --force)", file=sys.stderr)
+        return 1
+    for table, n in counts.items():
+        print(f"{table:<22} {n:>12,}")
+    print(f"{time.perf_counter() - t0:.1f} s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,4 @@
-﻿import sqlite3
-import tkinter as tk
+﻿import tkinter as tk
 from tkinter import messagebox
 from tkinter import ttk
 from datetime import date
@@ -7,9 +6,18 @@ try:
     from tkcalendar import DateEntry as _DateEntry  # type: ignore
 except Exception:
     _DateEntry = None  # type: ignore
-from ui import make_back_arrow
+from ui import make_back_arrow, sync_tree
+import changes
+import db
+import worker
+from services import investors as investor_service
 
-DB_NAME = "coop.db"
+
+def _load_investors():
+    """Pool percent, investors with their shares, and today's date.
+    Runs on the DB worker thread."""
+    pool_percent, rows = investor_service.load()
+    return pool_percent, rows, db.scalar("SELECT date('now')")
 
 
 class InvestorsFrame(tk.Frame):
@@ -160,6 +168,7 @@ class InvestorsFrame(tk.Frame):
             self.tx_tree.column(c, width=w, anchor=anc)
         self.tx_tree.pack(fill="both", expand=True, padx=20, pady=(0, 10))
 
+        self._watch = changes.watch(self, ("investors", "investor_transactions"), on_change=self.refresh)
         self.refresh()
 
     def on_show(self, **kwargs) -> None:
@@ -178,7 +187,8 @@ class InvestorsFrame(tk.Frame):
                 self.tx_tree.delete(iid)
         except Exception:
             pass
-        self.refresh()
+        if self._watch.consume():
+            self.refresh()
         self.refresh_style()
 
     def refresh_style(self):
@@ -252,17 +262,8 @@ class InvestorsFrame(tk.Frame):
         except Exception:
             pass
         # Load notes for selected id
-        row = None
-        try:
-            conn = sqlite3.connect(DB_NAME)
-            cur = conn.cursor()
-            cur.execute("SELECT COALESCE(notes,'') FROM investors WHERE id = ?", (int(_id),))
-            row = cur.fetchone()
-        finally:
-            conn.close()
-        if row:
-            self.entry_notes.delete(0, tk.END)
-            self.entry_notes.insert(0, row[0])
+        self.entry_notes.delete(0, tk.END)
+        self.entry_notes.insert(0, investor_service.notes(int(_id)))
         self.refresh_transactions(int(_id))
 
     # Navigation
@@ -275,68 +276,24 @@ class InvestorsFrame(tk.Frame):
 
     # CRUD
     def refresh(self) -> None:
-        for row in self.tree.get_children():
-            self.tree.delete(row)
-        conn = sqlite3.connect(DB_NAME)
-        cur = conn.cursor()
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS investors (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                phone TEXT,
-                initial_capital REAL NOT NULL DEFAULT 0,
-                initial_date TEXT NOT NULL DEFAULT (date('now')),
-                notes TEXT
-            )
-            """
-        )
-        # Ensure transactions and settings tables
-        cur.execute(
-            "CREATE TABLE IF NOT EXISTS investor_transactions (id INTEGER PRIMARY KEY AUTOINCREMENT, investor_id INTEGER NOT NULL, date TEXT NOT NULL DEFAULT (date('now')), type TEXT NOT NULL CHECK(type IN ('contribution','withdrawal')), amount REAL NOT NULL, notes TEXT, FOREIGN KEY(investor_id) REFERENCES investors(id) ON DELETE CASCADE)"
-        )
-        cur.execute("CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT)")
-        cur.execute("INSERT OR IGNORE INTO settings(key, value) VALUES('investor_pool_percent','20')")
-
-        # Load pool percent
-        cur.execute("SELECT value FROM settings WHERE key='investor_pool_percent'")
-        pool_val = cur.fetchone()
-        pool_percent = float(pool_val[0]) if pool_val and pool_val[0] else 0.0
+        self._watch.consume()
+        # Placeholder only on first load; later refreshes diff in place
+        if not self.tree.get_children():
+            self.tree.insert("", "end", values=("", "Yükleniyor..."))
+        worker.call(self, _load_investors, on_done=self._render, key="investors.refresh")
+
+    def _render(self, data) -> None:
+        pool_percent, rows, today = data
         self.entry_pool.delete(0, tk.END)
         self.entry_pool.insert(0, f"{pool_percent:g}")
 
-        # Compute current capital and shares
-        cur.execute(
-            """
-            SELECT i.id, i.name, COALESCE(i.phone,''), i.initial_capital,
-                   COALESCE(i.initial_date,''),
-                   COALESCE((SELECT SUM(CASE WHEN t.type='contribution' THEN t.amount WHEN t.type='withdrawal' THEN -t.amount ELSE 0 END)
-                            FROM investor_transactions t WHERE t.investor_id = i.id), 0)
-            FROM investors i
-            ORDER BY i.id
-            """
-        )
-        rows = cur.fetchall()
-        totals_current = []
-        for _iid, _name, _phone, init_cap, _date, tx_sum in rows:
-            totals_current.append(float(init_cap) + float(tx_sum))
-        total_current_cap = sum(totals_current) if totals_current else 0.0
-
-        # Fill tree with computed fields
-        for idx, (iid, name, phone, init_cap, d, tx_sum) in enumerate(rows):
-            current_cap = float(init_cap) + float(tx_sum)
-            pool_share = (current_cap / total_current_cap * 100.0) if total_current_cap > 0 else 0.0
-            shop_share = pool_share * (pool_percent / 100.0)
-            self.tree.insert(
-                "",
-                "end",
-                values=(iid, name, phone, f"{float(init_cap):.2f}", f"{current_cap:.2f}", f"{pool_share:.2f}", f"{shop_share:.2f}", d),
-            )
+        # Share math lives in services/investors.py
+        def values(r) -> tuple:
+            return (r.id, r.name, r.phone, f"{r.initial_capital:.2f}", f"{r.current_capital:.2f}",
+                    f"{r.pool_share:.2f}", f"{r.shop_share:.2f}", r.initial_date)
+        sync_tree(self.tree, rows, key=lambda r: f"inv{r.id}", values=values)
 
         # Default date to today if empty and tx default date
-        cur.execute("SELECT date('now')")
-        today = cur.fetchone()[0]
-        conn.close()
         try:
             if isinstance(self.entry_date, tk.Entry) and not self.entry_date.get().strip():
                 self.entry_date.insert(0, today)
@@ -347,32 +304,21 @@ class InvestorsFrame(tk.Frame):
         # Update pool info label
         self.lbl_pool_info.config(text=f"Toplam havuz: {pool_percent:.2f}%, DÃ¼kkan kalan: {100.0 - pool_percent:.2f}%")
 
+    def _form(self) -> dict:
+        return dict(
+            name=self.entry_name.get().strip(),
+            phone=self.entry_phone.get().strip() or None,
+            initial_capital=self._parse_amount(self.entry_capital.get().strip() or "0"),
+            initial_date=self.entry_date.get().strip() or None,
+            notes=self.entry_notes.get().strip() or None,
+        )
+
     def add_investor(self) -> None:
-        name = self.entry_name.get().strip()
-        phone = self.entry_phone.get().strip() or None
-        notes = self.entry_notes.get().strip() or None
-        date = self.entry_date.get().strip() or None
-        cap = self._parse_amount(self.entry_capital.get().strip() or "0")
-        if not name:
-            messagebox.showwarning("Eksik bilgi", "Ä°sim gerekli.")
-            return
-        if cap != cap or cap < 0:
-            messagebox.showwarning("GeÃ§ersiz tutar", "GeÃ§ersiz baÅŸlangÄ±Ã§ sermayesi.")
+        try:
+            investor_service.add_investor(**self._form())
+        except ValueError as e:
+            messagebox.showwarning("Geçersiz bilgi", str(e))
             return
-        conn = sqlite3.connect(DB_NAME)
-        cur = conn.cursor()
-        if date:
-            cur.execute(
-                "INSERT INTO investors (name, phone, initial_capital, initial_date, notes) VALUES (?, ?, ?, ?, ?)",
-                (name, phone, cap, date, notes),
-            )
-        else:
-            cur.execute(
-                "INSERT INTO investors (name, phone, initial_capital, notes) VALUES (?, ?, ?, ?)",
-                (name, phone, cap, notes),
-            )
-        conn.commit()
-        conn.close()
         self.entry_name.delete(0, tk.END)
         self.entry_phone.delete(0, tk.END)
         self.entry_capital.delete(0, tk.END)
@@ -384,28 +330,11 @@ class InvestorsFrame(tk.Frame):
         if iid is None:
             messagebox.showinfo("SeÃ§im yok", "GÃ¼ncellenecek yatÄ±rÄ±mcÄ±yÄ± seÃ§in.")
             return
-        name = self.entry_name.get().strip()
-        phone = self.entry_phone.get().strip() or None
-        notes = self.entry_notes.get().strip() or None
-        date = self.entry_date.get().strip() or None
-        cap = self._parse_amount(self.entry_capital.get().strip() or "0")
-        if not name:
-            messagebox.showwarning("Eksik bilgi", "Ä°sim gerekli.")
-            return
-        if cap != cap or cap < 0:
-            messagebox.showwarning("GeÃ§ersiz tutar", "GeÃ§ersiz baÅŸlangÄ±Ã§ sermayesi.")
+        try:
+            investor_service.update_investor(iid, **self._form())
+        except ValueError as e:
+            messagebox.showwarning("Geçersiz bilgi", str(e))
             return
-        conn = sqlite3.connect(DB_NAME)
-        cur = conn.cursor()
-        if not date:
-            cur.execute("SELECT date('now')")
-            date = cur.fetchone()[0]
-        cur.execute(
-            "UPDATE investors SET name = ?, phone = ?, initial_capital = ?, initial_date = ?, notes = ? WHERE id = ?",
-            (name, phone, cap, date, notes, iid),
-        )
-        conn.commit()
-        conn.close()
         self.refresh()
 
     def delete_investor(self) -> None:
@@ -415,11 +344,7 @@ class InvestorsFrame(tk.Frame):
             return
         if not messagebox.askyesno("Onay", "SeÃ§ili yatÄ±rÄ±mcÄ±yÄ± silmek istiyor musunuz?"):
             return
-        conn = sqlite3.connect(DB_NAME)
-        cur = conn.cursor()
-        cur.execute("DELETE FROM investors WHERE id = ?", (iid,))
-        conn.commit()
-        conn.close()
+        investor_service.delete_investor(iid)
         self.refresh()
 
     # Transactions
@@ -431,46 +356,23 @@ class InvestorsFrame(tk.Frame):
         return int(vals[0])
 
     def refresh_transactions(self, investor_id: int) -> None:
-        for iid in self.tx_tree.get_children():
-            self.tx_tree.delete(iid)
-        conn = sqlite3.connect(DB_NAME)
-        cur = conn.cursor()
-        cur.execute(
-            "SELECT id, COALESCE(date,''), type, amount, COALESCE(notes,'') FROM investor_transactions WHERE investor_id = ? ORDER BY date DESC, id DESC",
-            (investor_id,),
-        )
-        for tid, d, typ, amt, notes in cur.fetchall():
-            self.tx_tree.insert("", "end", values=(tid, d, typ, f"{float(amt):.2f}", notes))
-        conn.close()
+        rows = investor_service.transactions(investor_id)
+        sync_tree(self.tx_tree, rows, key=lambda r: f"tx{r[0]}",
+                  values=lambda r: (r[0], r[1], r[2], f"{float(r[3]):.2f}", r[4]))
 
     def add_tx(self, typ: str) -> None:
         iid = self._selected_investor_id()
         if iid is None:
             messagebox.showinfo("SeÃ§im yok", "Ä°ÅŸlem iÃ§in yatÄ±rÄ±mcÄ± seÃ§in.")
             return
-        date = self.tx_date.get().strip() or None
         try:
-            amt = float(self.tx_amount.get().replace(",", "."))
-        except Exception:
-            amt = float("nan")
-        if amt != amt or amt <= 0:
-            messagebox.showwarning("GeÃ§ersiz tutar", "Pozitif bir tutar girin.")
-            return
-        notes = self.tx_notes.get().strip() or None
-        conn = sqlite3.connect(DB_NAME)
-        cur = conn.cursor()
-        if date:
-            cur.execute(
-                "INSERT INTO investor_transactions (investor_id, date, type, amount, notes) VALUES (?, ?, ?, ?, ?)",
-                (iid, date, typ, amt, notes),
-            )
-        else:
-            cur.execute(
-                "INSERT INTO investor_transactions (investor_id, type, amount, notes) VALUES (?, ?, ?, ?)",
-                (iid, typ, amt, notes),
+            investor_service.add_transaction(
+                iid, typ, self._parse_amount(self.tx_amount.get()),
+                date=self.tx_date.get().strip() or None, notes=self.tx_notes.get().strip() or None,
             )
-        conn.commit()
-        conn.close()
+        except ValueError as e:
+            messagebox.showwarning("GeÃ§ersiz tutar", str(e))
+            return
         self.tx_amount.delete(0, tk.END)
         self.tx_notes.delete(0, tk.END)
         self.refresh()
@@ -484,11 +386,7 @@ class InvestorsFrame(tk.Frame):
         tid = int(self.tx_tree.item(sel[0], "values")[0])
         if not messagebox.askyesno("Onay", "SeÃ§ili iÅŸlemi silmek istiyor musunuz?"):
             return
-        conn = sqlite3.connect(DB_NAME)
-        cur = conn.cursor()
-        cur.execute("DELETE FROM investor_transactions WHERE id = ?", (tid,))
-        conn.commit()
-        conn.close()
+        investor_service.delete_transaction(tid)
         iid = self._selected_investor_id()
         self.refresh()
         if iid is not None:
@@ -496,17 +394,10 @@ class InvestorsFrame(tk.Frame):
 
     def save_pool_percent(self) -> None:
         try:
-            val = float(self.entry_pool.get().replace(",", "."))
-        except Exception:
-            val = float("nan")
-        if val != val or val < 0 or val > 100:
-            messagebox.showwarning("GeÃ§ersiz deÄŸer", "Havuz % 0 ile 100 arasÄ± olmalÄ±dÄ±r.")
+            investor_service.set_pool_percent(self._parse_amount(self.entry_pool.get()))
+        except ValueError as e:
+            messagebox.showwarning("GeÃ§ersiz deÄŸer", str(e))
             return
-        conn = sqlite3.connect(DB_NAME)
-        cur = conn.cursor()
-        cur.execute("INSERT INTO settings(key, value) VALUES('investor_pool_percent', ?) ON CONFLICT(key) DO UPDATE SET value=excluded.value", (f"{val}",))
-        conn.commit()
-        conn.close()
         self.refresh()
 
 
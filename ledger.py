@@ -1,17 +1,18 @@
-import sqlite3
 import tkinter as tk
 from tkinter import messagebox
 from tkinter import ttk
 from ui import make_back_arrow
 from datetime import date
+import changes
+import db
+from pagedtree import Keyset, PagedTree
+from services import ledger as ledger_service
 
 try:
     from tkcalendar import DateEntry as _DateEntry  # type: ignore
 except Exception:
     _DateEntry = None  # type: ignore
 
-DB_NAME = "coop.db"
-
 
 class LedgerFrame(tk.Frame):
     def __init__(self, parent: tk.Misc, controller) -> None:
@@ -90,6 +91,13 @@ class LedgerFrame(tk.Frame):
         self.btn_update.pack(side="left", padx=8)
         self.btn_delete = ttk.Button(btns, text="Sil", command=self.delete_entry)
         self.btn_delete.pack(side="left")
+        # Jump the list to a date (older rows load on scroll)
+        self.btn_jump = ttk.Button(btns, text="Git", command=self._jump_to_date)
+        self.btn_jump.pack(side="right")
+        self.entry_jump = tk.Entry(btns, width=12)
+        self.entry_jump.pack(side="right", padx=(6, 6))
+        self.entry_jump.bind('<Return>', lambda _e: self._jump_to_date())
+        tk.Label(btns, text="Tarihe git (YYYY-AA-GG)").pack(side="right")
 
         # List
         columns = ("id", "date", "type", "amount", "description", "invoice_no", "company")
@@ -110,6 +118,8 @@ class LedgerFrame(tk.Frame):
         self.tree.column("company", width=160)
         self.tree.bind("<<TreeviewSelect>>", self.on_select)
         self.tree.pack(fill="both", expand=True, padx=20)
+        self.pager = PagedTree(self.tree, self._keyset(), key=lambda r: (r[1], r[0]),
+                               values=lambda r: (r[0], r[1], r[2], f"{float(r[3]):.2f}", r[4], r[5], r[6]))
 
         # Hide type picker (we use tabs instead)
         try:
@@ -126,6 +136,7 @@ class LedgerFrame(tk.Frame):
         # Set initial state for invoice field (and visibility)
         self._toggle_invoice()
 
+        self._watch = changes.watch(self, ("ledger",), on_change=lambda: self.refresh(keep_position=True))
         self.refresh()
 
     def on_show(self, **kwargs) -> None:
@@ -140,7 +151,8 @@ class LedgerFrame(tk.Frame):
                 self.tree.selection_remove(sel)
         except Exception:
             pass
-        self.refresh()
+        if self._watch.consume():
+            self.refresh()
         self.refresh_style()
 
     def refresh_style(self):
@@ -234,36 +246,25 @@ class LedgerFrame(tk.Frame):
         self._toggle_invoice()
 
     # CRUD
-    def refresh(self) -> None:
-        for row in self.tree.get_children():
-            self.tree.delete(row)
-        conn = sqlite3.connect(DB_NAME)
-        cur = conn.cursor()
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS ledger (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                date TEXT NOT NULL DEFAULT (date('now')),
-                type TEXT NOT NULL CHECK(type IN ('gelir','gider')),
-                amount REAL NOT NULL,
-                description TEXT,
-                invoice_no TEXT,
-                company TEXT
-            )
-            """
+    def _keyset(self) -> Keyset:
+        # Filter list by current tab (type); pages walk idx_ledger_type_date
+        return Keyset(
+            "SELECT id, date, type, amount, COALESCE(description,''), COALESCE(invoice_no,''), COALESCE(company,'') FROM ledger",
+            ("date", "id"), where="type = ?", params=(self._current_db_type(),),
         )
-        # Migration: add invoice_no if missing
-        cur.execute("PRAGMA table_info(ledger)")
-        _cols = [r[1] for r in cur.fetchall()]
-        if 'invoice_no' not in _cols:
-            cur.execute("ALTER TABLE ledger ADD COLUMN invoice_no TEXT")
-        if 'company' not in _cols:
-            cur.execute("ALTER TABLE ledger ADD COLUMN company TEXT")
-        # Filter list by current tab (type)
-        cur.execute("SELECT id, date, type, amount, COALESCE(description,''), COALESCE(invoice_no,''), COALESCE(company,'') FROM ledger WHERE type = ? ORDER BY date DESC, id DESC LIMIT 200", (self._current_db_type(),))
-        for _id, d, t, a, desc, inv, comp in cur.fetchall():
-            self.tree.insert("", "end", values=(_id, d, t, f"{float(a):.2f}", desc, inv, comp))
-        conn.close()
+
+    def _jump_to_date(self) -> None:
+        try:
+            self.pager.jump_to_date(self.entry_jump.get())
+        except ValueError:
+            messagebox.showwarning("Geçersiz tarih", "Tarihi YYYY-AA-GG biçiminde girin.")
+
+    def refresh(self, keep_position: bool = False) -> None:
+        self._watch.consume()
+        if keep_position:
+            self.pager.reload()
+        else:
+            self.pager.reset(self._keyset())
 
         # Default date to today
         try:
@@ -271,35 +272,27 @@ class LedgerFrame(tk.Frame):
                 self.entry_date.set_date(date.today())
             else:
                 if not self.entry_date.get().strip():
-                    conn = sqlite3.connect(DB_NAME)
-                    cur = conn.cursor()
-                    try:
-                        cur.execute("SELECT date('now')")
-                        today = cur.fetchone()[0]
-                    finally:
-                        conn.close()
+                    today = db.scalar("SELECT date('now')")
                     self.entry_date.insert(0, today)
         except Exception:
             pass
 
+    def _entry(self) -> ledger_service.Entry:
+        return ledger_service.Entry(
+            type=self._current_db_type(),
+            amount=self._parse_amount(self.entry_amount.get().strip()),
+            date=self.entry_date.get().strip() or None,
+            description=self.entry_desc.get().strip() or None,
+            invoice_no=self.entry_invoice.get().strip() or None,
+            company=self.entry_company.get().strip() or None,
+        )
+
     def add_entry(self) -> None:
-        db_type = self._current_db_type()
-        date = self.entry_date.get().strip()
-        amount = self._parse_amount(self.entry_amount.get().strip())
-        desc = self.entry_desc.get().strip() or None
-        invoice_no = (self.entry_invoice.get().strip() or None) if db_type == 'gider' else None
-        company = (self.entry_company.get().strip() or None) if db_type == 'gider' else None
-        if amount != amount or amount <= 0:  # NaN or non-positive
-            messagebox.showwarning("Geçersiz tutar", "Pozitif bir tutar girin.")
+        try:
+            ledger_service.add_entry(self._entry())
+        except ValueError as e:
+            messagebox.showwarning("Geçersiz tutar", str(e))
             return
-        conn = sqlite3.connect(DB_NAME)
-        cur = conn.cursor()
-        if date:
-            cur.execute("INSERT INTO ledger (date, type, amount, description, invoice_no, company) VALUES (?, ?, ?, ?, ?, ?)", (date, db_type, amount, desc, invoice_no, company))
-        else:
-            cur.execute("INSERT INTO ledger (type, amount, description, invoice_no, company) VALUES (?, ?, ?, ?, ?)", (db_type, amount, desc, invoice_no, company))
-        conn.commit()
-        conn.close()
         self.entry_amount.delete(0, tk.END)
         self.entry_desc.delete(0, tk.END)
         self.refresh()
@@ -309,21 +302,12 @@ class LedgerFrame(tk.Frame):
         if lid is None:
             messagebox.showinfo("Seçim yok", "Güncellenecek kaydı seçin.")
             return
-        db_type = self._current_db_type()
-        date = self.entry_date.get().strip()
-        amount = self._parse_amount(self.entry_amount.get().strip())
-        desc = self.entry_desc.get().strip() or None
-        invoice_no = (self.entry_invoice.get().strip() or None) if db_type == 'gider' else None
-        company = (self.entry_company.get().strip() or None) if db_type == 'gider' else None
-        if amount != amount or amount <= 0:
-            messagebox.showwarning("Geçersiz tutar", "Pozitif bir tutar girin.")
+        try:
+            ledger_service.update_entry(lid, self._entry())
+        except ValueError as e:
+            messagebox.showwarning("Geçersiz tutar", str(e))
             return
-        conn = sqlite3.connect(DB_NAME)
-        cur = conn.cursor()
-        cur.execute("UPDATE ledger SET date = ?, type = ?, amount = ?, description = ?, invoice_no = ?, company = ? WHERE id = ?", (date or None, db_type, amount, desc, invoice_no, company, lid))
-        conn.commit()
-        conn.close()
-        self.refresh()
+        self.refresh(keep_position=True)
 
     def _toggle_invoice(self) -> None:
         # Show invoice/company fields only in Gider tab
@@ -360,9 +344,5 @@ class LedgerFrame(tk.Frame):
             return
         if not messagebox.askyesno("Onay", "Seçili kaydı silmek istiyor musunuz?"):
             return
-        conn = sqlite3.connect(DB_NAME)
-        cur = conn.cursor()
-        cur.execute("DELETE FROM ledger WHERE id = ?", (lid,))
-        conn.commit()
-        conn.close()
-        self.refresh()
+        ledger_service.delete_entry(lid)
+        self.refresh(keep_position=True)
@@ -1,4 +1,5 @@
-import sqlite3
+# First, so the startup trace (when enabled) sees every import below
+import startuptrace
 import os
 import sys
 from datetime import datetime
@@ -7,36 +8,53 @@ import tkinter as tk
 from tkinter import messagebox, ttk
 import tkinter.font as tkfont
 from typing import Dict, List, Optional, Type, Callable
+import importlib
 import unicodedata
-from members import MembersFrame
 from ui import apply_theme, tinted_bg, smart_tinted_bg, rounded_outline, apply_entry_margins, apply_button_margins, _icon_for_action, fix_mojibake_text, create_card, refresh_card_tints, ensure_card_control_backgrounds, CARD_BG_LIGHT, CARD_BG_DARK, ThemeManager
-import sqlite3 as _sqlite3
 from typing import Tuple
-try:
-    from products import ProductsFrame
-except Exception:
-    ProductsFrame = None  # type: ignore[assignment]
-try:
-    from reports import ReportsFrame
-except Exception:
-    ReportsFrame = None  # type: ignore[assignment]
-try:
-    from ledger import LedgerFrame
-except Exception:
-    LedgerFrame = None  # type: ignore[assignment]
-try:
-    from sales import SalesFrame, ReturnFrame
-except Exception:
-    SalesFrame = None  # type: ignore[assignment]
-    ReturnFrame = None  # type: ignore[assignment]
-try:
-    from investors import InvestorsFrame
-except Exception:
-    InvestorsFrame = None  # type: ignore[assignment]
-try:
-    from settings import SettingsFrame
-except Exception:
-    SettingsFrame = None  # type: ignore[assignment]
+import db
+import migrations
+from changes import ChangeBus
+from worker import DbWorker
+# Screens by menu key: (module, frame class). Nothing here is imported at
+# startup; App.show_frame('products') imports the module and builds the
+# frame on first use, and App._warm_screens pre-builds the ones a user can
+# open while the role screen sits idle. PyInstaller can't follow these
+# imports; build_exe.ps1 passes every local module as --hidden-import.
+SCREENS: Dict[str, Tuple[str, str]] = {
+    'members': ('members', 'MembersFrame'),
+    'products': ('products', 'ProductsFrame'),
+    'sale': ('sales', 'SalesFrame'),
+    'return': ('sales', 'ReturnFrame'),
+    'ledger': ('ledger', 'LedgerFrame'),
+    'investors': ('investors', 'InvestorsFrame'),
+    'reports': ('reports', 'ReportsFrame'),
+    'settings': ('settings', 'SettingsFrame'),
+}
+_screen_classes: Dict[str, Optional[type]] = {}
+# Rebuilt on every entry (see App.show_frame). None at the moment: the
+# sales screen keeps its carts between visits.
+VOLATILE_FRAMES: Tuple[str, ...] = ()
+# Post-login warmup: first step after the role screen settles, then one
+# screen per idle slot
+WARMUP_DELAY_MS = 300
+WARMUP_STEP_MS = 50
+
+
+def screen_class(key: str) -> Optional[type]:
+    """Frame class for a menu key, importing its module on first use.
+    None if the key is unknown or the module fails to import."""
+    if key not in _screen_classes:
+        cls = None
+        try:
+            module, name = SCREENS[key]
+            cls = getattr(importlib.import_module(module), name)
+        except Exception:
+            import traceback
+            print(f"[warn] screen '{key}' could not be loaded:", file=sys.stderr)
+            traceback.print_exc()
+        _screen_classes[key] = cls
+    return _screen_classes[key]
 
 def _norm_text(s: str) -> str:
     try:
@@ -84,43 +102,8 @@ def get_main_actions() -> List[str]:
 
 def build_main_handlers(controller: 'App') -> Dict[str, Callable[[], None]]:
     handlers: Dict[str, Callable[[], None]] = {}
-    # Members
-    handlers["Üye yönetimi"] = (lambda: controller.show_frame(MembersFrame)) if 'MembersFrame' in globals() and MembersFrame is not None else (lambda: controller.show_placeholder("Üye yönetimi"))
-    # Products
-    if ProductsFrame is not None:
-        handlers["Ürün yönetimi"] = lambda: controller.show_frame(ProductsFrame)  # type: ignore[arg-type]
-    else:
-        handlers["Ürün yönetimi"] = lambda: controller.show_placeholder("Ürün yönetimi")
-    # Sales
-    if SalesFrame is not None:
-        handlers["Yeni satış"] = lambda: controller.show_frame(SalesFrame)  # type: ignore[arg-type]
-    else:
-        handlers["Yeni satış"] = lambda: controller.show_placeholder("Yeni satış")
-    # Returns
-    if 'ReturnFrame' in globals() and ReturnFrame is not None:
-        handlers["İade işlemi"] = lambda: controller.show_frame(ReturnFrame)  # type: ignore[arg-type]
-    else:
-        handlers["İade işlemi"] = lambda: controller.show_placeholder("İade işlemi")
-    # Ledger
-    if LedgerFrame is not None:
-        handlers["Gelir/Gider kaydı"] = lambda: controller.show_frame(LedgerFrame)  # type: ignore[arg-type]
-    else:
-        handlers["Gelir/Gider kaydı"] = lambda: controller.show_placeholder("Gelir/Gider kaydı")
-    # Investors
-    if 'InvestorsFrame' in globals() and InvestorsFrame is not None:
-        handlers["Yatırımcılar"] = lambda: controller.show_frame(InvestorsFrame)  # type: ignore[arg-type]
-    else:
-        handlers["Yatırımcılar"] = lambda: controller.show_placeholder("Yatırımcılar")
-    # Reports
-    if ReportsFrame is not None:
-        handlers["Raporlar"] = lambda: controller.show_frame(ReportsFrame)  # type: ignore[arg-type]
-    else:
-        handlers["Raporlar"] = lambda: controller.show_placeholder("Raporlar")
-    # Settings
-    if SettingsFrame is not None:
-        handlers["Ayarlar"] = lambda: controller.show_frame(SettingsFrame)  # type: ignore[arg-type]
-    else:
-        handlers["Ayarlar"] = lambda: controller.show_placeholder("Ayarlar")
+    for label in get_main_actions():
+        handlers[label] = lambda key=menu_key_from_label(label): controller.show_frame(key)
     return handlers
 
 def default_allowed_by_role(role: str) -> set[str]:
@@ -137,8 +120,6 @@ def default_allowed_by_role(role: str) -> set[str]:
         return set()
     return {'members','products','sale','return','ledger','investors','reports','settings'}
 
-DB_NAME = "coop.db"
-
 # App metadata
 APP_NAME = 'Kooperatif'
 APP_VERSION = '1.00'
@@ -164,170 +145,14 @@ except Exception:
 
 # --- Database Setup ---
 def init_db() -> None:
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    cursor.execute(
-        """
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT UNIQUE,
-            password TEXT,
-            role TEXT
-        )
-        """
-    )
-    # Per-user menu permissions (optional). If no rows for a user, defaults to allow-all.
-    cursor.execute(
-        """
-        CREATE TABLE IF NOT EXISTS user_permissions (
-            username TEXT NOT NULL,
-            menu_key TEXT NOT NULL,
-            allowed INTEGER NOT NULL DEFAULT 1,
-            PRIMARY KEY(username, menu_key)
-        )
-        """
-    )
-    # Basic products table for inventory
-    cursor.execute(
-        """
-        CREATE TABLE IF NOT EXISTS products (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            barcode TEXT UNIQUE,
-            price REAL NOT NULL DEFAULT 0,
-            cost REAL NOT NULL DEFAULT 0,
-            stock REAL NOT NULL DEFAULT 0,
-            unit TEXT NOT NULL DEFAULT 'adet'
-        )
-        """
-    )
-    # Migration: add cost column if missing (for existing DBs)
-    cursor.execute("PRAGMA table_info(products)")
-    cols = [r[1] for r in cursor.fetchall()]
-    if 'cost' not in cols:
-        cursor.execute("ALTER TABLE products ADD COLUMN cost REAL NOT NULL DEFAULT 0")
-    # Simple ledger table for income (gelir) and outcome (gider)
-    cursor.execute(
-        """
-        CREATE TABLE IF NOT EXISTS ledger (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            date TEXT NOT NULL DEFAULT (date('now')),
-            type TEXT NOT NULL CHECK(type IN ('gelir','gider')),
-            amount REAL NOT NULL,
-            description TEXT,
-            invoice_no TEXT,
-            company TEXT
-        )
-        """
-    )
-    # Migration: add invoice_no/company to ledger if missing
-    cursor.execute("PRAGMA table_info(ledger)")
-    _cols = [r[1] for r in cursor.fetchall()]
-    if 'invoice_no' not in _cols:
-        cursor.execute("ALTER TABLE ledger ADD COLUMN invoice_no TEXT")
-    if 'company' not in _cols:
-        cursor.execute("ALTER TABLE ledger ADD COLUMN company TEXT")
-    # Sales header and lines
-    cursor.execute(
-        """
-        CREATE TABLE IF NOT EXISTS sales (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            date TEXT NOT NULL DEFAULT (datetime('now')),
-            total REAL NOT NULL
-        )
-        """
-    )
-    cursor.execute(
-        """
-        CREATE TABLE IF NOT EXISTS sale_items (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            sale_id INTEGER NOT NULL,
-            product_id INTEGER NOT NULL,
-            quantity REAL NOT NULL,
-            price REAL NOT NULL,
-            FOREIGN KEY(sale_id) REFERENCES sales(id) ON DELETE CASCADE,
-            FOREIGN KEY(product_id) REFERENCES products(id)
-        )
-        """
-    )
-    # Cashbook and Bankbook for cash/bank tracking
-    cursor.execute(
-        """
-        CREATE TABLE IF NOT EXISTS cashbook (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            date TEXT NOT NULL DEFAULT (datetime('now')),
-            type TEXT NOT NULL CHECK(type IN ('in','out')),
-            amount REAL NOT NULL,
-            description TEXT
-        )
-        """
-    )
-    cursor.execute(
-        """
-        CREATE TABLE IF NOT EXISTS bankbook (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            date TEXT NOT NULL DEFAULT (datetime('now')),
-            type TEXT NOT NULL CHECK(type IN ('in','out')),
-            amount REAL NOT NULL,
-            description TEXT
-        )
-        """
-    )
-    # Investors for tracking initial capital
-    cursor.execute(
-        """
-        CREATE TABLE IF NOT EXISTS investors (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            phone TEXT,
-            initial_capital REAL NOT NULL DEFAULT 0,
-            initial_date TEXT NOT NULL DEFAULT (date('now')),
-            notes TEXT
-        )
-        """
-    )
-    # Investor transactions: contributions and withdrawals
-    cursor.execute(
-        """
-        CREATE TABLE IF NOT EXISTS investor_transactions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            investor_id INTEGER NOT NULL,
-            date TEXT NOT NULL DEFAULT (date('now')),
-            type TEXT NOT NULL CHECK(type IN ('contribution','withdrawal')),
-            amount REAL NOT NULL,
-            notes TEXT,
-            FOREIGN KEY(investor_id) REFERENCES investors(id) ON DELETE CASCADE
-        )
-        """
-    )
-    # Settings KV store
-    cursor.execute(
-        """
-        CREATE TABLE IF NOT EXISTS settings (
-            key TEXT PRIMARY KEY,
-            value TEXT
-        )
-        """
-    )
-    # Seed default UI settings if missing
-    cursor.execute("INSERT OR IGNORE INTO settings(key, value) VALUES('ui_theme','light')")
-    cursor.execute("INSERT OR IGNORE INTO settings(key, value) VALUES('ui_scale','1.5')")
-    cursor.execute("INSERT OR IGNORE INTO settings(key, value) VALUES('ui_base_pt','12')")
-    # Default investor pool percent to 20 if not set
-    cursor.execute("INSERT OR IGNORE INTO settings(key, value) VALUES('investor_pool_percent','20')")
-    cursor.execute("SELECT 1 FROM users WHERE username = ?", ("admin",))
-    if not cursor.fetchone():
-        cursor.execute(
-            "INSERT INTO users (username, password, role) VALUES (?, ?, ?)",
-            ("admin", "1234", "admin"),
-        )
-    conn.commit()
-    conn.close()
+    """Bring the database schema up to date (see migrations.py)."""
+    migrations.migrate()
 
 
 class App(tk.Tk):
     def __init__(self) -> None:
-        super().__init__()
+        with startuptrace.span("tk.Tk()"):
+            super().__init__()
         # Use custom borderless title bar. We'll keep inputs typeable by
         # aggressively restoring keyboard focus after we enable borderless.
         # (We avoid disabling borderless because the app relies on the
@@ -380,13 +205,15 @@ class App(tk.Tk):
         self.title("Kooperatif Giris")
         self.minsize(800, 600)
         # Start maximized when the app launches
-        self._maximize_startup()
+        with startuptrace.span("_maximize_startup"):
+            self._maximize_startup()
         # Defer enabling borderless chrome until after theme and first frame
         # are initialized to avoid early focus issues on some platforms.
         # System menubar disabled to remove Help/About entry
         # Apply font scaling only (no tk scaling), then theme
         try:
-            scale, theme, base_pt = self._load_ui_settings()
+            with startuptrace.span("_load_ui_settings"):
+                scale, theme, base_pt = self._load_ui_settings()
             # Default to light theme if not set
             if not theme:
                 theme = 'light'
@@ -396,7 +223,8 @@ class App(tk.Tk):
                     s = 1.0
             except Exception:
                 s = 1.0
-            apply_theme(self, scale=s, theme_name=theme, base_pt=base_pt)
+            with startuptrace.span("apply_theme"):
+                apply_theme(self, scale=s, theme_name=theme, base_pt=base_pt)
             try:
                 self.ui_scale = float(s)
             except Exception:
@@ -432,6 +260,10 @@ class App(tk.Tk):
                 pass
         self.frames: Dict[Type[tk.Frame], tk.Frame] = {}
         self.active_user: Optional[Dict[str, str]] = None
+        # Background SQLite executor; frames submit via worker.call()
+        self.db_worker = DbWorker(self)
+        # Table change notifications; frames subscribe via changes.watch()
+        self.change_bus = ChangeBus(self)
         # Disable automatic margin walkers by default to avoid layout drift
         # on first entry after theme/font changes. Screens manage their own
         # spacing explicitly.
@@ -465,19 +297,35 @@ class App(tk.Tk):
             pass
         # Wrap messagebox functions so all messages are fixed at call-time
         self._wrap_messagebox_mojibake_fix()
-        self.show_frame(LoginFrame)
+        with startuptrace.span("show_frame(LoginFrame)"):
+            self.show_frame(LoginFrame)
         # Now that the initial UI is up with the correct theme and focus,
         # enable borderless chrome if requested and set up taskbar anchor (Windows).
         if getattr(self, 'use_borderless', False):
             try:
-                self._create_taskbar_anchor()
+                with startuptrace.span("_create_taskbar_anchor"):
+                    self._create_taskbar_anchor()
             except Exception:
                 pass
             try:
-                self._enable_borderless_chrome()
+                with startuptrace.span("_enable_borderless_chrome"):
+                    self._enable_borderless_chrome()
             except Exception:
                 pass
 
+    def destroy(self) -> None:
+        self._cancel_warmup()
+        # Let queued writes (e.g. a sale being committed) finish first
+        try:
+            self.change_bus.stop()
+        except Exception:
+            pass
+        try:
+            self.db_worker.shutdown()
+        except Exception:
+            pass
+        super().destroy()
+
     # IMPORTANT: Do not override Tk.__call__ — Tkinter relies on it to call
     # underlying Tcl commands. Overriding it breaks internals and can surface
     # confusing errors in callbacks. Instead, provide a dedicated helper that
@@ -1032,7 +880,15 @@ class App(tk.Tk):
         except Exception:
             pass
 
-    def show_frame(self, frame_class: Type[tk.Frame], **kwargs) -> None:
+    def show_frame(self, frame_class, **kwargs) -> None:
+        # A menu key (see SCREENS) is resolved, and its module imported, here
+        if isinstance(frame_class, str):
+            key = frame_class
+            frame_class = screen_class(key)
+            if frame_class is None:
+                label = next((l for l in get_main_actions() if menu_key_from_label(l) == key), key)
+                self.show_placeholder(label)
+                return
         # Ensure bigger fonts on Login (2.0x); otherwise use saved
         try:
             desired_scale = 2.0 if frame_class.__name__ == 'LoginFrame' else getattr(self, 'saved_scale', None)
@@ -1057,9 +913,9 @@ class App(tk.Tk):
             pass
         # For volatile screens that are sensitive to initial layout timing,
         # recreate the frame on every entry so geometry starts from a clean
-        # state (fixes first-entry misalignment). Currently only SalesFrame.
+        # state (fixes first-entry misalignment). See VOLATILE_FRAMES.
         try:
-            volatile = frame_class.__name__ in ('SalesFrame',)
+            volatile = frame_class.__name__ in VOLATILE_FRAMES
         except Exception:
             volatile = False
 
@@ -1075,9 +931,7 @@ class App(tk.Tk):
                 pass
             frame = None
         if frame is None:
-            frame = frame_class(parent=self.container, controller=self)
-            self.frames[frame_class] = frame
-            frame.grid(row=0, column=0, sticky="nsew")
+            frame = self._build_frame(frame_class)
         if hasattr(frame, "on_show"):
             frame.on_show(**kwargs)
         frame.tkraise()
@@ -1135,6 +989,53 @@ class App(tk.Tk):
         # on some screens. Theme is applied centrally; frames handle their own
         # stabilization in on_show/idle reflow.
 
+    def _build_frame(self, frame_class: Type[tk.Frame]) -> tk.Frame:
+        frame = frame_class(parent=self.container, controller=self)
+        self.frames[frame_class] = frame
+        frame.grid(row=0, column=0, sticky="nsew")
+        return frame
+
+    def _warm_screens(self, role: str) -> None:
+        """Build the screens this user can open, one per idle moment after
+        login, so the first tap on a tile doesn't pay for imports and widget
+        construction. Input is handled between steps."""
+        self._cancel_warmup()
+        allowed = self.user_permissions
+        if allowed is None:
+            allowed = default_allowed_by_role(role)
+        keys = [menu_key_from_label(l) for l in get_main_actions()]
+        self._warm_queue = [k for k in keys if k in allowed and k in SCREENS]
+        self._warm_job = self.after(WARMUP_DELAY_MS, self._warm_next)
+
+    def _warm_next(self) -> None:
+        self._warm_job = None
+        queue = getattr(self, '_warm_queue', [])
+        while queue:
+            frame_class = screen_class(queue.pop(0))
+            if frame_class is None or frame_class in self.frames:
+                continue
+            # Rebuilt on every entry anyway; importing it is all we can warm
+            if frame_class.__name__ in VOLATILE_FRAMES:
+                continue
+            try:
+                # Build under the current screen without raising it
+                self._build_frame(frame_class).lower()
+            except Exception:
+                pass
+            break
+        if queue:
+            self._warm_job = self.after(WARMUP_STEP_MS, lambda: self.after_idle(self._warm_next))
+
+    def _cancel_warmup(self) -> None:
+        self._warm_queue = []
+        job = getattr(self, '_warm_job', None)
+        if job is not None:
+            try:
+                self.after_cancel(job)
+            except Exception:
+                pass
+        self._warm_job = None
+
     def _maximize_startup(self) -> None:
         # Try native maximize first (works on Windows/Linux)
         try:
@@ -1677,10 +1578,7 @@ class App(tk.Tk):
 
     def _open_settings_from_title_menu(self) -> None:
         try:
-            if SettingsFrame is not None:
-                self.show_frame(SettingsFrame)  # type: ignore[arg-type]
-            else:
-                self.show_placeholder('Ayarlar')
+            self.show_frame('settings')
         except Exception:
             pass
 
@@ -1773,12 +1671,7 @@ class App(tk.Tk):
 
     def _load_ui_settings(self):
         try:
-            conn = _sqlite3.connect(DB_NAME)
-            cur = conn.cursor()
-            cur.execute("CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT)")
-            cur.execute("SELECT key, value FROM settings WHERE key IN ('ui_theme','ui_scale','ui_base_pt')")
-            rows = dict(cur.fetchall())
-            conn.close()
+            rows = dict(db.query("SELECT key, value FROM settings WHERE key IN ('ui_theme','ui_scale','ui_base_pt')"))
             # Load scale if available
             try:
                 scale = float(rows.get('ui_scale') or 1.5)
@@ -1849,14 +1742,10 @@ class App(tk.Tk):
             pass
 
     def authenticate(self, username: str, password: str) -> None:
-        conn = sqlite3.connect(DB_NAME)
-        cursor = conn.cursor()
-        cursor.execute(
+        row = db.query_one(
             "SELECT role FROM users WHERE username = ? AND password = ?",
             (username, password),
         )
-        row = cursor.fetchone()
-        conn.close()
 
         if row:
             role = row[0]
@@ -1877,12 +1766,7 @@ class App(tk.Tk):
                 # Admin is always full access; ignore any stored overrides
                 self.user_permissions = None
             else:
-                conn = sqlite3.connect(DB_NAME)
-                cur = conn.cursor()
-                cur.execute("CREATE TABLE IF NOT EXISTS user_permissions (username TEXT, menu_key TEXT, allowed INTEGER, PRIMARY KEY(username, menu_key))")
-                cur.execute("SELECT menu_key FROM user_permissions WHERE username=? AND allowed=1", (username,))
-                rows = [r[0] for r in cur.fetchall()]
-                conn.close()
+                rows = [r[0] for r in db.query("SELECT menu_key FROM user_permissions WHERE username=? AND allowed=1", (username,))]
                 # For non-admins: never use defaults; show exactly what DB says
                 self.user_permissions = set(rows)
         except Exception:
@@ -1899,8 +1783,10 @@ class App(tk.Tk):
             pass
         self.title("Kooperatif - {}".format(role.title()))
         self.show_frame(frame_class, username=username, role=role)
+        self._warm_screens(role)
 
     def logout(self) -> None:
+        self._cancel_warmup()
         self.active_user = None
         self.title("Kooperatif Giris")
         self.show_frame(LoginFrame)
@@ -2548,6 +2434,10 @@ class ManagerFrame(RoleFrame):
 
 
 if __name__ == "__main__":
-    init_db()
-    app = App()
+    with startuptrace.span("init_db"):
+        init_db()
+    with startuptrace.span("App.__init__"):
+        app = App()
+    # Written once the first frame has painted; see startuptrace.py
+    app.after_idle(lambda: startuptrace.finish(app))
     app.mainloop()
@@ -2,9 +2,9 @@
 import tkinter as tk
 from tkinter import messagebox
 from tkinter import ttk
-from ui import make_back_arrow
-
-DB_NAME = "coop.db"
+from ui import make_back_arrow, sync_tree
+import changes
+import db
 
 
 class MembersFrame(tk.Frame):
@@ -107,6 +107,7 @@ class MembersFrame(tk.Frame):
         except Exception:
             pass
 
+        self._watch = changes.watch(self, ("users",), on_change=self.refresh_users)
         self.refresh_users()
 
     def refresh_style(self) -> None:
@@ -154,7 +155,8 @@ class MembersFrame(tk.Frame):
 
     def on_show(self, **kwargs) -> None:
         self.controller.title("Kooperatif - Uye Yonetimi")
-        self.refresh_users()
+        if self._watch.consume():
+            self.refresh_users()
         self.refresh_style()
         # Ensure controls are disabled when nothing is selected
         try:
@@ -164,14 +166,9 @@ class MembersFrame(tk.Frame):
             pass
 
     def refresh_users(self) -> None:
-        for row in self.tree.get_children():
-            self.tree.delete(row)
-        conn = sqlite3.connect(DB_NAME)
-        cur = conn.cursor()
-        cur.execute("SELECT id, username, role FROM users ORDER BY id")
-        for uid, uname, role in cur.fetchall():
-            self.tree.insert("", "end", values=(uid, uname, role))
-        conn.close()
+        self._watch.consume()
+        rows = db.query("SELECT id, username, role FROM users ORDER BY id")
+        sync_tree(self.tree, rows, key=lambda r: f"u{r[0]}")
 
     def get_selected_id(self):
         sel = self.tree.selection()
@@ -214,21 +211,17 @@ class MembersFrame(tk.Frame):
             messagebox.showwarning("Eksik bilgi", "Kullanici, sifre ve rol gerekli.")
             return
         try:
-            conn = sqlite3.connect(DB_NAME)
-            cur = conn.cursor()
-            cur.execute(
-                "INSERT INTO users (username, password, role) VALUES (?, ?, ?)",
-                (uname, pwd, role),
-            )
-            # Save current checkbox selections as initial permissions
-            cur.execute("CREATE TABLE IF NOT EXISTS user_permissions (username TEXT, menu_key TEXT, allowed INTEGER, PRIMARY KEY(username, menu_key))")
-            cur.execute("DELETE FROM user_permissions WHERE username=?", (uname,))
-            cur.execute("INSERT OR REPLACE INTO user_permissions(username, menu_key, allowed) VALUES(?,?,0)", (uname, '__custom__'))
-            for key, var in self._perm_vars.items():
-                if var.get():
-                    cur.execute("INSERT OR REPLACE INTO user_permissions(username, menu_key, allowed) VALUES(?,?,1)", (uname, key))
-            conn.commit()
-            conn.close()
+            with db.transaction() as cur:
+                cur.execute(
+                    "INSERT INTO users (username, password, role) VALUES (?, ?, ?)",
+                    (uname, pwd, role),
+                )
+                # Save current checkbox selections as initial permissions
+                cur.execute("DELETE FROM user_permissions WHERE username=?", (uname,))
+                cur.execute("INSERT OR REPLACE INTO user_permissions(username, menu_key, allowed) VALUES(?,?,0)", (uname, '__custom__'))
+                for key, var in self._perm_vars.items():
+                    if var.get():
+                        cur.execute("INSERT OR REPLACE INTO user_permissions(username, menu_key, allowed) VALUES(?,?,1)", (uname, key))
             self.refresh_users()
             self.entry_password.delete(0, tk.END)
             try:
@@ -250,24 +243,21 @@ class MembersFrame(tk.Frame):
         if not uname or not role:
             messagebox.showwarning("Eksik bilgi", "Kullanici ve rol gerekli.")
             return
-        conn = sqlite3.connect(DB_NAME)
-        cur = conn.cursor()
         try:
-            if pwd:
-                cur.execute(
-                    "UPDATE users SET username = ?, password = ?, role = ? WHERE id = ?",
-                    (uname, pwd, role, uid),
-                )
-            else:
-                cur.execute(
-                    "UPDATE users SET username = ?, role = ? WHERE id = ?",
-                    (uname, role, uid),
-                )
-            conn.commit()
+            with db.transaction() as cur:
+                if pwd:
+                    cur.execute(
+                        "UPDATE users SET username = ?, password = ?, role = ? WHERE id = ?",
+                        (uname, pwd, role, uid),
+                    )
+                else:
+                    cur.execute(
+                        "UPDATE users SET username = ?, role = ? WHERE id = ?",
+                        (uname, role, uid),
+                    )
         except sqlite3.IntegrityError:
             messagebox.showerror("Hata", "Bu kullanici adi zaten var.")
         finally:
-            conn.close()
             self.refresh_users()
             self.entry_password.delete(0, tk.END)
             try:
@@ -294,11 +284,8 @@ class MembersFrame(tk.Frame):
 
         if not messagebox.askyesno("Onay", "Secili uyeyi silmek istiyor musunuz?"):
             return
-        conn = sqlite3.connect(DB_NAME)
-        cur = conn.cursor()
-        cur.execute("DELETE FROM users WHERE id = ?", (uid,))
-        conn.commit()
-        conn.close()
+        with db.transaction() as cur:
+            cur.execute("DELETE FROM users WHERE id = ?", (uid,))
         self.refresh_users()
         try:
             self._set_perm_controls_enabled(False)
@@ -325,14 +312,11 @@ class MembersFrame(tk.Frame):
         Uses a presence check so 'hepsi kapalı' durumu da ayırt edilir.
         """
         try:
-            conn = sqlite3.connect(DB_NAME)
-            cur = conn.cursor()
-            cur.execute("CREATE TABLE IF NOT EXISTS user_permissions (username TEXT, menu_key TEXT, allowed INTEGER, PRIMARY KEY(username, menu_key))")
+            cur = db.get_conn().cursor()
             cur.execute("SELECT 1 FROM user_permissions WHERE username=? LIMIT 1", (username,))
             has_any = bool(cur.fetchone())
             cur.execute("SELECT menu_key FROM user_permissions WHERE username=? AND allowed=1", (username,))
             rows = [r[0] for r in cur.fetchall()]
-            conn.close()
         except Exception:
             rows = []
             has_any = False
@@ -365,19 +349,15 @@ class MembersFrame(tk.Frame):
             messagebox.showinfo("Yetkiler", "Admin her zaman tam yetkilidir ve değiştirilemez.")
             return
         try:
-            conn = sqlite3.connect(DB_NAME)
-            cur = conn.cursor()
-            cur.execute("CREATE TABLE IF NOT EXISTS user_permissions (username TEXT, menu_key TEXT, allowed INTEGER, PRIMARY KEY(username, menu_key))")
-            # Clear existing
-            cur.execute("DELETE FROM user_permissions WHERE username=?", (uname,))
-            # Insert a presence marker so 'hepsi kapalı' durumu da kaydedilsin
-            cur.execute("INSERT OR REPLACE INTO user_permissions(username, menu_key, allowed) VALUES(?,?,0)", (uname, '__custom__'))
-            # Insert allowed ones
-            for key, var in self._perm_vars.items():
-                if var.get():
-                    cur.execute("INSERT OR REPLACE INTO user_permissions(username, menu_key, allowed) VALUES(?,?,1)", (uname, key))
-            conn.commit()
-            conn.close()
+            with db.transaction() as cur:
+                # Clear existing
+                cur.execute("DELETE FROM user_permissions WHERE username=?", (uname,))
+                # Insert a presence marker so 'hepsi kapalı' durumu da kaydedilsin
+                cur.execute("INSERT OR REPLACE INTO user_permissions(username, menu_key, allowed) VALUES(?,?,0)", (uname, '__custom__'))
+                # Insert allowed ones
+                for key, var in self._perm_vars.items():
+                    if var.get():
+                        cur.execute("INSERT OR REPLACE INTO user_permissions(username, menu_key, allowed) VALUES(?,?,1)", (uname, key))
             messagebox.showinfo("Yetkiler", "Yetkiler kaydedildi.")
         except Exception as e:
             messagebox.showerror("Hata", str(e))
@@ -404,11 +384,8 @@ class MembersFrame(tk.Frame):
         new_pwd = self.entry_password.get().strip() or "1234"
         if not messagebox.askyesno("Onay", f"Yeni sifre: '{new_pwd}'. Devam edilsin mi?"):
             return
-        conn = sqlite3.connect(DB_NAME)
-        cur = conn.cursor()
-        cur.execute("UPDATE users SET password = ? WHERE id = ?", (new_pwd, uid))
-        conn.commit()
-        conn.close()
+        with db.transaction() as cur:
+            cur.execute("UPDATE users SET password = ? WHERE id = ?", (new_pwd, uid))
         self.entry_password.delete(0, tk.END)
         messagebox.showinfo("Tamam", "Sifre guncellendi.")
 
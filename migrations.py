@@ -0,0 +1,478 @@
+"""Versioned schema migrations keyed on PRAGMA user_version.
+
+MIGRATIONS[n] upgrades a database from version n to n + 1. Each step runs
+in its own IMMEDIATE transaction together with the user_version bump, so a
+migration is either fully applied and recorded or not applied at all.
+Screens never issue DDL themselves; they rely on migrate() having run at
+startup (main.init_db).
+"""
+import sqlite3
+from typing import Callable, List, Optional, Tuple
+
+import db
+
+
+def _columns(cur, table: str) -> List[str]:
+    cur.execute(f"PRAGMA table_info({table})")
+    return [r[1] for r in cur.fetchall()]
+
+
+def _m001_baseline(cur) -> None:
+    """Baseline schema. Uses IF NOT EXISTS and column checks so databases
+    created by builds that predate user_version are adopted in place."""
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE,
+            password TEXT,
+            role TEXT
+        )
+        """
+    )
+    # Per-user menu permissions (optional). If no rows for a user, defaults to allow-all.
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS user_permissions (
+            username TEXT NOT NULL,
+            menu_key TEXT NOT NULL,
+            allowed INTEGER NOT NULL DEFAULT 1,
+            PRIMARY KEY(username, menu_key)
+        )
+        """
+    )
+    # Basic products table for inventory
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS products (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            barcode TEXT UNIQUE,
+            price REAL NOT NULL DEFAULT 0,
+            cost REAL NOT NULL DEFAULT 0,
+            stock REAL NOT NULL DEFAULT 0,
+            unit TEXT NOT NULL DEFAULT 'adet'
+        )
+        """
+    )
+    if 'cost' not in _columns(cur, 'products'):
+        cur.execute("ALTER TABLE products ADD COLUMN cost REAL NOT NULL DEFAULT 0")
+    # Simple ledger table for income (gelir) and outcome (gider)
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS ledger (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            date TEXT NOT NULL DEFAULT (date('now')),
+            type TEXT NOT NULL CHECK(type IN ('gelir','gider')),
+            amount REAL NOT NULL,
+            description TEXT,
+            invoice_no TEXT,
+            company TEXT
+        )
+        """
+    )
+    cols = _columns(cur, 'ledger')
+    if 'invoice_no' not in cols:
+        cur.execute("ALTER TABLE ledger ADD COLUMN invoice_no TEXT")
+    if 'company' not in cols:
+        cur.execute("ALTER TABLE ledger ADD COLUMN company TEXT")
+    # Sales header and lines
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS sales (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            date TEXT NOT NULL DEFAULT (datetime('now')),
+            total REAL NOT NULL
+        )
+        """
+    )
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS sale_items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            sale_id INTEGER NOT NULL,
+            product_id INTEGER NOT NULL,
+            quantity REAL NOT NULL,
+            price REAL NOT NULL,
+            FOREIGN KEY(sale_id) REFERENCES sales(id) ON DELETE CASCADE,
+            FOREIGN KEY(product_id) REFERENCES products(id)
+        )
+        """
+    )
+    # Links a return (negative sale) to the sale it refunds
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS returns (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            original_sale_id INTEGER NOT NULL,
+            return_sale_id INTEGER NOT NULL,
+            date TEXT NOT NULL DEFAULT (datetime('now'))
+        )
+        """
+    )
+    # Cashbook and Bankbook for cash/bank tracking
+    for book in ('cashbook', 'bankbook'):
+        cur.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {book} (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                date TEXT NOT NULL DEFAULT (datetime('now')),
+                type TEXT NOT NULL CHECK(type IN ('in','out')),
+                amount REAL NOT NULL,
+                description TEXT
+            )
+            """
+        )
+    # Investors for tracking initial capital
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS investors (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            phone TEXT,
+            initial_capital REAL NOT NULL DEFAULT 0,
+            initial_date TEXT NOT NULL DEFAULT (date('now')),
+            notes TEXT
+        )
+        """
+    )
+    # Investor transactions: contributions and withdrawals
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS investor_transactions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            investor_id INTEGER NOT NULL,
+            date TEXT NOT NULL DEFAULT (date('now')),
+            type TEXT NOT NULL CHECK(type IN ('contribution','withdrawal')),
+            amount REAL NOT NULL,
+            notes TEXT,
+            FOREIGN KEY(investor_id) REFERENCES investors(id) ON DELETE CASCADE
+        )
+        """
+    )
+    # Settings KV store
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS settings (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        )
+        """
+    )
+    # Seed default settings if missing
+    cur.execute("INSERT OR IGNORE INTO settings(key, value) VALUES('ui_theme','light')")
+    cur.execute("INSERT OR IGNORE INTO settings(key, value) VALUES('ui_scale','1.5')")
+    cur.execute("INSERT OR IGNORE INTO settings(key, value) VALUES('ui_base_pt','12')")
+    cur.execute("INSERT OR IGNORE INTO settings(key, value) VALUES('investor_pool_percent','20')")
+    cur.execute("SELECT 1 FROM users WHERE username = ?", ("admin",))
+    if not cur.fetchone():
+        cur.execute(
+            "INSERT INTO users (username, password, role) VALUES (?, ?, ?)",
+            ("admin", "1234", "admin"),
+        )
+
+
+# Secondary indexes for the hot access paths: (name, table, columns).
+# queryplan.py checks that the canonical queries actually use them.
+INDEXES: List[Tuple[str, str, str]] = [
+    ("idx_sale_items_sale", "sale_items", "sale_id"),
+    ("idx_sale_items_product", "sale_items", "product_id, sale_id"),
+    ("idx_returns_original", "returns", "original_sale_id"),
+    ("idx_sales_date", "sales", "date"),
+    ("idx_ledger_type_date", "ledger", "type, date"),
+    ("idx_cashbook_date", "cashbook", "date"),
+    ("idx_bankbook_date", "bankbook", "date"),
+    ("idx_investor_tx_investor", "investor_transactions", "investor_id, date"),
+    ("idx_products_name", "products", "name"),
+]
+
+
+def ensure_indexes(cur=None) -> None:
+    """Create any missing index from INDEXES (e.g. after a bulk load that
+    dropped them)."""
+    if cur is None:
+        with db.transaction() as c:
+            ensure_indexes(c)
+        return
+    for name, table, cols in INDEXES:
+        cur.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table}({cols})")
+
+
+# Released steps below run frozen copies of the SQL they shipped with. The
+# module helpers they came from (search.create_fts, rollup.create_rollup,
+# ...) stay free to change for runtime rebuilds without changing what an
+# old step does, so fresh and upgraded databases end up with one schema.
+
+_M002_INDEXES: Tuple[Tuple[str, str, str], ...] = (
+    ("idx_sale_items_sale", "sale_items", "sale_id"),
+    ("idx_sale_items_product", "sale_items", "product_id, sale_id"),
+    ("idx_returns_original", "returns", "original_sale_id"),
+    ("idx_sales_date", "sales", "date"),
+    ("idx_ledger_type_date", "ledger", "type, date"),
+    ("idx_cashbook_date", "cashbook", "date"),
+    ("idx_bankbook_date", "bankbook", "date"),
+    ("idx_investor_tx_investor", "investor_transactions", "investor_id, date"),
+    ("idx_products_name", "products", "name"),
+)
+
+
+def _m002_indexes(cur) -> None:
+    for name, table, cols in _M002_INDEXES:
+        cur.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table}({cols})")
+
+
+_M003_FOLD = (
+    ("İ", "i"), ("I", "i"), ("ı", "i"), ("Ş", "s"), ("ş", "s"), ("Ğ", "g"), ("ğ", "g"),
+    ("Ü", "u"), ("ü", "u"), ("Ö", "o"), ("ö", "o"), ("Ç", "c"), ("ç", "c"),
+    ("Â", "a"), ("â", "a"), ("Î", "i"), ("î", "i"), ("Û", "u"), ("û", "u"),
+)
+
+
+def _m003_fold(expr: str) -> str:
+    out = f"COALESCE({expr}, '')"
+    for src, dst in _M003_FOLD:
+        out = f"replace({out}, '{src}', '{dst}')"
+    return f"lower({out})"
+
+
+def _m003_products_fts(cur) -> None:
+    # Skipped silently on SQLite builds without FTS5/trigram; search.py
+    # then keeps using LIKE.
+    try:
+        probe = sqlite3.connect(":memory:")
+        try:
+            probe.execute("CREATE VIRTUAL TABLE t USING fts5(x, tokenize='trigram')")
+        finally:
+            probe.close()
+    except sqlite3.Error:
+        return
+    new_name, new_bc = _m003_fold("new.name"), _m003_fold("new.barcode")
+    cur.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(name, barcode, tokenize='trigram')"
+    )
+    cur.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS products_fts_ai AFTER INSERT ON products BEGIN
+            INSERT INTO products_fts(rowid, name, barcode) VALUES (new.id, {new_name}, {new_bc});
+        END
+        """
+    )
+    cur.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS products_fts_ad AFTER DELETE ON products BEGIN
+            DELETE FROM products_fts WHERE rowid = old.id;
+        END
+        """
+    )
+    cur.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS products_fts_au AFTER UPDATE OF id, name, barcode ON products BEGIN
+            DELETE FROM products_fts WHERE rowid = old.id;
+            INSERT INTO products_fts(rowid, name, barcode) VALUES (new.id, {new_name}, {new_bc});
+        END
+        """
+    )
+    cur.execute("DELETE FROM products_fts")
+    cur.execute(
+        "INSERT INTO products_fts(rowid, name, barcode) "
+        f"SELECT id, {_m003_fold('name')}, {_m003_fold('barcode')} FROM products"
+    )
+
+
+_M004_DAY = "COALESCE(date({d}), substr({d}, 1, 10))"
+_M004_HOUR = "COALESCE(CAST(strftime('%H', {d}) AS INTEGER), 0)"
+
+
+def _m004_delta(row: str, sign: str) -> str:
+    d, t = f"{row}.date", f"{row}.total"
+    day, hour = _M004_DAY.format(d=d), _M004_HOUR.format(d=d)
+    sql = f"""
+        INSERT INTO sales_daily (day, hour, sale_count, return_count, gross, returns, net)
+        VALUES ({day}, {hour},
+                {sign}(CASE WHEN {t} >= 0 THEN 1 ELSE 0 END),
+                {sign}(CASE WHEN {t} < 0 THEN 1 ELSE 0 END),
+                {sign}(CASE WHEN {t} >= 0 THEN {t} ELSE 0 END),
+                {sign}(CASE WHEN {t} < 0 THEN -{t} ELSE 0 END),
+                {sign}{t})
+        ON CONFLICT(day, hour) DO UPDATE SET
+            sale_count = sale_count + excluded.sale_count,
+            return_count = return_count + excluded.return_count,
+            gross = gross + excluded.gross,
+            returns = returns + excluded.returns,
+            net = net + excluded.net;
+    """
+    if sign == "-":
+        sql += f"""
+        DELETE FROM sales_daily
+         WHERE day = {day} AND hour = {hour}
+           AND sale_count = 0 AND return_count = 0;
+    """
+    return sql
+
+
+def _m004_sales_rollup(cur) -> None:
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS sales_daily (
+            day TEXT NOT NULL,
+            hour INTEGER NOT NULL,
+            sale_count INTEGER NOT NULL DEFAULT 0,
+            return_count INTEGER NOT NULL DEFAULT 0,
+            gross REAL NOT NULL DEFAULT 0,
+            returns REAL NOT NULL DEFAULT 0,
+            net REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, hour)
+        ) WITHOUT ROWID
+        """
+    )
+    cur.execute(f"CREATE TRIGGER IF NOT EXISTS sales_daily_ai AFTER INSERT ON sales BEGIN {_m004_delta('new', '+')} END")
+    cur.execute(f"CREATE TRIGGER IF NOT EXISTS sales_daily_ad AFTER DELETE ON sales BEGIN {_m004_delta('old', '-')} END")
+    cur.execute(
+        f"CREATE TRIGGER IF NOT EXISTS sales_daily_au AFTER UPDATE OF date, total ON sales BEGIN "
+        f"{_m004_delta('old', '-')} {_m004_delta('new', '+')} END"
+    )
+    cur.execute("DELETE FROM sales_daily")
+    cur.execute(
+        f"""
+        INSERT INTO sales_daily (day, hour, sale_count, return_count, gross, returns, net)
+        SELECT {_M004_DAY.format(d='date')}, {_M004_HOUR.format(d='date')},
+               SUM(total >= 0), SUM(total < 0),
+               SUM(CASE WHEN total >= 0 THEN total ELSE 0 END),
+               SUM(CASE WHEN total < 0 THEN -total ELSE 0 END),
+               SUM(total)
+          FROM sales
+         GROUP BY 1, 2
+        """
+    )
+
+
+def _m005_signed(row: str) -> str:
+    return f"(CASE {row}.type WHEN 'in' THEN {row}.amount WHEN 'out' THEN -{row}.amount ELSE 0 END)"
+
+
+def _m005_set_own(book: str) -> str:
+    return f"""
+        UPDATE {book} SET balance = COALESCE(
+            (SELECT p.balance FROM {book} p WHERE (p.date, p.id) < (new.date, new.id)
+              ORDER BY p.date DESC, p.id DESC LIMIT 1), 0) + {_m005_signed('new')}
+         WHERE id = new.id;
+    """
+
+
+def _m005_running_balances(cur) -> None:
+    new, old = _m005_signed("new"), _m005_signed("old")
+    cur.execute("CREATE TABLE IF NOT EXISTS book_balances (book TEXT PRIMARY KEY, balance REAL NOT NULL DEFAULT 0)")
+    for book in ("cashbook", "bankbook"):
+        if "balance" not in _columns(cur, book):
+            cur.execute(f"ALTER TABLE {book} ADD COLUMN balance REAL NOT NULL DEFAULT 0")
+        set_own = _m005_set_own(book)
+        add_total = (
+            f"INSERT INTO book_balances (book, balance) VALUES ('{book}', {{delta}}) "
+            f"ON CONFLICT(book) DO UPDATE SET balance = balance + excluded.balance;"
+        )
+        cur.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {book}_balance_ai AFTER INSERT ON {book} BEGIN
+                UPDATE {book} SET balance = balance + {new} WHERE (date, id) > (new.date, new.id);
+                {set_own}
+                {add_total.format(delta=new)}
+            END
+        """)
+        cur.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {book}_balance_ad AFTER DELETE ON {book} BEGIN
+                UPDATE {book} SET balance = balance - {old} WHERE (date, id) > (old.date, old.id);
+                {add_total.format(delta='-' + old)}
+            END
+        """)
+        cur.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {book}_balance_au AFTER UPDATE OF date, type, amount ON {book} BEGIN
+                UPDATE {book} SET balance = balance - {old} WHERE (date, id) > (old.date, old.id) AND id <> new.id;
+                UPDATE {book} SET balance = balance + {new} WHERE (date, id) > (new.date, new.id) AND id <> new.id;
+                {set_own}
+                {add_total.format(delta=f'{new} - {old}')}
+            END
+        """)
+        row = _m005_signed(book)
+        cur.execute("DROP TABLE IF EXISTS temp._running")
+        cur.execute(f"CREATE TEMP TABLE _running AS SELECT id, SUM({row}) OVER (ORDER BY date, id) AS running FROM {book}")
+        cur.execute("CREATE UNIQUE INDEX temp._running_id ON _running(id)")
+        cur.execute(f"UPDATE {book} SET balance = (SELECT running FROM temp._running r WHERE r.id = {book}.id)")
+        cur.execute("DROP TABLE temp._running")
+        cur.execute(
+            f"INSERT OR REPLACE INTO book_balances (book, balance) "
+            f"SELECT '{book}', COALESCE(SUM({row}), 0) FROM {book}"
+        )
+
+
+_M006_TABLES = (
+    "users", "user_permissions", "products", "ledger", "sales", "sale_items", "returns",
+    "cashbook", "bankbook", "investors", "investor_transactions", "settings",
+)
+
+
+def _m006_change_journal(cur) -> None:
+    cur.execute(
+        "CREATE TABLE IF NOT EXISTS data_versions ("
+        "tbl TEXT PRIMARY KEY, version INTEGER NOT NULL DEFAULT 0) WITHOUT ROWID"
+    )
+    for table in _M006_TABLES:
+        cur.execute("INSERT OR IGNORE INTO data_versions (tbl, version) VALUES (?, 0)", (table,))
+        for suffix, event in (("ai", "INSERT"), ("au", "UPDATE"), ("ad", "DELETE")):
+            cur.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {table}_dv_{suffix} AFTER {event} ON {table} BEGIN "
+                f"UPDATE data_versions SET version = version + 1 WHERE tbl = '{table}'; END"
+            )
+
+
+def _m007_held_carts(cur) -> None:
+    cur.execute(
+        "CREATE TABLE IF NOT EXISTS held_carts ("
+        "till TEXT NOT NULL, name TEXT NOT NULL, items TEXT NOT NULL, parked_at TEXT NOT NULL, "
+        "PRIMARY KEY (till, name)) WITHOUT ROWID"
+    )
+
+
+def _m008_cart_journal(cur) -> None:
+    cols = _columns(cur, "held_carts")
+    if "active" not in cols:
+        cur.execute("ALTER TABLE held_carts ADD COLUMN active INTEGER NOT NULL DEFAULT 0")
+    if "rev" not in cols:
+        cur.execute("ALTER TABLE held_carts ADD COLUMN rev INTEGER NOT NULL DEFAULT 0")
+
+
+# Append new steps at the end; never reorder or edit a released step.
+MIGRATIONS: List[Callable] = [
+    _m001_baseline,
+    _m002_indexes,
+    _m003_products_fts,
+    _m004_sales_rollup,
+    _m005_running_balances,
+    _m006_change_journal,
+    _m007_held_carts,
+    _m008_cart_journal,
+]
+
+
+def schema_version() -> int:
+    return int(db.scalar("PRAGMA user_version", default=0))
+
+
+def latest_version() -> int:
+    return len(MIGRATIONS)
+
+
+def migrate(target: Optional[int] = None) -> int:
+    """Apply pending migrations up to target (default: latest) and return
+    the resulting schema version. Cheap no-op when already up to date."""
+    target = latest_version() if target is None else min(target, latest_version())
+    version = schema_version()
+    while version < target:
+        with db.transaction("IMMEDIATE") as cur:
+            # Re-read under the write lock: another process may have
+            # migrated between our check and BEGIN IMMEDIATE.
+            version = int(cur.execute("PRAGMA user_version").fetchone()[0])
+            if version >= target:
+                break
+            MIGRATIONS[version](cur)
+            cur.execute(f"PRAGMA user_version = {version + 1}")
+        version += 1
+    return version
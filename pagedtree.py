@@ -0,0 +1,214 @@
+"""Windowed Treeview backed by keyset pagination.
+
+PagedTree keeps only a few pages of rows in the widget. Scrolling near
+the bottom fetches the next page with `WHERE (k1, k2) < (?, ?)` (or `>`
+for ascending lists) and drops pages from the top once the window is
+full; scrolling back up does the reverse. Each fetch is an index range
+scan of one page, so cost and memory are the same for 500 rows or 500k.
+
+    self.pager = PagedTree(self.tree, Keyset(
+        "SELECT id, date, amount FROM ledger", ("date", "id"), where="type = ?", params=("gelir",)),
+        key=lambda r: (r[1], r[0]))
+    self.pager.reset()
+    self.pager.jump_to_date("2024-05-01")  # rows dated 2024-05-01 and earlier
+"""
+import tkinter as tk
+from datetime import date, timedelta
+from typing import Callable, List, Optional, Sequence, Tuple
+
+import db
+from ui import sync_tree
+
+PAGE_SIZE = 100
+MAX_PAGES = 4
+# Fetch when the view is this close (fraction of loaded rows) to an edge
+_EDGE = 0.1
+
+
+class Keyset:
+    """Builds one-page queries ordered by `keys` (descending by default)."""
+
+    def __init__(self, select: str, keys: Sequence[str], descending: bool = True,
+                 where: str = "", params: Sequence = ()) -> None:
+        self.select = select
+        self.keys = tuple(keys)
+        self.descending = descending
+        self.where = where
+        self.params = tuple(params)
+
+    def _sql(self, after: Optional[tuple], forward: bool) -> Tuple[str, tuple]:
+        # forward = display order; backward fetches the rows before `after`
+        # in reverse and the caller flips them.
+        desc = self.descending if forward else not self.descending
+        conds, params = [], list(self.params)
+        if self.where:
+            conds.append(f"({self.where})")
+        if after is not None:
+            cols = ", ".join(self.keys)
+            marks = ", ".join("?" * len(self.keys))
+            conds.append(f"({cols}) {'<' if desc else '>'} ({marks})")
+            params.extend(after)
+        order = ", ".join(f"{k} {'DESC' if desc else 'ASC'}" for k in self.keys)
+        sql = self.select + (" WHERE " + " AND ".join(conds) if conds else "") + f" ORDER BY {order} LIMIT ?"
+        return sql, tuple(params)
+
+    def page(self, after: Optional[tuple] = None, limit: int = PAGE_SIZE, forward: bool = True) -> List[tuple]:
+        """Up to `limit` rows following `after` in display order (preceding
+        it when forward is False; still returned in display order)."""
+        sql, params = self._sql(after, forward)
+        rows = db.query(sql, params + (int(limit),))
+        return rows if forward else rows[::-1]
+
+
+class PagedTree:
+    def __init__(self, tree, keyset: Keyset, key: Callable[[tuple], tuple],
+                 values: Callable[[tuple], tuple] = tuple, page_size: int = PAGE_SIZE,
+                 max_pages: int = MAX_PAGES) -> None:
+        self.tree = tree
+        self.keyset = keyset
+        self.key = key
+        self.values = values
+        self.page_size = page_size
+        self.max_rows = page_size * max_pages
+        self._keys = {}  # iid -> key
+        self._more_before = False
+        self._more_after = False
+        self._busy = False
+        self._pending = None
+        # Wrap the existing scroll command (a scrollbar's set, if any)
+        self._scroll_cmd = tree.cget("yscrollcommand") or None
+        tree.configure(yscrollcommand=self._on_yview)
+
+    # --- public ---
+    def reset(self, keyset: Optional[Keyset] = None, first_rows: Optional[List[tuple]] = None) -> None:
+        """Reload from the top. first_rows may carry the first page when
+        it was already fetched (e.g. on the DB worker)."""
+        if keyset is not None:
+            self.keyset = keyset
+        rows = first_rows if first_rows is not None else self.keyset.page(None, self.page_size)
+        self._show(rows)
+        self._more_before = False
+        self._more_after = len(rows) >= self.page_size
+        try:
+            self.tree.yview_moveto(0)
+        except tk.TclError:
+            pass
+
+    def jump_to(self, key: tuple) -> None:
+        """Show the rows that follow `key` in display order."""
+        rows = self.keyset.page(tuple(key), self.page_size)
+        self._show(rows)
+        self._more_before = True
+        self._more_after = len(rows) >= self.page_size
+        try:
+            self.tree.yview_moveto(0)
+        except tk.TclError:
+            pass
+
+    def jump_to_date(self, day: str) -> None:
+        """For lists keyed by (date, ...): show `day` first. Descending lists
+        continue with earlier days, ascending ones with later days."""
+        d = date.fromisoformat(day.strip()[:10])
+        if self.keyset.descending:
+            d += timedelta(days=1)
+        self.jump_to((d.isoformat(),) + (0,) * (len(self.keyset.keys) - 1))
+
+    def reload(self) -> None:
+        """Re-read the current window in place (after an edit)."""
+        kids = self.tree.get_children()
+        start = None
+        if kids and self._more_before:
+            # Start just before the current first row
+            before = self.keyset.page(self._keys.get(kids[0]), 1, forward=False)
+            start = self.key(before[0]) if before else None
+        rows = self.keyset.page(start, max(len(kids), self.page_size))
+        # Diffed in place: unchanged rows, selection and scroll stay put
+        self._show(rows)
+        self._more_before = start is not None
+        self._more_after = len(rows) >= max(len(kids), self.page_size)
+
+    def key_of(self, iid) -> Optional[tuple]:
+        return self._keys.get(iid)
+
+    # --- internals ---
+    @staticmethod
+    def _iid(key: tuple) -> str:
+        return "\x1f".join(map(str, key))
+
+    def _show(self, rows: List[tuple]) -> None:
+        sync_tree(self.tree, rows, key=lambda r: self._iid(self.key(r)), values=self.values)
+        self._keys = {self._iid(self.key(r)): self.key(r) for r in rows}
+
+    def _insert(self, index, r: tuple) -> None:
+        k = self.key(r)
+        iid, vals = self._iid(k), tuple(self.values(r))
+        self.tree.insert("", index, iid=iid, values=vals)
+        self.tree.__dict__.setdefault('_sync_values', {})[iid] = vals
+        self._keys[iid] = k
+
+    def _append(self, rows: List[tuple]) -> None:
+        for r in rows:
+            self._insert("end", r)
+
+    def _prepend(self, rows: List[tuple]) -> None:
+        for r in reversed(rows):
+            self._insert(0, r)
+
+    def _drop(self, iids) -> None:
+        if iids:
+            self.tree.delete(*iids)
+            cache = self.tree.__dict__.get('_sync_values', {})
+            for iid in iids:
+                self._keys.pop(iid, None)
+                cache.pop(iid, None)
+
+    def _on_yview(self, first, last) -> None:
+        if self._scroll_cmd:
+            try:
+                self.tree.tk.call(*self.tree.tk.splitlist(self._scroll_cmd), first, last)
+            except tk.TclError:
+                pass
+        if self._busy or self._pending is not None:
+            return
+        first, last = float(first), float(last)
+        if last >= 1.0 - _EDGE and self._more_after:
+            self._pending = self.tree.after_idle(self._load_after)
+        elif first <= _EDGE and self._more_before:
+            self._pending = self.tree.after_idle(self._load_before)
+
+    def _load_after(self) -> None:
+        self._pending = None
+        kids = self.tree.get_children()
+        if not kids:
+            return
+        self._busy = True
+        try:
+            rows = self.keyset.page(self._keys[kids[-1]], self.page_size)
+            self._more_after = len(rows) >= self.page_size
+            self._append(rows)
+            extra = len(kids) + len(rows) - self.max_rows
+            if extra > 0:
+                self._drop(kids[:extra])
+                self._more_before = True
+                # Treeview scrolls in rows; keep the same rows in view
+                self.tree.yview_scroll(-extra, "units")
+        finally:
+            self._busy = False
+
+    def _load_before(self) -> None:
+        self._pending = None
+        kids = self.tree.get_children()
+        if not kids:
+            return
+        self._busy = True
+        try:
+            rows = self.keyset.page(self._keys[kids[0]], self.page_size, forward=False)
+            self._more_before = len(rows) >= self.page_size
+            self._prepend(rows)
+            self.tree.yview_scroll(len(rows), "units")
+            extra = len(kids) + len(rows) - self.max_rows
+            if extra > 0:
+                self._drop(kids[len(kids) - extra:])
+                self._more_after = True
+        finally:
+            self._busy = False
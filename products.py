@@ -3,8 +3,16 @@ import tkinter as tk
 from tkinter import messagebox
 from tkinter import ttk
 from ui import make_back_arrow, tinted_bg
+import db
+import search
+import changes
+from pagedtree import Keyset, PagedTree
+from services import catalog
 
-DB_NAME = "coop.db"
+
+def _product_values(r) -> tuple:
+    pid, name, barcode, price, cost, stock, unit = r
+    return (pid, name, barcode or "", f"{price:.2f}", f"{cost:.2f}", f"{stock:g}", unit)
 
 
 class ProductsFrame(tk.Frame):
@@ -98,6 +106,9 @@ class ProductsFrame(tk.Frame):
         self.btn_delete = ttk.Button(btns, text="Sil", command=self.delete_product)
         self.btn_delete.pack(side="left")
 
+        # Reload in place when products change elsewhere while shown
+        self._watch = changes.watch(self, ("products",), on_change=self._reload)
+        self._keyword = ""
         self.refresh()
 
     # --- Add Product via Dialog ---
@@ -159,14 +170,12 @@ class ProductsFrame(tk.Frame):
             stock = self._parse_float((e_stock.get() or '').strip(), 0.0)
             unit = (cb_unit.get() or 'adet').strip()
             try:
-                conn = sqlite3.connect(DB_NAME)
-                cur = conn.cursor()
-                cur.execute(
-                    "INSERT INTO products (name, barcode, price, cost, stock, unit) VALUES (?, ?, ?, ?, ?, ?)",
-                    (name, barcode, price, cost, stock, unit),
-                )
-                conn.commit()
-                conn.close()
+                with db.transaction() as cur:
+                    cur.execute(
+                        "INSERT INTO products (name, barcode, price, cost, stock, unit) VALUES (?, ?, ?, ?, ?, ?)",
+                        (name, barcode, price, cost, stock, unit),
+                    )
+                catalog.invalidate(cur.lastrowid)
             except sqlite3.IntegrityError:
                 messagebox.showerror("Hata", "Barkod benzersiz olmalıdır.", parent=top)
                 return
@@ -218,7 +227,10 @@ class ProductsFrame(tk.Frame):
                 self.tree.selection_remove(sel)
         except Exception:
             pass
-        self.refresh()
+        # The search box was just cleared; reload only if the list is
+        # filtered or products changed since it was loaded
+        if self._watch.consume() or self._keyword:
+            self.refresh()
         self.refresh_style()
 
     def refresh_style(self):
@@ -267,25 +279,21 @@ class ProductsFrame(tk.Frame):
 
     # --- CRUD ---
     def refresh(self, keyword: str = "") -> None:
-        for row in self.tree.get_children():
-            self.tree.delete(row)
-        conn = sqlite3.connect(DB_NAME)
-        cur = conn.cursor()
-        if keyword:
-            kw = f"%{keyword}%"
-            cur.execute(
-                "SELECT id, name, barcode, price, cost, stock, unit FROM products WHERE name LIKE ? OR barcode LIKE ? ORDER BY id",
-                (kw, kw),
-            )
-        else:
-            cur.execute("SELECT id, name, barcode, price, cost, stock, unit FROM products ORDER BY id")
-        for pid, name, barcode, price, cost, stock, unit in cur.fetchall():
-            self.tree.insert(
-                "",
-                "end",
-                values=(pid, name, barcode or "", f"{price:.2f}", f"{cost:.2f}", f"{stock:g}", unit),
-            )
-        conn.close()
+        self._watch.consume()
+        self._keyword = keyword
+        cond, params = search.product_filter(keyword) if keyword else ("", ())
+        # Rows are paged in by id as the list scrolls (see pagedtree.py)
+        keyset = Keyset(
+            "SELECT p.id, p.name, p.barcode, p.price, p.cost, p.stock, p.unit FROM products p",
+            ("p.id",), descending=False, where=cond, params=params,
+        )
+        if getattr(self, 'pager', None) is None:
+            self.pager = PagedTree(self.tree, keyset, key=lambda r: (r[0],), values=_product_values)
+        self.pager.reset(keyset)
+
+    def _reload(self) -> None:
+        self._watch.consume()
+        self.pager.reload()
 
     def on_select(self, _event=None) -> None:
         sel = self.tree.selection()
@@ -319,17 +327,15 @@ class ProductsFrame(tk.Frame):
             messagebox.showwarning("Eksik bilgi", "İsim gerekli.")
             return
         try:
-            conn = sqlite3.connect(DB_NAME)
-            cur = conn.cursor()
-            cur.execute(
-                "INSERT INTO products (name, barcode, price, cost, stock, unit) VALUES (?, ?, ?, ?, ?, ?)",
-                (name, barcode, price, cost, stock, unit),
-            )
-            conn.commit()
+            with db.transaction() as cur:
+                cur.execute(
+                    "INSERT INTO products (name, barcode, price, cost, stock, unit) VALUES (?, ?, ?, ?, ?, ?)",
+                    (name, barcode, price, cost, stock, unit),
+                )
+            catalog.invalidate(cur.lastrowid)
         except sqlite3.IntegrityError:
             messagebox.showerror("Hata", "Barkod benzersiz olmalıdır.")
         finally:
-            conn.close()
             self.refresh()
 
     def update_product(self) -> None:
@@ -346,19 +352,18 @@ class ProductsFrame(tk.Frame):
         if not name:
             messagebox.showwarning("Eksik bilgi", "Ä°sim gerekli.")
             return
-        conn = sqlite3.connect(DB_NAME)
-        cur = conn.cursor()
         try:
-            cur.execute(
-                "UPDATE products SET name = ?, barcode = ?, price = ?, cost = ?, stock = ?, unit = ? WHERE id = ?",
-                (name, barcode, price, cost, stock, unit, pid),
-            )
-            conn.commit()
+            with db.transaction() as cur:
+                cur.execute(
+                    "UPDATE products SET name = ?, barcode = ?, price = ?, cost = ?, stock = ?, unit = ? WHERE id = ?",
+                    (name, barcode, price, cost, stock, unit, pid),
+                )
+            catalog.invalidate(pid)
         except sqlite3.IntegrityError:
             messagebox.showerror("Hata", "Barkod benzersiz olmalÄ±dÄ±r.")
         finally:
-            conn.close()
-            self.refresh()
+            # Only the edited row changes; keep scroll, selection and filter
+            self._reload()
 
     def delete_product(self) -> None:
         pid = self._selected_id()
@@ -367,12 +372,10 @@ class ProductsFrame(tk.Frame):
             return
         if not messagebox.askyesno("Onay", "SeÃ§ili Ã¼rÃ¼nÃ¼ silmek istiyor musunuz?"):
             return
-        conn = sqlite3.connect(DB_NAME)
-        cur = conn.cursor()
-        cur.execute("DELETE FROM products WHERE id = ?", (pid,))
-        conn.commit()
-        conn.close()
-        self.refresh()
+        with db.transaction() as cur:
+            cur.execute("DELETE FROM products WHERE id = ?", (pid,))
+        catalog.invalidate(pid)
+        self._reload()
 
     # --- Search ---
     def search(self) -> None:
@@ -411,31 +414,24 @@ def _pf_add_product(self) -> None:
         messagebox.showwarning("Eksik bilgi", "İsim gerekli.")
         return
     ins_id = None
-    conn = None
     try:
-        conn = sqlite3.connect(DB_NAME)
-        cur = conn.cursor()
-        cur.execute(
-            "INSERT INTO products (name, barcode, price, cost, stock, unit) VALUES (?, ?, ?, ?, ?, ?)",
-            (name, barcode, price, cost, stock, unit),
-        )
-        conn.commit()
-        try:
-            ins_id = cur.lastrowid
-        except Exception:
-            ins_id = None
+        with db.transaction() as cur:
+            cur.execute(
+                "INSERT INTO products (name, barcode, price, cost, stock, unit) VALUES (?, ?, ?, ?, ?, ?)",
+                (name, barcode, price, cost, stock, unit),
+            )
+            try:
+                ins_id = cur.lastrowid
+            except Exception:
+                ins_id = None
+        if ins_id:
+            catalog.invalidate(ins_id)
     except sqlite3.IntegrityError:
         messagebox.showerror("Hata", "Barkod benzersiz olmalıdır.")
         return
     except Exception as e:
         messagebox.showerror("Hata", str(e))
         return
-    finally:
-        try:
-            if conn:
-                conn.close()
-        except Exception:
-            pass
 
     # Clear form and refresh list
     try:
@@ -447,15 +443,10 @@ def _pf_add_product(self) -> None:
     # Select and scroll to the newly added product
     try:
         if ins_id:
-            target = None
-            for iid in self.tree.get_children():
-                vals = self.tree.item(iid, "values")
-                if str(vals[0]) == str(ins_id):
-                    target = iid
-                    break
-            if target is None:
-                kids = self.tree.get_children()
-                target = kids[-1] if kids else None
+            # The list only holds a window of rows; start it at the new id
+            self.pager.jump_to((int(ins_id) - 1,))
+            kids = self.tree.get_children()
+            target = kids[0] if kids else None
             if target:
                 # Only scroll into view; do not select to avoid refilling inputs
                 self.tree.see(target)
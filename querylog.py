@@ -0,0 +1,242 @@
+"""Per-statement timing for every query issued through db.py.
+
+db.py opens its connections with the Connection class below, so every
+execute/executemany (including cursors yielded by db.transaction() and
+db.get_conn().cursor()) is timed, counted and tagged with the code that
+issued it, e.g. `SalesFrame._on_scan_key` or `services.checkout.complete_sale`.
+Jobs run through worker.call() are tagged with the frame method that
+submitted them. Fetches on the same cursor are added to the statement's
+time.
+
+Statements slower than SLOW_MS are written with their EXPLAIN QUERY PLAN
+to logs/slow_queries.log (rotated at 1 MB, three old files kept).
+summary() returns the aggregated counters for the Settings screen.
+Set COOP_QUERYLOG=0 to turn the timing off (it costs a few microseconds
+per statement).
+"""
+import logging
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from logging.handlers import RotatingFileHandler
+from typing import Dict, List, NamedTuple, Optional
+
+ENABLED = os.environ.get("COOP_QUERYLOG", "1") != "0"
+SLOW_MS = 100.0
+LOG_PATH = os.path.join("logs", "slow_queries.log")
+LOG_BYTES = 1024 * 1024
+LOG_BACKUPS = 3
+# Longest SQL text kept per counter
+_SQL_CHARS = 400
+
+_lock = threading.Lock()
+_local = threading.local()
+# (tag, sql) -> [count, total seconds, max seconds, slow count]
+_stats: Dict[tuple, list] = {}
+_norm_cache: Dict[str, str] = {}
+_logger: Optional[logging.Logger] = None
+
+# Frames in these files are never the "caller"
+_SKIP_FILES = {os.path.abspath(__file__)}
+_PLANNABLE = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE", "REPLACE")
+
+
+class QueryStat(NamedTuple):
+    tag: str
+    sql: str
+    count: int
+    total_ms: float
+    avg_ms: float
+    max_ms: float
+    slow: int
+
+
+def skip_file(path: str) -> None:
+    """Treat frames from `path` as plumbing when looking for the caller."""
+    _SKIP_FILES.add(os.path.abspath(path))
+
+
+def caller() -> str:
+    """Tag of the nearest frame outside db/worker plumbing."""
+    f = sys._getframe(1)
+    while f is not None and f.f_code.co_filename in _SKIP_FILES:
+        f = f.f_back
+    if f is None:
+        return "?"
+    code = f.f_code
+    name = getattr(code, "co_qualname", code.co_name)
+    if "." in name:
+        return name  # Class.method
+    return f"{f.f_globals.get('__name__', '?')}.{name}"
+
+
+def set_context(tag: Optional[str]) -> None:
+    """Tag this thread's statements with `tag` until reset to None (used by
+    the DB worker for the frame method that submitted a job)."""
+    _local.tag = tag
+
+
+def _tag() -> str:
+    return getattr(_local, "tag", None) or caller()
+
+
+def _norm(sql: str) -> str:
+    n = _norm_cache.get(sql)
+    if n is None:
+        n = re.sub(r"\s+", " ", sql).strip()[:_SQL_CHARS]
+        if len(_norm_cache) < 4096:
+            _norm_cache[sql] = n
+    return n
+
+
+def _log() -> logging.Logger:
+    global _logger
+    if _logger is None:
+        logger = logging.getLogger("coop.slow_sql")
+        logger.propagate = False
+        try:
+            os.makedirs(os.path.dirname(LOG_PATH) or ".", exist_ok=True)
+            handler = RotatingFileHandler(LOG_PATH, maxBytes=LOG_BYTES, backupCount=LOG_BACKUPS, encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+            logger.addHandler(handler)
+        except OSError:
+            logger.addHandler(logging.NullHandler())
+        logger.setLevel(logging.INFO)
+        _logger = logger
+    return _logger
+
+
+def _plan(conn, sql: str, params) -> str:
+    if not sql.lstrip()[:7].upper().startswith(_PLANNABLE):
+        return ""
+    try:
+        rows = sqlite3.Connection.execute(conn, "EXPLAIN QUERY PLAN " + sql, params).fetchall()
+    except sqlite3.Error as e:
+        return f"  (plan unavailable: {e})"
+    return "\n".join(f"  {r[-1]}" for r in rows)
+
+
+def _slow(conn, tag: str, sql: str, params, elapsed: float) -> None:
+    plan = _plan(conn, sql, params) if params is not None else ""
+    try:
+        _log().info("%.1f ms %s\n  %s%s", elapsed * 1000.0, tag, _norm(sql), "\n" + plan if plan else "")
+    except Exception:
+        pass
+
+
+class Cursor(sqlite3.Cursor):
+    _q = None  # [stats entry, seconds so far, sql, params, logged, tag]
+
+    def _begin(self, sql: str, params, elapsed: float) -> None:
+        key = (_tag(), _norm(sql))
+        with _lock:
+            s = _stats.get(key)
+            if s is None:
+                s = _stats[key] = [0, 0.0, 0.0, 0]
+            s[0] += 1
+            s[1] += elapsed
+            if elapsed > s[2]:
+                s[2] = elapsed
+        self._q = [s, elapsed, sql, params, False, key[0]]
+        self._check()
+
+    def _more(self, elapsed: float) -> None:
+        q = self._q
+        if q is None:
+            return
+        q[1] += elapsed
+        s = q[0]
+        with _lock:
+            s[1] += elapsed
+            if q[1] > s[2]:
+                s[2] = q[1]
+        self._check()
+
+    def _check(self) -> None:
+        q = self._q
+        if not q[4] and q[1] * 1000.0 >= SLOW_MS:
+            q[4] = True
+            with _lock:
+                q[0][3] += 1
+            _slow(self.connection, q[5], q[2], q[3], q[1])
+
+    def execute(self, sql, parameters=()):
+        if not ENABLED:
+            return super().execute(sql, parameters)
+        t0 = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._begin(sql, parameters, time.perf_counter() - t0)
+
+    def executemany(self, sql, seq_of_parameters):
+        if not ENABLED:
+            return super().executemany(sql, seq_of_parameters)
+        t0 = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            # No single parameter set to plan with
+            self._begin(sql, None, time.perf_counter() - t0)
+
+    def fetchone(self):
+        t0 = time.perf_counter()
+        try:
+            return super().fetchone()
+        finally:
+            self._more(time.perf_counter() - t0)
+
+    def fetchmany(self, size=None):
+        t0 = time.perf_counter()
+        try:
+            return super().fetchmany(self.arraysize if size is None else size)
+        finally:
+            self._more(time.perf_counter() - t0)
+
+    def fetchall(self):
+        t0 = time.perf_counter()
+        try:
+            return super().fetchall()
+        finally:
+            self._more(time.perf_counter() - t0)
+
+
+class Connection(sqlite3.Connection):
+    """sqlite3 connection whose cursors are instrumented Cursors."""
+
+    def cursor(self, factory=Cursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def summary(order: str = "total_ms", limit: int = 100) -> List[QueryStat]:
+    """Counters since start (or reset()), largest `order` first."""
+    with _lock:
+        items = [(k, list(v)) for k, v in _stats.items()]
+    out = [
+        QueryStat(tag, sql, c, t * 1000.0, t * 1000.0 / c if c else 0.0, m * 1000.0, slow)
+        for (tag, sql), (c, t, m, slow) in items
+    ]
+    out.sort(key=lambda s: getattr(s, order), reverse=True)
+    return out[:limit]
+
+
+def reset() -> None:
+    with _lock:
+        _stats.clear()
+
+
+def format_summary(stats: List[QueryStat]) -> str:
+    lines = [f"{'count':>7} {'total ms':>10} {'avg ms':>8} {'max ms':>8} {'slow':>5}  tag / sql"]
+    for s in stats:
+        lines.append(f"{s.count:7d} {s.total_ms:10.1f} {s.avg_ms:8.2f} {s.max_ms:8.1f} {s.slow:5d}  {s.tag}")
+        lines.append(f"{'':42}{s.sql[:160]}")
+    return "\n".join(lines)
@@ -0,0 +1,125 @@
+"""EXPLAIN QUERY PLAN self-check for the app's hot queries.
+
+Each canonical query is expected to be served by an index (see
+migrations.INDEXES). check_query_plans() reports the ones whose plan falls
+back to a full table scan or a full sort.
+
+    python queryplan.py [path/to/coop.db]
+"""
+import sys
+from typing import List, Tuple
+
+import db
+from services import returns
+
+# (name, sql, sample params). Params only need the right shape.
+CANONICAL_QUERIES: List[Tuple[str, str, tuple]] = [
+    ("product_by_barcode",
+     "SELECT id, name, barcode, price, stock, unit FROM products WHERE barcode = ?",
+     ("0",)),
+    ("product_by_id",
+     "SELECT id, name, barcode, price, stock, unit FROM products WHERE id = ?",
+     (0,)),
+    ("sale_lines_by_sale",
+     "SELECT product_id, SUM(quantity), price FROM sale_items WHERE sale_id = ? GROUP BY product_id",
+     (0,)),
+    ("returnable_for_product",
+     returns._RETURNABLE.format(where="si.product_id = ?"),
+     (0,)),
+    ("returnable_for_sale",
+     returns._RETURNABLE.format(where="si.sale_id = ?"),
+     (0,)),
+    ("returns_by_original",
+     "SELECT return_sale_id FROM returns WHERE original_sale_id = ?",
+     (0,)),
+    ("daily_sales",
+     "SELECT id, strftime('%H:%M', date), total FROM sales WHERE date >= ? AND date < date(?, '+1 day') ORDER BY date, id",
+     ("2000-01-01", "2000-01-01")),
+    ("sales_rollup",
+     "SELECT substr(day, 1, 7) AS period, SUM(sale_count), SUM(net) FROM sales_daily "
+     "WHERE day >= ? AND day < ? GROUP BY period ORDER BY period",
+     ("2000-01-01", "2000-02-01")),
+    # pagedtree.Keyset pages: first page, then (date, id) < last key
+    ("ledger_page",
+     "SELECT id, date, type, amount FROM ledger WHERE (type = ?) AND (date, id) < (?, ?) "
+     "ORDER BY date DESC, id DESC LIMIT 100",
+     ("gelir", "2000-01-01", 0)),
+    ("cashbook_page",
+     "SELECT date, type, amount, COALESCE(description,''), balance FROM cashbook "
+     "WHERE (date, id) < (?, ?) ORDER BY date DESC, id DESC LIMIT 100",
+     ("2000-01-01", 0)),
+    ("bankbook_page",
+     "SELECT date, type, amount, COALESCE(description,''), balance FROM bankbook "
+     "ORDER BY date DESC, id DESC LIMIT 100",
+     ()),
+    ("products_page",
+     "SELECT p.id, p.name FROM products p WHERE (p.id) > (?) ORDER BY p.id ASC LIMIT 100",
+     (0,)),
+    ("cashbook_prev_balance",
+     "SELECT balance FROM cashbook WHERE (date, id) < (?, ?) ORDER BY date DESC, id DESC LIMIT 1",
+     ("2000-01-01", 0)),
+    ("investor_transactions",
+     "SELECT id, date, type, amount FROM investor_transactions WHERE investor_id = ? ORDER BY date DESC, id DESC",
+     (0,)),
+    # search.search_products also sorts, but only the matched rows.
+    ("product_search",
+     "SELECT p.id, p.name FROM products p WHERE p.id IN "
+     "(SELECT rowid FROM products_fts WHERE products_fts MATCH ?)",
+     ('"seker"',)),
+    ("inventory_by_name",
+     "SELECT name, COALESCE(barcode,''), stock, unit, price, cost FROM products ORDER BY name",
+     ()),
+]
+
+
+def explain(sql: str, params: tuple = ()) -> List[str]:
+    """Return the plan detail lines for sql."""
+    return [r[3] for r in db.query("EXPLAIN QUERY PLAN " + sql, params)]
+
+
+def _problems(details: List[str]) -> List[str]:
+    bad = []
+    # CTEs are materialized from an index search; scanning that result is fine.
+    ctes = {d.split()[1] for d in details if d.startswith("MATERIALIZE ")}
+    for d in details:
+        # "SCAN t" is a full scan; "SCAN t USING [COVERING] INDEX i" walks an
+        # index in order, which is what the ORDER BY ... LIMIT queries want.
+        # Virtual tables (FTS5) report their own index as "VIRTUAL TABLE INDEX".
+        if d.startswith("SCAN ") and "USING" not in d and "VIRTUAL TABLE" not in d and d.split()[1] not in ctes:
+            bad.append(d)
+        # A sort over the whole table defeats ORDER BY ... LIMIT. GROUP BY
+        # temp trees after an index SEARCH only cover the matched rows.
+        elif d.startswith("USE TEMP B-TREE FOR ORDER BY"):
+            bad.append(d)
+    return bad
+
+
+def check_query_plans(queries=None) -> List[Tuple[str, List[str]]]:
+    """Run EXPLAIN QUERY PLAN over the canonical queries and return
+    (name, offending plan lines) for every query that does not use an index.
+    An empty list means all plans are index-backed."""
+    report = []
+    for name, sql, params in (queries or CANONICAL_QUERIES):
+        try:
+            bad = _problems(explain(sql, params))
+        except Exception as e:
+            bad = [f"error: {e}"]
+        if bad:
+            report.append((name, bad))
+    return report
+
+
+def main(argv=None) -> int:
+    argv = list(sys.argv[1:] if argv is None else argv)
+    if argv:
+        db.configure(path=argv[0])
+    report = check_query_plans()
+    for name, bad in report:
+        print(f"{name}: " + "; ".join(bad))
+    if not report:
+        print(f"OK: {len(CANONICAL_QUERIES)} queries use indexes")
+    return 1 if report else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,34 +1,46 @@
-﻿import sqlite3
-import tkinter as tk
+﻿import tkinter as tk
 from tkinter import ttk
 from tkinter import messagebox
 from datetime import date, timedelta, datetime
 import tempfile
 import webbrowser
 import os
-from ui import make_back_arrow
+from ui import make_back_arrow, sync_tree
 from typing import Optional, Tuple, List
-
-DB_NAME = "coop.db"
+import changes
+import db
+import rollup
+from pagedtree import Keyset, PagedTree
+import worker
+from services import cash
 
 try:
     from tkcalendar import DateEntry as _DateEntry  # type: ignore
 except Exception:
     _DateEntry = None  # type: ignore
 
-# Optional PDF support via reportlab
-try:
-    from reportlab.lib.pagesizes import A4
-    from reportlab.lib import colors
-    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-    from reportlab.lib.styles import getSampleStyleSheet
-    from reportlab.pdfbase import pdfmetrics
-    from reportlab.pdfbase.ttfonts import TTFont
-    from reportlab.pdfbase.pdfmetrics import registerFont
-    from reportlab.lib.fonts import addMapping
-    _PDF_AVAILABLE = True
-except Exception:
-    _PDF_AVAILABLE = False
+# Optional PDF support via reportlab. Imported on the first export, not at
+# startup: reportlab is the slowest import in the app.
+_PDF_AVAILABLE: Optional[bool] = None
+
+
+def _load_pdf() -> bool:
+    global _PDF_AVAILABLE, A4, colors, SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+    global getSampleStyleSheet, pdfmetrics, TTFont, registerFont, addMapping
+    if _PDF_AVAILABLE is None:
+        try:
+            from reportlab.lib.pagesizes import A4
+            from reportlab.lib import colors
+            from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+            from reportlab.lib.styles import getSampleStyleSheet
+            from reportlab.pdfbase import pdfmetrics
+            from reportlab.pdfbase.ttfonts import TTFont
+            from reportlab.pdfbase.pdfmetrics import registerFont
+            from reportlab.lib.fonts import addMapping
+            _PDF_AVAILABLE = True
+        except Exception:
+            _PDF_AVAILABLE = False
+    return _PDF_AVAILABLE
 
 # Preferred PDF fonts for Turkish
 _PDF_FONT_REGULAR = None  # type: ignore
@@ -39,7 +51,7 @@ def _ensure_turkish_pdf_font() -> Tuple[Optional[str], Optional[str]]:
     Returns (regular_name, bold_name) or (None, None) on failure.
     """
     global _PDF_FONT_REGULAR, _PDF_FONT_BOLD
-    if not _PDF_AVAILABLE:
+    if not _load_pdf():
         return (None, None)
     if _PDF_FONT_REGULAR and _PDF_FONT_BOLD:
         return (_PDF_FONT_REGULAR, _PDF_FONT_BOLD)
@@ -216,6 +228,84 @@ def _ensure_turkish_pdf_font() -> Tuple[Optional[str], Optional[str]]:
     return (None, None)
 
 
+# --- Data loaders (run on the DB worker thread; no Tk calls) ---
+_PERIODS = ("Günlük", "Haftalık", "Aylık")
+
+
+def _period_range(kind: str, day: str) -> Tuple[str, str]:
+    """[start, end) day range of the period containing `day`."""
+    d = date.fromisoformat(day)
+    if kind == "Haftalık":
+        start = d - timedelta(days=d.weekday())
+        end = start + timedelta(days=7)
+    elif kind == "Aylık":
+        start = d.replace(day=1)
+        end = (start + timedelta(days=32)).replace(day=1)
+    else:
+        start, end = d, d + timedelta(days=1)
+    return start.isoformat(), end.isoformat()
+
+
+def _load_daily(day: str):
+    # Range on the raw column (not date(date)=?) so idx_sales_date is used
+    rng = (day, day)
+    rows = db.query("SELECT id, strftime('%H:%M', date), total FROM sales WHERE date >= ? AND date < date(?, '+1 day') ORDER BY date, id", rng)
+    total = rollup.totals(*_period_range("Günlük", day))[4]
+    return rows, total
+
+
+def _load_period(kind: str, day: str):
+    """Per-day rows and net total of a week/month, from the sales_daily rollup."""
+    start, end = _period_range(kind, day)
+    return rollup.summary(start, end, "day"), rollup.totals(start, end)[4]
+
+
+_BOOK_KEYSETS = {
+    book: Keyset(f"SELECT id, date, type, amount, COALESCE(description,''), balance FROM {book}", ("date", "id"))
+    for book in ("cashbook", "bankbook")
+}
+
+
+def _load_cash():
+    # Totals and per-row balances are kept by triggers (balances.py); the
+    # lists get their first page here and page in the rest on scroll.
+    cash_total = cash.balance("cashbook")
+    bank_total = cash.balance("bankbook")
+    cash_rows = _BOOK_KEYSETS["cashbook"].page()
+    bank_rows = _BOOK_KEYSETS["bankbook"].page()
+    return cash_total, bank_total, cash_rows, bank_rows
+
+
+def _book_type(ctx: str, t: str) -> str:
+    if ctx == 'cash':
+        return "Kasaya Giriş" if t == 'in' else ("Kasadan Çıkış" if t == 'out' else str(t))
+    if ctx == 'bank':
+        return "Bankaya Giriş" if t == 'in' else ("Bankadan Çıkış" if t == 'out' else str(t))
+    return "Giriş" if t == 'in' else ("Çıkış" if t == 'out' else str(t))
+
+
+def _book_values(ctx: str):
+    def values(r) -> tuple:
+        _id, d, t, a, desc, bal = r
+        return (d, _book_type(ctx, t), f"{float(a):.2f}", desc, f"{float(bal):.2f}")
+    return values
+
+
+def _load_inventory():
+    return db.query("SELECT id, name, COALESCE(barcode,''), stock, unit, price, cost FROM products ORDER BY name")
+
+
+def _show_loading(tree) -> None:
+    """Show a placeholder row until data arrives. Trees that already show
+    data keep it, so the refresh can be diffed in place."""
+    try:
+        if tree.get_children():
+            return
+        tree.insert("", "end", values=("Yükleniyor...",))
+    except Exception:
+        pass
+
+
 class ReportsFrame(tk.Frame):
     def __init__(self, parent: tk.Misc, controller) -> None:
         super().__init__(parent)
@@ -249,11 +339,20 @@ class ReportsFrame(tk.Frame):
         self.btn_print = ttk.Button(header, text="Yazdır", command=self._print_preview)
         self.btn_print.pack(side="right", padx=(0, 8), pady=(16, 6))
 
+        # One watch per tab, so a sale does not reload the cash books
+        self._watch_daily = changes.watch(self, ("sales",), on_change=self._refresh_daily)
+        self._watch_cash = changes.watch(self, ("cashbook", "bankbook"), on_change=self._refresh_cash)
+        self._watch_inventory = changes.watch(self, ("products",), on_change=self._refresh_inventory)
         self.refresh()
 
     def on_show(self, **kwargs) -> None:
         self.controller.title("Kooperatif - Raporlar")
-        self.refresh()
+        if self._watch_daily.consume():
+            self._refresh_daily()
+        if self._watch_cash.consume():
+            self._refresh_cash()
+        if self._watch_inventory.consume():
+            self._refresh_inventory()
         self.refresh_style()
 
     # Navigation
@@ -286,23 +385,38 @@ class ReportsFrame(tk.Frame):
         self.btn_today.pack(side="left", padx=(6, 12))
         self.btn_refresh_daily = ttk.Button(bar, text="Yenile", command=self._refresh_daily)
         self.btn_refresh_daily.pack(side="left")
-
-        columns = ("id", "time", "total")
-        self.sales_tree = ttk.Treeview(self.daily_tab, columns=columns, show="headings", height=12)
-        self.sales_tree.heading("id", text="Satış #")
-        self.sales_tree.heading("time", text="Saat")
-        self.sales_tree.heading("total", text="Tutar")
-        self.sales_tree.column("id", width=80, anchor="center")
-        self.sales_tree.column("time", width=80, anchor="center")
-        self.sales_tree.column("total", width=120, anchor="e")
+        self.period_var = tk.StringVar(value=_PERIODS[0])
+        self.cmb_period = ttk.Combobox(bar, textvariable=self.period_var, values=_PERIODS, state="readonly", width=10)
+        self.cmb_period.pack(side="left", padx=(12, 0))
+        self.cmb_period.bind("<<ComboboxSelected>>", lambda _e: self._refresh_daily())
+
+        self.sales_tree = ttk.Treeview(self.daily_tab, show="headings", height=12)
+        self._daily_kind = None
+        self._set_daily_columns(_PERIODS[0])
         self.sales_tree.pack(fill="both", expand=True, padx=20, pady=(0, 10))
 
         bottom = tk.Frame(self.daily_tab)
         bottom.pack(fill="x", padx=20, pady=(0, 10))
         self.daily_total_var = tk.StringVar(value="0.00")
-        tk.Label(bottom, text="Günlük Toplam:").pack(side="left")
+        self.daily_total_label = tk.Label(bottom, text="Günlük Toplam:")
+        self.daily_total_label.pack(side="left")
         tk.Label(bottom, textvariable=self.daily_total_var, font='TkHeadingFont').pack(side="left", padx=(6, 20))
 
+    def _set_daily_columns(self, kind: str) -> None:
+        """Per-sale columns for Günlük, per-day rollup columns otherwise."""
+        if kind == self._daily_kind:
+            return
+        self._daily_kind = kind
+        if kind == "Günlük":
+            cols = (("id", "Satış #", 80, "center"), ("time", "Saat", 80, "center"), ("total", "Tutar", 120, "e"))
+        else:
+            cols = (("day", "Tarih", 110, "center"), ("count", "Satış", 70, "center"), ("gross", "Brüt", 110, "e"),
+                    ("returns", "İade", 110, "e"), ("net", "Net", 120, "e"))
+        self.sales_tree.configure(columns=[c[0] for c in cols])
+        for cid, text, width, anchor in cols:
+            self.sales_tree.heading(cid, text=text)
+            self.sales_tree.column(cid, width=width, anchor=anchor)
+
     def _get_selected_day(self) -> str:
         if _DateEntry is not None:
             try:
@@ -326,7 +440,14 @@ class ReportsFrame(tk.Frame):
     def _change_day(self, delta: int) -> None:
         try:
             cur = date.fromisoformat(self._get_selected_day())
-            newd = cur + timedelta(days=delta)
+            kind = self.period_var.get()
+            if kind == "Aylık":
+                # Same day-of-month clamped into the previous/next month
+                first = (cur.replace(day=1) + timedelta(days=32 * delta if delta > 0 else -1)).replace(day=1)
+                last = ((first + timedelta(days=32)).replace(day=1) - timedelta(days=1)).day
+                newd = first.replace(day=min(cur.day, last))
+            else:
+                newd = cur + timedelta(days=delta * (7 if kind == "Haftalık" else 1))
             if _DateEntry is not None:
                 self.daily_date.set_date(newd)
             else:
@@ -338,20 +459,41 @@ class ReportsFrame(tk.Frame):
         self._refresh_daily()
 
     def _refresh_daily(self) -> None:
+        self._watch_daily.consume()
+        day = self._get_selected_day() or date.today().isoformat()
+        kind = self.period_var.get() if hasattr(self, 'period_var') else _PERIODS[0]
+        _show_loading(self.sales_tree)
+        if kind == "Günlük":
+            worker.call(self, _load_daily, day, on_done=lambda d: self._render_daily(kind, d), key="reports.daily")
+        else:
+            worker.call(self, _load_period, kind, day, on_done=lambda d: self._render_daily(kind, d), key="reports.daily")
+
+    def _render_daily(self, kind: str, data) -> None:
+        rows, total = data
+        self._set_daily_columns(kind)
+        self.daily_total_label.configure(text=f"{kind} Toplam:")
         for iid in self.sales_tree.get_children():
             self.sales_tree.delete(iid)
-        day = self._get_selected_day() or date.today().isoformat()
-        conn = sqlite3.connect(DB_NAME)
-        cur = conn.cursor()
-        cur.execute("SELECT id, strftime('%H:%M', date), total FROM sales WHERE date(date)=? ORDER BY date, id", (day,))
-        rows = cur.fetchall()
-        cur.execute("SELECT COALESCE(SUM(total),0) FROM sales WHERE date(date)=?", (day,))
-        total = cur.fetchone()[0]
-        conn.close()
-        for sid, t, tot in rows:
-            self.sales_tree.insert("", "end", values=(sid, t, f"{float(tot):.2f}"))
+        if kind == "Günlük":
+            for sid, t, tot in rows:
+                self.sales_tree.insert("", "end", values=(sid, t, f"{float(tot):.2f}"))
+        else:
+            for day, cnt, _rcnt, gross, returns, net in rows:
+                self.sales_tree.insert("", "end", values=(day, cnt, f"{float(gross):.2f}", f"{float(returns):.2f}", f"{float(net):.2f}"))
         self.daily_total_var.set(f"{float(total):.2f}")
 
+    def _daily_title(self) -> str:
+        kind = self._daily_kind or _PERIODS[0]
+        day = self._get_selected_day()
+        if kind == "Günlük":
+            return f"Günlük Satış Raporu - {day}"
+        try:
+            start, end = _period_range(kind, day)
+            end = (date.fromisoformat(end) - timedelta(days=1)).isoformat()
+            return f"{kind} Satış Raporu - {start} / {end}"
+        except Exception:
+            return f"{kind} Satış Raporu - {day}"
+
     # --- Cash/Bank tab ---
     def _build_cash_tab(self) -> None:
         top = tk.Frame(self.cash_tab)
@@ -362,6 +504,12 @@ class ReportsFrame(tk.Frame):
         tk.Label(top, textvariable=self.cash_total_var, font='TkHeadingFont').pack(side="left", padx=(6, 20))
         tk.Label(top, text="Banka Toplamı:").pack(side="left")
         tk.Label(top, textvariable=self.bank_total_var, font='TkHeadingFont').pack(side="left", padx=(6, 20))
+        self.btn_cash_jump = ttk.Button(top, text="Git", command=self._jump_cash_to_date)
+        self.btn_cash_jump.pack(side="right")
+        self.cash_jump = tk.Entry(top, width=12)
+        self.cash_jump.pack(side="right", padx=(6, 6))
+        self.cash_jump.bind('<Return>', lambda _e: self._jump_cash_to_date())
+        tk.Label(top, text="Tarihe git (YYYY-AA-GG)").pack(side="right")
 
         # Actions
         actions = tk.Frame(self.cash_tab)
@@ -400,30 +548,43 @@ class ReportsFrame(tk.Frame):
         lists.add(bank_frame)
 
         tk.Label(cash_frame, text="Kasa İşlemleri", font='TkHeadingFont').pack(anchor="w")
-        ccols = ("date", "type", "amount", "description")
+        ccols = ("date", "type", "amount", "description", "balance")
         self.cash_tree = ttk.Treeview(cash_frame, columns=ccols, show="headings", height=12)
         self.cash_tree.heading("date", text="Tarih")
         self.cash_tree.heading("type", text="Tür")
         self.cash_tree.heading("amount", text="Tutar")
         self.cash_tree.heading("description", text="Açıklama")
+        self.cash_tree.heading("balance", text="Bakiye")
         self.cash_tree.column("date", width=120)
         self.cash_tree.column("type", width=80, anchor="center")
         self.cash_tree.column("amount", width=120, anchor="e")
         self.cash_tree.column("description", width=300)
+        self.cash_tree.column("balance", width=120, anchor="e")
         self.cash_tree.pack(fill="both", expand=True, pady=(4, 0))
 
         tk.Label(bank_frame, text="Banka İşlemleri", font='TkHeadingFont').pack(anchor="w")
-        bcols = ("date", "type", "amount", "description")
+        bcols = ("date", "type", "amount", "description", "balance")
         self.bank_tree = ttk.Treeview(bank_frame, columns=bcols, show="headings", height=12)
         self.bank_tree.heading("date", text="Tarih")
         self.bank_tree.heading("type", text="Tür")
         self.bank_tree.heading("amount", text="Tutar")
         self.bank_tree.heading("description", text="Açıklama")
+        self.bank_tree.heading("balance", text="Bakiye")
         self.bank_tree.column("date", width=120)
         self.bank_tree.column("type", width=80, anchor="center")
         self.bank_tree.column("amount", width=120, anchor="e")
         self.bank_tree.column("description", width=300)
+        self.bank_tree.column("balance", width=120, anchor="e")
         self.bank_tree.pack(fill="both", expand=True, pady=(4, 0))
+        self.cash_pager = PagedTree(self.cash_tree, _BOOK_KEYSETS["cashbook"], key=lambda r: (r[1], r[0]), values=_book_values('cash'))
+        self.bank_pager = PagedTree(self.bank_tree, _BOOK_KEYSETS["bankbook"], key=lambda r: (r[1], r[0]), values=_book_values('bank'))
+
+    def _jump_cash_to_date(self) -> None:
+        try:
+            self.cash_pager.jump_to_date(self.cash_jump.get())
+            self.bank_pager.jump_to_date(self.cash_jump.get())
+        except ValueError:
+            messagebox.showwarning("Geçersiz tarih", "Tarihi YYYY-AA-GG biçiminde girin.")
 
     def _cash_op(self, typ: str) -> None:
         amt_s = self.cash_amount.get().strip()
@@ -433,12 +594,7 @@ class ReportsFrame(tk.Frame):
             amt = float('nan')
         if amt != amt or amt <= 0:
             return
-        desc = self.cash_desc.get().strip() or None
-        conn = sqlite3.connect(DB_NAME)
-        cur = conn.cursor()
-        cur.execute("INSERT INTO cashbook (type, amount, description) VALUES (?, ?, ?)", (typ, amt, desc))
-        conn.commit()
-        conn.close()
+        cash.book_entry("cashbook", typ, amt, self.cash_desc.get().strip())
         self.cash_amount.delete(0, tk.END)
         self.cash_desc.delete(0, tk.END)
         self._refresh_cash()
@@ -451,49 +607,23 @@ class ReportsFrame(tk.Frame):
             amt = float('nan')
         if amt != amt or amt <= 0:
             return
-        desc = self.transfer_desc.get().strip() or None
-        conn = sqlite3.connect(DB_NAME)
-        cur = conn.cursor()
-        # cash out
-        cur.execute("INSERT INTO cashbook (type, amount, description) VALUES ('out', ?, ?)", (amt, desc))
-        # bank in
-        cur.execute("INSERT INTO bankbook (type, amount, description) VALUES ('in', ?, ?)", (amt, desc))
-        conn.commit()
-        conn.close()
+        cash.transfer_to_bank(amt, self.transfer_desc.get().strip())
         self.transfer_amount.delete(0, tk.END)
         self.transfer_desc.delete(0, tk.END)
         self._refresh_cash()
 
     def _refresh_cash(self) -> None:
-        # Totals
-        conn = sqlite3.connect(DB_NAME)
-        cur = conn.cursor()
-        cur.execute("SELECT COALESCE(SUM(CASE WHEN type='in' THEN amount WHEN type='out' THEN -amount ELSE 0 END),0) FROM cashbook")
-        cash_total = cur.fetchone()[0]
-        cur.execute("SELECT COALESCE(SUM(CASE WHEN type='in' THEN amount WHEN type='out' THEN -amount ELSE 0 END),0) FROM bankbook")
-        bank_total = cur.fetchone()[0]
-        # Lists
-        cur.execute("SELECT date, type, amount, COALESCE(description,'') FROM cashbook ORDER BY date DESC, id DESC LIMIT 200")
-        cash_rows = cur.fetchall()
-        cur.execute("SELECT date, type, amount, COALESCE(description,'') FROM bankbook ORDER BY date DESC, id DESC LIMIT 200")
-        bank_rows = cur.fetchall()
-        conn.close()
+        self._watch_cash.consume()
+        _show_loading(self.cash_tree)
+        _show_loading(self.bank_tree)
+        worker.call(self, _load_cash, on_done=self._render_cash, key="reports.cash")
+
+    def _render_cash(self, data) -> None:
+        cash_total, bank_total, cash_rows, bank_rows = data
         self.cash_total_var.set(f"{float(cash_total):.2f}")
         self.bank_total_var.set(f"{float(bank_total):.2f}")
-        for iid in self.cash_tree.get_children():
-            self.cash_tree.delete(iid)
-        def _tr_type_ctx(ctx: str, t: str) -> str:
-            if ctx == 'cash':
-                return "Kasaya Giriş" if t == 'in' else ("Kasadan Çıkış" if t == 'out' else str(t))
-            if ctx == 'bank':
-                return "Bankaya Giriş" if t == 'in' else ("Bankadan Çıkış" if t == 'out' else str(t))
-            return "Giriş" if t == 'in' else ("Çıkış" if t == 'out' else str(t))
-        for d, t, a, desc in cash_rows:
-            self.cash_tree.insert("", "end", values=(d, _tr_type_ctx('cash', t), f"{float(a):.2f}", desc))
-        for iid in self.bank_tree.get_children():
-            self.bank_tree.delete(iid)
-        for d, t, a, desc in bank_rows:
-            self.bank_tree.insert("", "end", values=(d, _tr_type_ctx('bank', t), f"{float(a):.2f}", desc))
+        self.cash_pager.reset(first_rows=cash_rows)
+        self.bank_pager.reset(first_rows=bank_rows)
 
     # --- Inventory tab ---
     def _build_inventory_tab(self) -> None:
@@ -527,15 +657,6 @@ class ReportsFrame(tk.Frame):
 
     # --- Top-level refresh ---
     def refresh(self) -> None:
-        # Ensure tables exist
-        conn = sqlite3.connect(DB_NAME)
-        cur = conn.cursor()
-        cur.execute("CREATE TABLE IF NOT EXISTS products (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, barcode TEXT UNIQUE, price REAL NOT NULL DEFAULT 0, cost REAL NOT NULL DEFAULT 0, stock REAL NOT NULL DEFAULT 0, unit TEXT NOT NULL DEFAULT 'adet')")
-        cur.execute("CREATE TABLE IF NOT EXISTS sales (id INTEGER PRIMARY KEY AUTOINCREMENT, date TEXT NOT NULL DEFAULT (datetime('now')), total REAL NOT NULL)")
-        cur.execute("CREATE TABLE IF NOT EXISTS cashbook (id INTEGER PRIMARY KEY AUTOINCREMENT, date TEXT NOT NULL DEFAULT (datetime('now')), type TEXT NOT NULL CHECK(type IN ('in','out')), amount REAL NOT NULL, description TEXT)")
-        cur.execute("CREATE TABLE IF NOT EXISTS bankbook (id INTEGER PRIMARY KEY AUTOINCREMENT, date TEXT NOT NULL DEFAULT (datetime('now')), type TEXT NOT NULL CHECK(type IN ('in','out')), amount REAL NOT NULL, description TEXT)")
-        cur.execute("CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT)")
-        conn.close()
         # Refresh each tab
         self._refresh_daily()
         self._refresh_cash()
@@ -543,31 +664,24 @@ class ReportsFrame(tk.Frame):
 
     def _get_setting(self, key: str, default: str = "") -> str:
         try:
-            conn = sqlite3.connect(DB_NAME)
-            cur = conn.cursor()
-            cur.execute("SELECT value FROM settings WHERE key=?", (key,))
-            row = cur.fetchone()
-            conn.close()
-            return row[0] if row and row[0] is not None else default
+            return db.get_setting(key, default)
         except Exception:
             return default
 
     def _refresh_inventory(self) -> None:
-        for iid in self.inv_tree.get_children():
-            self.inv_tree.delete(iid)
-        conn = sqlite3.connect(DB_NAME)
-        cur = conn.cursor()
-        cur.execute("SELECT name, COALESCE(barcode,''), stock, unit, price, cost FROM products ORDER BY name")
-        for name, barcode, stock, unit, price, cost in cur.fetchall():
+        self._watch_inventory.consume()
+        _show_loading(self.inv_tree)
+        worker.call(self, _load_inventory, on_done=self._render_inventory, key="reports.inventory")
+
+    def _render_inventory(self, rows) -> None:
+        def values(r) -> tuple:
+            _pid, name, barcode, stock, unit, price, cost = r
             value_retail = float(price) * float(stock)
             value_cost = float(cost) * float(stock)
             stock_display = str(int(stock)) if float(stock).is_integer() else str(stock)
-            self.inv_tree.insert(
-                "",
-                "end",
-                values=(name, barcode, stock_display, unit, f"{float(price):.2f}", f"{float(cost):.2f}", f"{value_retail:.2f}", f"{value_cost:.2f}"),
-            )
-        conn.close()
+            return (name, barcode, stock_display, unit, f"{float(price):.2f}", f"{float(cost):.2f}", f"{value_retail:.2f}", f"{value_cost:.2f}")
+        # Keyed by product id: a price edit touches one row, not the whole list
+        sync_tree(self.inv_tree, rows, key=lambda r: f"p{r[0]}", values=values)
 
     # --- Print preview ---
     def _print_preview(self) -> None:
@@ -576,7 +690,7 @@ class ReportsFrame(tk.Frame):
         except Exception:
             active = 0
         if active == 0:
-            title = f"Günlük Satış Raporu - {self._get_selected_day()}"
+            title = self._daily_title()
             html = self._html_daily()
         elif active == 1:
             title = "Kasa/Banka Raporu"
@@ -639,6 +753,16 @@ class ReportsFrame(tk.Frame):
     def _html_daily(self) -> str:
         rows = [self.sales_tree.item(i, "values") for i in self.sales_tree.get_children()]
         total = self.daily_total_var.get()
+        if self._daily_kind not in (None, "Günlük"):
+            body = "".join(
+                f"<tr><td class='center'>{d}</td><td class='center'>{c}</td><td class='right'>{g}</td>"
+                f"<td class='right'>{r}</td><td class='right'>{n}</td></tr>"
+                for d, c, g, r, n in rows
+            )
+            return (
+                "<table><thead><tr><th>Tarih</th><th>Satış</th><th>Brüt</th><th>İade</th><th>Net</th></tr></thead>"
+                f"<tbody>{body}</tbody><tfoot><tr><td colspan='4'>Toplam</td><td class='right'>{total}</td></tr></tfoot></table>"
+            )
         body = "".join(
             f"<tr><td class='center'>{sid}</td><td class='center'>{tm}</td><td class='right'>{float(tot):.2f}</td></tr>"
             for sid, tm, tot in rows
@@ -655,18 +779,18 @@ class ReportsFrame(tk.Frame):
         bank_total = self.bank_total_var.get()
         def rows_to_html(rows):
             return "".join(
-                f"<tr><td>{d}</td><td class='center'>{t}</td><td class='right'>{float(a):.2f}</td><td>{desc}</td></tr>"
-                for d, t, a, desc in rows
+                f"<tr><td>{d}</td><td class='center'>{t}</td><td class='right'>{float(a):.2f}</td><td>{desc}</td><td class='right'>{bal}</td></tr>"
+                for d, t, a, desc, bal in rows
             )
         cash_html = (
             "<h2>Kasa</h2>"
-            "<table><thead><tr><th>Tarih</th><th>Tür</th><th>Tutar</th><th>Açıklama</th></tr></thead>"
-            f"<tbody>{rows_to_html(cash_rows)}</tbody><tfoot><tr><td colspan='2'>Toplam</td><td class='right'>{cash_total}</td><td></td></tr></tfoot></table>"
+            "<table><thead><tr><th>Tarih</th><th>Tür</th><th>Tutar</th><th>Açıklama</th><th>Bakiye</th></tr></thead>"
+            f"<tbody>{rows_to_html(cash_rows)}</tbody><tfoot><tr><td colspan='2'>Toplam</td><td class='right'>{cash_total}</td><td></td><td></td></tr></tfoot></table>"
         )
         bank_html = (
             "<h2>Banka</h2>"
-            "<table><thead><tr><th>Tarih</th><th>Tür</th><th>Tutar</th><th>Açıklama</th></tr></thead>"
-            f"<tbody>{rows_to_html(bank_rows)}</tbody><tfoot><tr><td colspan='2'>Toplam</td><td class='right'>{bank_total}</td><td></td></tr></tfoot></table>"
+            "<table><thead><tr><th>Tarih</th><th>Tür</th><th>Tutar</th><th>Açıklama</th><th>Bakiye</th></tr></thead>"
+            f"<tbody>{rows_to_html(bank_rows)}</tbody><tfoot><tr><td colspan='2'>Toplam</td><td class='right'>{bank_total}</td><td></td><td></td></tr></tfoot></table>"
         )
         return cash_html + bank_html
 
@@ -686,7 +810,7 @@ class ReportsFrame(tk.Frame):
 
     # --- PDF export ---
     def _export_pdf(self) -> None:
-        if not _PDF_AVAILABLE:
+        if not _load_pdf():
             messagebox.showinfo(
                 "PDF desteği yok",
                 "PDF oluşturmak için 'reportlab' kurulmalı.\nKurulum: pip install reportlab",
@@ -726,18 +850,24 @@ class ReportsFrame(tk.Frame):
         flows.append(Spacer(1, 6))
 
         if active == 0:
-            title_text = f"Günlük Satış Raporu - {self._get_selected_day()}"
-            data = [["Satış #", "Saat", "Tutar"]]
-            for sid, tm, tot in [self.sales_tree.item(i, "values") for i in self.sales_tree.get_children()]:
-                data.append([str(sid), str(tm), f"{float(tot):.2f}"])
-            data.append(["", "Toplam", self.daily_total_var.get()])
+            title_text = self._daily_title()
+            if self._daily_kind not in (None, "Günlük"):
+                data = [["Tarih", "Satış", "Brüt", "İade", "Net"]]
+                for vals in [self.sales_tree.item(i, "values") for i in self.sales_tree.get_children()]:
+                    data.append([str(v) for v in vals])
+                data.append(["", "", "", "Toplam", self.daily_total_var.get()])
+            else:
+                data = [["Satış #", "Saat", "Tutar"]]
+                for sid, tm, tot in [self.sales_tree.item(i, "values") for i in self.sales_tree.get_children()]:
+                    data.append([str(sid), str(tm), f"{float(tot):.2f}"])
+                data.append(["", "Toplam", self.daily_total_var.get()])
             flows.append(Paragraph(title_text, styles['Heading2']))
             t = Table(data, hAlign='LEFT')
             t.setStyle(TableStyle([
                 ( 'FONTNAME', (0,0), (-1,-1), font_reg if font_reg else 'Helvetica'),
                 ('GRID', (0,0), (-1,-1), 0.5, colors.grey),
                 ('BACKGROUND', (0,0), (-1,0), colors.whitesmoke),
-                ('ALIGN', (2,1), (2,-1), 'RIGHT'),
+                ('ALIGN', (2,1), (-1,-1), 'RIGHT'),
                 ('ALIGN', (0,1), (1,-2), 'CENTER'),
                 ( 'FONTNAME', (0,0), (-1,0), (font_bold or font_reg or 'Helvetica-Bold')),
                 ( 'FONTNAME', (0,-1), (-1,-1), (font_bold or font_reg or 'Helvetica-Bold')),
@@ -748,17 +878,18 @@ class ReportsFrame(tk.Frame):
             flows.append(Paragraph(title_text, styles['Heading2']))
             # Cash
             flows.append(Paragraph("Kasa İşlemleri", styles['Heading3']))
-            cdata = [["Tarih", "Tür", "Tutar", "Açıklama"]]
-            for d, ttyp, amt, desc in [self.cash_tree.item(i, "values") for i in self.cash_tree.get_children()]:
-                cdata.append([str(d), str(ttyp), f"{float(amt):.2f}", str(desc)])
-            cdata.append(["", "Toplam", self.cash_total_var.get(), ""])
+            cdata = [["Tarih", "Tür", "Tutar", "Açıklama", "Bakiye"]]
+            for d, ttyp, amt, desc, bal in [self.cash_tree.item(i, "values") for i in self.cash_tree.get_children()]:
+                cdata.append([str(d), str(ttyp), f"{float(amt):.2f}", str(desc), str(bal)])
+            cdata.append(["", "Toplam", self.cash_total_var.get(), "", ""])
             # Widen Tarih and Tür columns for readability
-            ct = Table(cdata, hAlign='LEFT', colWidths=[110, 140, 70, 220])
+            ct = Table(cdata, hAlign='LEFT', colWidths=[110, 140, 70, 160, 70])
             ct.setStyle(TableStyle([
                 ( 'FONTNAME', (0,0), (-1,-1), font_reg if font_reg else 'Helvetica'),
                 ('GRID', (0,0), (-1,-1), 0.5, colors.grey),
                 ('BACKGROUND', (0,0), (-1,0), colors.whitesmoke),
                 ('ALIGN', (2,1), (2,-1), 'RIGHT'),
+                ('ALIGN', (4,1), (4,-1), 'RIGHT'),
                 ( 'FONTNAME', (0,0), (-1,0), (font_bold or font_reg or 'Helvetica-Bold')),
                 ( 'FONTNAME', (0,-1), (-1,-1), (font_bold or font_reg or 'Helvetica-Bold')),
             ]))
@@ -766,17 +897,18 @@ class ReportsFrame(tk.Frame):
             flows.append(Spacer(1, 8))
             # Bank
             flows.append(Paragraph("Banka İşlemleri", styles['Heading3']))
-            bdata = [["Tarih", "Tür", "Tutar", "Açıklama"]]
-            for d, ttyp, amt, desc in [self.bank_tree.item(i, "values") for i in self.bank_tree.get_children()]:
-                bdata.append([str(d), str(ttyp), f"{float(amt):.2f}", str(desc)])
-            bdata.append(["", "Toplam", self.bank_total_var.get(), ""])
+            bdata = [["Tarih", "Tür", "Tutar", "Açıklama", "Bakiye"]]
+            for d, ttyp, amt, desc, bal in [self.bank_tree.item(i, "values") for i in self.bank_tree.get_children()]:
+                bdata.append([str(d), str(ttyp), f"{float(amt):.2f}", str(desc), str(bal)])
+            bdata.append(["", "Toplam", self.bank_total_var.get(), "", ""])
             # Widen Tarih and Tür columns for readability
-            bt = Table(bdata, hAlign='LEFT', colWidths=[110, 140, 70, 220])
+            bt = Table(bdata, hAlign='LEFT', colWidths=[110, 140, 70, 160, 70])
             bt.setStyle(TableStyle([
                 ( 'FONTNAME', (0,0), (-1,-1), font_reg if font_reg else 'Helvetica'),
                 ('GRID', (0,0), (-1,-1), 0.5, colors.grey),
                 ('BACKGROUND', (0,0), (-1,0), colors.whitesmoke),
                 ('ALIGN', (2,1), (2,-1), 'RIGHT'),
+                ('ALIGN', (4,1), (4,-1), 'RIGHT'),
                 ( 'FONTNAME', (0,0), (-1,0), (font_bold or font_reg or 'Helvetica-Bold')),
                 ( 'FONTNAME', (0,-1), (-1,-1), (font_bold or font_reg or 'Helvetica-Bold')),
             ]))
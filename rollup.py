@@ -0,0 +1,61 @@
+"""Per-day, per-hour sales totals maintained by triggers on `sales`.
+
+sales_daily holds one row per (day, hour) with sale/return counts, gross
+sales, returns and net. Returns are stored in `sales` as negative totals.
+Triggers apply each insert, delete and update as a delta, so report
+queries read at most 24 rows per day instead of aggregating every sale.
+The table and triggers are created by migration 4.
+"""
+from typing import List, Tuple
+
+import db
+
+# Bucket of a sales.date value; bare dates ('2024-05-01') land in hour 0.
+_DAY = "COALESCE(date({d}), substr({d}, 1, 10))"
+_HOUR = "COALESCE(CAST(strftime('%H', {d}) AS INTEGER), 0)"
+
+
+def rebuild_rollup(cur) -> None:
+    """Recompute sales_daily from scratch (after bulk loads with triggers off)."""
+    cur.execute("DELETE FROM sales_daily")
+    cur.execute(
+        f"""
+        INSERT INTO sales_daily (day, hour, sale_count, return_count, gross, returns, net)
+        SELECT {_DAY.format(d='date')}, {_HOUR.format(d='date')},
+               SUM(total >= 0), SUM(total < 0),
+               SUM(CASE WHEN total >= 0 THEN total ELSE 0 END),
+               SUM(CASE WHEN total < 0 THEN -total ELSE 0 END),
+               SUM(total)
+          FROM sales
+         GROUP BY 1, 2
+        """
+    )
+
+
+_GROUPS = {
+    "hour": "day || printf(' %02d:00', hour)",
+    "day": "day",
+    "week": "date(day, 'weekday 0', '-6 days')",
+    "month": "substr(day, 1, 7)",
+}
+
+
+def summary(start: str, end: str, group: str = "day") -> List[Tuple[str, int, int, float, float, float]]:
+    """(period, sales, returns count, gross, returns, net) for start <= day < end,
+    grouped by 'hour', 'day', 'week' (Monday) or 'month'."""
+    key = _GROUPS[group]
+    return db.query(
+        f"SELECT {key} AS period, SUM(sale_count), SUM(return_count), SUM(gross), SUM(returns), SUM(net) "
+        f"FROM sales_daily WHERE day >= ? AND day < ? GROUP BY period ORDER BY period",
+        (start, end),
+    )
+
+
+def totals(start: str, end: str) -> Tuple[int, int, float, float, float]:
+    """(sales, returns count, gross, returns, net) for start <= day < end."""
+    row = db.query_one(
+        "SELECT COALESCE(SUM(sale_count),0), COALESCE(SUM(return_count),0), COALESCE(SUM(gross),0), "
+        "COALESCE(SUM(returns),0), COALESCE(SUM(net),0) FROM sales_daily WHERE day >= ? AND day < ?",
+        (start, end),
+    )
+    return tuple(row)  # type: ignore[return-value]
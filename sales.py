@@ -1,17 +1,33 @@
-import sqlite3
 import tkinter as tk
 import tkinter.font as tkfont
 from tkinter import messagebox
 from tkinter import ttk
 from datetime import datetime, date
 import time
+from typing import Optional
 try:
     from tkcalendar import DateEntry as _DateEntry  # type: ignore
 except Exception:
     _DateEntry = None  # type: ignore
 from ui import make_back_arrow, tinted_bg
+import cart
+import changes
+import search
+import worker
+from services import catalog, checkout, returns
 
-DB_NAME = "coop.db"
+# Typeahead: rows shown, and how long typing must pause before a query
+SUGGEST_ROWS = 10
+TYPEAHEAD_DEBOUNCE_MS = 90
+
+
+def _tree_lines(tree, iids) -> list:
+    """Cart rows (pid, name, barcode, price, qty, line_total) -> CartLine list."""
+    lines = []
+    for iid in iids:
+        vals = tree.item(iid, "values")
+        lines.append(checkout.CartLine(int(vals[0]), float(vals[4]), float(vals[3])))
+    return lines
 
 
 class SalesFrame(tk.Frame):
@@ -78,7 +94,31 @@ class SalesFrame(tk.Frame):
         ttk.Button(sb, text="Ekle", command=self.add_to_cart).pack(side="left")
         ttk.Button(sb, text="Sepeti Temizle", command=self.clear_cart).pack(side="left", padx=(8, 0))
 
-        # Cart
+        # Carts on this till: one button per cart, the active one pressed.
+        # Parking sets a basket aside for a customer who stepped away;
+        # switching back is a re-render, not a rebuild. Every cart is
+        # journalled to held_carts behind the UI (see cart.CartJournal),
+        # starting once the carts left from the last run are restored.
+        self.book = cart.CartBook()
+        self.journal: Optional[cart.CartJournal] = None
+        # (cart, lines) of the sale being committed, kept out of the journal
+        self._inflight = None
+        self.cart_bar = tk.Frame(self)
+        self.cart_bar.pack(fill='x', padx=20, pady=(6, 0))
+        self._cart_choice = tk.StringVar(value=self.book.active)
+        self._cart_buttons = tk.Frame(self.cart_bar)
+        self._cart_buttons.pack(side='left', fill='x', expand=True)
+        ttk.Button(self.cart_bar, text="Beklet / Yeni Sepet (F2)", command=self._park_cart).pack(side='right')
+        self.cart_name_var = tk.StringVar(value=self.book.active)
+        name_entry = tk.Entry(self.cart_bar, textvariable=self.cart_name_var, width=14)
+        name_entry.pack(side='right', padx=(6, 6))
+        name_entry.bind('<Return>', lambda _e: self._rename_cart())
+        name_entry.bind('<FocusOut>', lambda _e: self._rename_cart())
+        tk.Label(self.cart_bar, text="Sepet adı:").pack(side='right')
+
+        # Cart: self.basket holds the lines; the Treeview only shows them,
+        # one row per product with the product id as iid
+        self.basket = self.book.cart
         columns = ("product_id", "name", "barcode", "price", "qty", "total")
         self.cart = ttk.Treeview(self, columns=columns, show="headings", height=12)
         self.cart.heading("product_id", text="PID")
@@ -108,6 +148,9 @@ class SalesFrame(tk.Frame):
         self.cart.bind('<KP_Subtract>', lambda _e: (self._adjust_selected_qty(-1), 'break'))
         self.cart.bind('<plus>', lambda _e: (self._adjust_selected_qty(+1), 'break'))
         self.cart.bind('<KP_Add>', lambda _e: (self._adjust_selected_qty(+1), 'break'))
+        for w in (self.entry_scan, self.cart):
+            w.bind('<F2>', lambda _e: (self._park_cart(), 'break'))
+        self._render_cart_bar()
 
         # Totals + actions
         bottom = tk.Frame(self)
@@ -175,6 +218,14 @@ class SalesFrame(tk.Frame):
 
         # Suggestions (typeahead) as dropdown under the search entry
         self._suggest_results = []  # list of (id, name, barcode, price, stock, unit)
+        # Cache hits (and narrowed prefixes) paint at once; misses wait for a
+        # pause in typing and run on the DB worker. _ta_gen moves on every
+        # keystroke, so an older query never paints or even starts.
+        self._ta_cache = search.SuggestCache(fts=search.fts_available())
+        self._ta_watch = changes.watch(self, ("products",), on_change=self._products_changed)
+        self._ta_job = None
+        self._ta_gen = 0
+        self._ta_query = None
         self._suggest_win = tk.Toplevel(self)
         self._suggest_win.withdraw()
         try:
@@ -202,13 +253,16 @@ class SalesFrame(tk.Frame):
         except Exception:
             self._app_root = None
         self.after(300, self._guard_suggest_visibility)
-        # Keep a fast barcode scan buffer
+        # Scanner burst detection: USB scanners type a whole code a few ms
+        # per key, people don't. Keys closer together than _scan_threshold
+        # extend the burst buffer; a slower key starts a new one.
         self._scan_buf = ""
-        self._scan_last_ts = 0.0
-        self._scan_threshold = 0.08  # seconds between keypresses to count as scanner
+        self._scan_last_ms = None
+        self._scan_threshold = 0.05  # seconds between keypresses to count as scanner
+        self._scan_settle_job = None
 
         # Bind enter to add item and key events for suggestions
-        self.entry_scan.bind("<Return>", lambda _e: self.add_to_cart())
+        self.entry_scan.bind("<Return>", self._on_scan_return)
         self.entry_scan.bind("<KeyRelease>", self._on_scan_key)
         # Down arrow focuses the suggestion dropdown
         self.entry_scan.bind("<Down>", self._focus_suggest)
@@ -236,17 +290,21 @@ class SalesFrame(tk.Frame):
 
         self._set_now()
         self._recalc_total()
+        # Carts left on this till by the last run (parked, or interrupted)
+        worker.call(self, cart.load_held, cart.TILL, on_done=self._restore_held,
+                    on_error=lambda _e: self._restore_held([]))
 
     def on_show(self, **kwargs) -> None:
         self.controller.title("Kooperatif - Yeni Satış")
+        if self._ta_watch.consume():
+            self._products_changed()
         try:
-            # Reset inputs and lists on entry
+            # Reset inputs on entry; the carts stay as they were
             self.entry_scan.delete(0, tk.END)
             self.entry_qty.delete(0, tk.END)
             self.entry_qty.insert(0, '1')
             self.entry_paid.delete(0, tk.END)
-            for iid in self.cart.get_children():
-                self.cart.delete(iid)
+            self._set_now()
             self._recalc_total()
             self.status_var.set("")
             self._paid_user_edited = False
@@ -290,6 +348,11 @@ class SalesFrame(tk.Frame):
             self.controller.logout()
 
     # Helpers
+    def _products_changed(self) -> None:
+        # Prices or stock may have changed on another till
+        self._ta_cache.clear()
+        worker.call(self, catalog.reload, key="catalog.reload")
+
     def _set_now(self) -> None:
         nowd = date.today()
         try:
@@ -298,9 +361,19 @@ class SalesFrame(tk.Frame):
                 self.entry_date.insert(0, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
             else:
                 self.entry_date.set_date(nowd)
+            # What we stamped; a sale with this still in the field is dated
+            # at commit time instead (the frame outlives a day)
+            self._auto_date = self.entry_date.get().strip()
         except Exception:
             pass
 
+    def _sale_date(self) -> str:
+        """The cashier's date if they changed the field, otherwise now."""
+        typed = self.entry_date.get().strip() if hasattr(self, 'entry_date') else ""
+        if typed and typed != getattr(self, '_auto_date', None):
+            return typed
+        return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
     def _parse_qty(self, s: str) -> float:
         try:
             s = s.replace(",", ".")
@@ -312,18 +385,11 @@ class SalesFrame(tk.Frame):
         text = text.strip()
         if not text:
             return None
-        conn = sqlite3.connect(DB_NAME)
-        cur = conn.cursor()
-        # Prefer barcode exact match, fall back to name like
-        cur.execute("SELECT id, name, barcode, price, stock, unit FROM products WHERE barcode = ?", (text,))
-        row = cur.fetchone()
+        # Prefer barcode exact match, fall back to name search
+        row = catalog.by_barcode(text)
         if not row:
-            cur.execute(
-                "SELECT id, name, barcode, price, stock, unit FROM products WHERE name LIKE ? ORDER BY id LIMIT 1",
-                (f"%{text}%",),
-            )
-            row = cur.fetchone()
-        conn.close()
+            rows = search.search_products(text, limit=1, columns=('name',), order='p.id')
+            row = rows[0] if rows else None
         return row
 
     def _qty_clamp(self, widget: tk.Spinbox) -> None:
@@ -342,22 +408,62 @@ class SalesFrame(tk.Frame):
     # --- Typeahead suggestions ---
     def _on_scan_key(self, _e=None) -> None:
         q = (self.entry_scan.get() or '').strip()
+        if q and q == self._ta_query:
+            return  # cursor/modifier keys: text unchanged, shown or on its way
+        self._cancel_typeahead()
+        self._ta_query = q
         if not q:
             self._hide_suggest()
             return
-        # query by barcode prefix or name contains
-        conn = sqlite3.connect(DB_NAME)
-        cur = conn.cursor()
-        like = f"%{q}%"
-        cur.execute(
-            "SELECT id, name, COALESCE(barcode,''), price, stock, unit FROM products WHERE barcode LIKE ? OR name LIKE ? ORDER BY name LIMIT 10",
-            (like, like),
-        )
-        self._suggest_results = cur.fetchall()
-        conn.close()
-        if not self._suggest_results:
+        if self._in_scan_burst():
+            # Scanner input: no search per character. If the burst ends
+            # without Enter, suggest for whatever was typed once it settles.
+            self._hide_suggest()
+            self._cancel_scan_settle()
+            self._scan_settle_job = self.after(int(self._scan_threshold * 2000), self._on_scan_settled)
+            return
+        rows = self._ta_cache.get(q)
+        if rows is not None:
+            self._show_suggestions(rows[:SUGGEST_ROWS])
+            return
+        gen = self._ta_gen
+        self._ta_job = self.after(TYPEAHEAD_DEBOUNCE_MS, lambda: self._query_typeahead(q, gen))
+
+    def _cancel_typeahead(self) -> None:
+        self._ta_gen += 1
+        if self._ta_job is not None:
+            try:
+                self.after_cancel(self._ta_job)
+            except Exception:
+                pass
+            self._ta_job = None
+
+    def _query_typeahead(self, q: str, gen: int) -> None:
+        self._ta_job = None
+
+        def fetch():
+            if gen != self._ta_gen:
+                return None  # superseded while queued
+            # barcode or name contains q (trigram index, Turkish-folded)
+            return search.search_products(q, limit=self._ta_cache.rows)
+
+        def done(rows) -> None:
+            if rows is None:
+                return
+            self._ta_cache.put(q, rows)
+            if gen == self._ta_gen:
+                self._show_suggestions(rows[:SUGGEST_ROWS])
+
+        worker.call(self, fetch, on_done=done, key="sales.typeahead")
+
+    def _show_suggestions(self, rows) -> None:
+        if not rows:
+            self._suggest_results = []
             self._hide_suggest()
             return
+        if rows == self._suggest_results and self._suggest_visible:
+            return
+        self._suggest_results = rows
         self.suggest.delete(0, tk.END)
         for pid, name, barcode, price, stock, unit in self._suggest_results:
             left = f"{name}"
@@ -380,6 +486,9 @@ class SalesFrame(tk.Frame):
             self._suggest_visible = True
 
     def _hide_suggest(self) -> None:
+        # Also drop any pending query so it can't reopen the popup
+        self._cancel_typeahead()
+        self._ta_query = None
         if self._suggest_visible:
             try:
                 self._suggest_win.withdraw()
@@ -507,45 +616,188 @@ class SalesFrame(tk.Frame):
     def _scan_keypress(self, e) -> None:
         # Build a buffer for very fast key sequences typical of barcode scanners
         ch = e.char or ""
-        now = time.time()
-        if now - self._scan_last_ts > self._scan_threshold:
+        now_ms = self._key_ms(e)
+        last = self._scan_last_ms
+        if last is None or not 0 <= now_ms - last <= self._scan_threshold * 1000:
             # too slow -> start new buffer (likely human typing)
             self._scan_buf = ""
-        self._scan_last_ts = now
-        if e.keysym == 'Return':
-            if len(self._scan_buf) >= 4:
-                # treat as scanner input
-                self.entry_scan.delete(0, tk.END)
-                self.entry_scan.insert(0, self._scan_buf)
-                # Auto-add with qty 1
-                self.add_to_cart()
-                self._scan_buf = ""
-                # Keep focus for next scan
-                self.entry_scan.focus_set()
-                return "break"
-            return None
+        self._scan_last_ms = now_ms
         # Accept only printable alnum and common barcode chars
         if ch.isprintable() and not ch.isspace():
             self._scan_buf += ch
 
+    def _key_ms(self, e) -> int:
+        # The event's own timestamp is when the key was pressed, even if Tk
+        # is behind on handling events; fall back to the clock without one
+        return getattr(e, 'time', 0) or int(time.perf_counter() * 1000)
+
+    def _in_scan_burst(self) -> bool:
+        # Three keys in a row inside the threshold; fast human bigrams stay out
+        return len(self._scan_buf) >= 3
+
+    def _cancel_scan_settle(self) -> None:
+        if self._scan_settle_job is not None:
+            try:
+                self.after_cancel(self._scan_settle_job)
+            except Exception:
+                pass
+            self._scan_settle_job = None
+
+    def _on_scan_settled(self) -> None:
+        self._scan_settle_job = None
+        self._scan_buf = ""
+        self._on_scan_key()
+
+    def _on_scan_return(self, e=None) -> str:
+        # <Return> outranks the generic <KeyPress> binding, so the burst is
+        # judged here: the code's keys and then Enter, all in quick succession
+        self._cancel_scan_settle()
+        last = self._scan_last_ms
+        burst = (len(self._scan_buf) >= 4 and last is not None
+                 and 0 <= self._key_ms(e) - last <= self._scan_threshold * 1000)
+        code = self._scan_buf
+        self._scan_buf = ""
+        self._scan_last_ms = None
+        self._hide_suggest()
+        if burst:
+            # Scanner: exact barcode only, no name search
+            self.add_to_cart(barcode=code)
+        else:
+            self.add_to_cart()
+        return "break"
+
+    @staticmethod
+    def _line_values(item) -> tuple:
+        return (item.product_id, item.name, item.barcode, f"{item.price:.2f}", f"{item.quantity:g}", f"{item.total:.2f}")
+
+    def _render_line(self, pid: int) -> None:
+        """Mirror one basket line into the Treeview."""
+        item = self.basket.get(pid)
+        iid = str(pid)
+        if item is None:
+            if self.cart.exists(iid):
+                self.cart.delete(iid)
+            return
+        values = self._line_values(item)
+        if self.cart.exists(iid):
+            self.cart.item(iid, values=values)
+        else:
+            self.cart.insert("", "end", iid=iid, values=values)
+
+    def _show_basket(self) -> None:
+        """Show the active cart (after a switch): rows, total, cart bar."""
+        rows = self.cart.get_children()
+        if rows:
+            self.cart.delete(*rows)
+        for item in self.basket:
+            self.cart.insert("", "end", iid=str(item.product_id), values=self._line_values(item))
+        self.entry_paid.delete(0, tk.END)
+        self._paid_user_edited = False
+        self._last_auto_paid = ''
+        self._recalc_total()
+        self._render_cart_bar()
+        try:
+            self.entry_scan.focus_set()
+        except Exception:
+            pass
+
+    def _render_cart_bar(self) -> None:
+        for w in self._cart_buttons.winfo_children():
+            w.destroy()
+        for name, c in self.book.carts.items():
+            text = name if name == self.book.active else f"{name} · {c.total:.2f}"
+            ttk.Radiobutton(self._cart_buttons, text=text, value=name, variable=self._cart_choice,
+                            style='Toolbutton', command=lambda n=name: self._switch_cart(n)).pack(side='left', padx=(0, 4))
+        self._cart_choice.set(self.book.active)
+        self.cart_name_var.set(self.book.active)
+
+    def _switch_cart(self, name: str) -> None:
+        if name == self.book.active:
+            return
+        if getattr(self, '_sale_pending', False):
+            # The commit's callback takes the sold lines out of this cart
+            self._cart_choice.set(self.book.active)
+            self.status_var.set("Satış kaydediliyor, lütfen bekleyin.")
+            return
+        prev = self.book.active
+        parked = self.book.switch(name)
+        self.basket = self.book.cart
+        if parked is None and self.journal is not None:
+            self.journal.forget(prev)
+        self.status_var.set(f"'{parked}' bekletiliyor." if parked else "")
+        self._show_basket()
+
+    def _park_cart(self) -> None:
+        """Set the current basket aside and start an empty one."""
+        if not len(self.basket):
+            self.status_var.set("Sepet boş.")
+            return
+        self._switch_cart(self.book.open())
+
+    def _rename_cart(self) -> None:
+        old = self.book.active
+        new = self.cart_name_var.get().strip()
+        if new == old:
+            return
+        try:
+            self.book.rename(old, new)
+        except ValueError as e:
+            self.cart_name_var.set(old)
+            self.status_var.set(str(e))
+            return
+        if self.journal is not None:
+            self.journal.forget(old)
+            self._journal_cart(new, self.basket)
+        self._render_cart_bar()
+
+    def _restore_held(self, held) -> None:
+        names = {name for name, _c, _a in held}
+        was_active = None
+        for name, c, active in held:
+            if name == self.book.active:
+                self.book.rename(name, self.book.new_name(taken=names))
+            elif name in self.book.carts:
+                name = self.book.new_name(taken=names)
+            self.book.open(name, c)
+            if active:
+                was_active = name
+        # Back to the cart that was being rung up, unless a new one was
+        # already started in the meantime
+        if was_active and not len(self.basket):
+            self.book.switch(was_active)
+            self.basket = self.book.cart
+        self.journal = cart.CartJournal(cart.TILL)
+        for name, c in self.book.carts.items():
+            self._journal_cart(name, c)
+        if held:
+            self._show_basket()
+            self.status_var.set(f"{len(held)} sepet geri yüklendi.")
+
     def _recalc_total(self) -> None:
-        total = 0.0
-        for iid in self.cart.get_children():
-            vals = self.cart.item(iid, "values")
-            total += float(vals[5])
+        total = self.basket.total
         self.total_var.set(f"{total:.2f}")
         # Auto-fill paid if not edited or empty/previous auto value
         self._sync_paid_with_total(total)
         self._update_change()
+        # Every cart change ends up here; queueing it costs no disk I/O
+        if self.journal is not None:
+            self._journal_cart(self.book.active, self.basket)
+
+    def _journal_cart(self, name: str, c: cart.Cart) -> None:
+        # Lines of a sale still being committed must not be journalled:
+        # the sale's own empty marker may already be overtaken by then
+        if self._inflight is not None and self._inflight[0] is c:
+            c = c.without(self._inflight[1])
+        self.journal.record(name, c, active=self.book.active)
+
+    def destroy(self) -> None:
+        if self.journal is not None:
+            self.journal.close()
+        super().destroy()
 
     def _get_product_by_id(self, pid: int):
         try:
-            conn = sqlite3.connect(DB_NAME)
-            cur = conn.cursor()
-            cur.execute("SELECT id, name, barcode, price, stock, unit FROM products WHERE id = ?", (int(pid),))
-            row = cur.fetchone()
-            conn.close()
-            return row
+            return catalog.by_id(pid)
         except Exception:
             return None
 
@@ -555,7 +807,8 @@ class SalesFrame(tk.Frame):
             self.status_var.set("Önce listeden bir satır seçin.")
             return
         for iid in sel:
-            self.cart.delete(iid)
+            self.basket.remove(int(iid))
+            self._render_line(int(iid))
         self._recalc_total()
         self.status_var.set("")
         try:
@@ -568,19 +821,16 @@ class SalesFrame(tk.Frame):
         if not sel:
             self.status_var.set("Önce listeden bir satır seçin.")
             return
-        iid = sel[0]
-        vals = list(self.cart.item(iid, "values"))
-        try:
-            pid = int(vals[0])
-            price = float(vals[3])
-            cur_qty = float(vals[4])
-        except Exception:
+        pid = int(sel[0])
+        item = self.basket.get(pid)
+        if item is None:
             self.status_var.set("Satır verisi okunamadı.")
             return
-        new_qty = cur_qty + float(delta)
+        new_qty = item.quantity + float(delta)
         # If new qty <= 0, remove the line
         if new_qty <= 0:
-            self.cart.delete(iid)
+            self.basket.remove(pid)
+            self._render_line(pid)
             self._recalc_total()
             self.status_var.set("")
             try:
@@ -600,10 +850,8 @@ class SalesFrame(tk.Frame):
         if new_qty > max_stock:
             self.status_var.set(f"Yetersiz stok. Stokta {max_stock:g} {unit} var.")
             return
-        line_total = price * new_qty
-        vals[4] = f"{new_qty:g}"
-        vals[5] = f"{line_total:.2f}"
-        self.cart.item(iid, values=tuple(vals))
+        self.basket.set_quantity(pid, new_qty)
+        self._render_line(pid)
         self._recalc_total()
         self.status_var.set("")
         try:
@@ -658,8 +906,10 @@ class SalesFrame(tk.Frame):
         self.change_var.set(f"{change:.2f}")
 
     def clear_cart(self) -> None:
-        for iid in self.cart.get_children():
-            self.cart.delete(iid)
+        self.basket.clear()
+        rows = self.cart.get_children()
+        if rows:
+            self.cart.delete(*rows)
         self._recalc_total()
         self.status_var.set("")
         try:
@@ -678,13 +928,15 @@ class SalesFrame(tk.Frame):
         except Exception:
             pass
 
-    def add_to_cart(self) -> None:
-        query = self.entry_scan.get().strip()
+    def add_to_cart(self, barcode: Optional[str] = None) -> None:
+        """Add the scan box's product (barcode, else name search). A scanned
+        `barcode` is looked up by exact match only."""
+        query = barcode if barcode is not None else self.entry_scan.get().strip()
         qty = self._parse_qty(self.entry_qty.get().strip() or "1")
         if qty != qty or qty <= 0:
             self.status_var.set("Geçersiz miktar. Pozitif bir miktar girin.")
             return
-        prod = self._find_product(query)
+        prod = catalog.by_barcode(query) if barcode is not None else self._find_product(query)
         if not prod:
             try:
                 messagebox.showwarning("Ürün bulunamadı", "Bu barkod/isim ile ürün bulunamadı.")
@@ -702,21 +954,13 @@ class SalesFrame(tk.Frame):
         if qty > float(stock):
             self.status_var.set(f"Yetersiz stok. Stokta {stock} {unit} var.")
             return
-        # Merge with existing line if same product
-        for iid in self.cart.get_children():
-            vals = self.cart.item(iid, "values")
-            if int(vals[0]) == int(pid):
-                cur_qty = float(vals[4])
-                new_qty = cur_qty + qty
-                if new_qty > float(stock):
-                    self.status_var.set(f"Yetersiz stok. Stokta {stock} {unit} var.")
-                    return
-                line_total = float(price) * new_qty
-                self.cart.item(iid, values=(pid, name, barcode or "", f"{float(price):.2f}", f"{new_qty:g}", f"{line_total:.2f}"))
-                break
-        else:
-            line_total = float(price) * qty
-            self.cart.insert("", "end", values=(pid, name, barcode or "", f"{float(price):.2f}", f"{qty:g}", f"{line_total:.2f}"))
+        # Merges with the product's existing line
+        line = self.basket.get(pid)
+        if line is not None and line.quantity + qty > float(stock):
+            self.status_var.set(f"Yetersiz stok. Stokta {stock} {unit} var.")
+            return
+        self.basket.add(pid, name, barcode, price, qty)
+        self._render_line(pid)
         self.entry_scan.delete(0, tk.END)
         self.entry_qty.delete(0, tk.END)
         self.entry_qty.insert(0, "1")
@@ -725,11 +969,14 @@ class SalesFrame(tk.Frame):
         self.status_var.set("")
 
     def complete_sale(self) -> None:
-        items = [self.cart.item(iid, "values") for iid in self.cart.get_children()]
-        if not items:
+        if getattr(self, '_sale_pending', False):
+            return
+        basket = self.basket
+        lines = basket.lines()
+        if not lines:
             self.status_var.set("Sepet boş.")
             return
-        total = float(self.total_var.get())
+        total = checkout.cart_total(lines)
         paid = self._parse_money(self.entry_paid.get())
         if paid != paid:
             self.status_var.set("Geçersiz ödenen tutar.")
@@ -737,47 +984,43 @@ class SalesFrame(tk.Frame):
         if paid < total:
             self.status_var.set("Ödenen tutar yetersiz.")
             return
-        conn = sqlite3.connect(DB_NAME)
-        cur = conn.cursor()
-        try:
-            # Create sale
-            date_str = (self.entry_date.get().strip() if hasattr(self, 'entry_date') else "") or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            cur.execute("INSERT INTO sales (date, total) VALUES (?, ?)", (date_str, total))
-            sale_id = cur.lastrowid
-            # Insert items and update stock
-            for pid, _name, _barcode, price, qty, _line_total in items:
-                cur.execute(
-                    "INSERT INTO sale_items (sale_id, product_id, quantity, price) VALUES (?, ?, ?, ?)",
-                    (sale_id, int(pid), float(qty), float(price)),
-                )
-                cur.execute("UPDATE products SET stock = stock - ? WHERE id = ?", (float(qty), int(pid)))
-            # Add to ledger as income
-            cur.execute(
-                "INSERT INTO ledger (type, amount, description) VALUES ('gelir', ?, ?)",
-                (total, f"Satış #{sale_id}"),
-            )
-            # Add to cashbook as cash-in
-            cur.execute(
-                "INSERT INTO cashbook (type, amount, description) VALUES ('in', ?, ?)",
-                (total, f"Satış #{sale_id}"),
-            )
-            conn.commit()
-        except Exception as e:
-            conn.rollback()
+        date_str = self._sale_date()
+        # Commit on the DB writer thread; the till stays responsive meanwhile.
+        # The sale also empties the cart's journal entry, at a rev newer
+        # than anything journalled before it.
+        name, rev = self.book.active, cart.next_rev()
+        self._sale_pending = True
+        self._inflight = (basket, lines)
+        self.status_var.set("Satış kaydediliyor...")
+
+        def _done(_sale_id) -> None:
+            self._sale_pending = False
+            self._inflight = None
+            catalog.refresh(l.product_id for l in lines)
+            # Only take out what was sold; anything scanned while the commit
+            # was in flight stays in the cart.
+            for pid in basket.subtract(lines):
+                self._render_line(pid)
+            self._recalc_total()
+            change = paid - total
+            self.entry_paid.delete(0, tk.END)
+            self._set_now()
+            self.status_var.set(f"Satış tamamlandı. Ödenen: {paid:.2f}, Paraüstü: {change:.2f}")
+            self._update_change()
+            try:
+                self.entry_scan.focus_set()
+            except Exception:
+                pass
+
+        def _failed(e) -> None:
+            self._sale_pending = False
+            self._inflight = None
+            # Journal the full cart again; nothing was sold
+            self._recalc_total()
             self.status_var.set(f"Satış tamamlanamadı: {e}")
-            return
-        finally:
-            conn.close()
-        self.clear_cart()
-        change = paid - total
-        self.entry_paid.delete(0, tk.END)
-        self.status_var.set(f"Satış tamamlandı. Ödenen: {paid:.2f}, Paraüstü: {change:.2f}")
-        self._update_change()
-        try:
-            self.entry_scan.focus_set()
-        except Exception:
-            pass
 
+        worker.call(self, cart.complete_sale, cart.TILL, name, rev, lines, date_str,
+                    on_done=_done, on_error=_failed, write=True)
 
 class ReturnFrame(tk.Frame):
     def __init__(self, parent: tk.Misc, controller) -> None:
@@ -950,6 +1193,9 @@ class ReturnFrame(tk.Frame):
 
         self._set_now()
         self._recalc_total()
+        # Prices or stock may have changed on another till
+        self._products_watch = changes.watch(
+            self, ("products",), on_change=lambda: worker.call(self, catalog.reload, key="catalog.reload"))
 
         # Internal maps for original sale
         self._allowed_qty = {}  # pid -> remaining refundable qty
@@ -958,6 +1204,8 @@ class ReturnFrame(tk.Frame):
 
     def on_show(self, **kwargs) -> None:
         self.controller.title("Kooperatif - İade İşlemi")
+        if self._products_watch.consume():
+            worker.call(self, catalog.reload, key="catalog.reload")
         try:
             self.entry_scan.delete(0, tk.END)
             self.entry_qty.delete(0, tk.END)
@@ -1010,17 +1258,10 @@ class ReturnFrame(tk.Frame):
         text = text.strip()
         if not text:
             return None
-        conn = sqlite3.connect(DB_NAME)
-        cur = conn.cursor()
-        cur.execute("SELECT id, name, barcode, price, stock, unit FROM products WHERE barcode = ?", (text,))
-        row = cur.fetchone()
+        row = catalog.by_barcode(text)
         if not row:
-            cur.execute(
-                "SELECT id, name, barcode, price, stock, unit FROM products WHERE name LIKE ? ORDER BY id LIMIT 1",
-                (f"%{text}%",),
-            )
-            row = cur.fetchone()
-        conn.close()
+            rows = search.search_products(text, limit=1, columns=('name',), order='p.id')
+            row = rows[0] if rows else None
         return row
 
     def _mark_paid_edited(self) -> None:
@@ -1059,43 +1300,20 @@ class ReturnFrame(tk.Frame):
         self._sync_paid_with_total(total)
         self._update_change()
 
-    def _ensure_returns_table(self, cur) -> None:
-        cur.execute(
-            "CREATE TABLE IF NOT EXISTS returns (id INTEGER PRIMARY KEY AUTOINCREMENT, original_sale_id INTEGER NOT NULL, return_sale_id INTEGER NOT NULL, date TEXT NOT NULL DEFAULT (datetime('now')))"
-        )
-
     def _list_sales_for_product(self) -> None:
         q = (self.entry_scan.get() or '').strip()
         for iid in getattr(self, 'purchases', ttk.Treeview()).get_children():
             self.purchases.delete(iid)
         if not q:
             self.status_var.set("Ürün barkodu/ismi girin.")
-        return
+            return
         prod = self._find_product(q)
         if not prod:
             self.status_var.set("Ürün bulunamadı.")
             return
         pid, prod_name, _barcode, _price, _stock, _unit = prod
-        conn = sqlite3.connect(DB_NAME)
-        cur = conn.cursor()
-        self._ensure_returns_table(cur)
-        cur.execute(
-            "SELECT s.id, s.date, SUM(si.quantity) AS qty, MAX(si.price) AS price FROM sales s JOIN sale_items si ON si.sale_id = s.id WHERE si.product_id = ? AND si.quantity > 0 GROUP BY s.id, s.date ORDER BY s.date DESC",
-            (int(pid),)
-        )
-        rows = cur.fetchall()
-        for sid, d, qty, price in rows:
-            cur.execute("SELECT return_sale_id FROM returns WHERE original_sale_id = ?", (sid,))
-            ret_ids = [r[0] for r in cur.fetchall()]
-            returned = 0.0
-            if ret_ids:
-                qmarks = ",".join(["?"] * len(ret_ids))
-                cur.execute(f"SELECT COALESCE(SUM(-quantity),0) FROM sale_items WHERE product_id = ? AND sale_id IN ({qmarks})", (int(pid), *ret_ids))
-                returned = float(cur.fetchone()[0] or 0.0)
-            remaining = float(qty or 0.0) - returned
-            if remaining > 0:
-                self.purchases.insert('', 'end', values=(sid, d, prod_name, f"{float(qty):g}", f"{returned:g}", f"{remaining:g}", f"{float(price):.2f}"))
-        conn.close()
+        for r in returns.returnable_for_product(int(pid)):
+            self.purchases.insert('', 'end', values=(r.sale_id, r.date, prod_name, f"{r.purchased:g}", f"{r.returned:g}", f"{r.remaining:g}", f"{r.price:.2f}"))
         self._active_pid = int(pid)
         self.status_var.set("Satışlar listelendi. Bir satıra çift tıklayın.")
 
@@ -1126,13 +1344,9 @@ class ReturnFrame(tk.Frame):
         if qty > remaining:
             qty = int(remaining)
         # Fetch product details for display
-        conn = sqlite3.connect(DB_NAME)
-        cur = conn.cursor()
-        cur.execute("SELECT name, COALESCE(barcode,'') FROM products WHERE id = ?", (pid,))
-        row = cur.fetchone()
-        conn.close()
-        name = row[0] if row else str(pid)
-        barcode = row[1] if row else ''
+        row = catalog.by_id(pid)
+        name = row.name if row else str(pid)
+        barcode = (row.barcode or '') if row else ''
         price = float(self._orig_price.get(pid, 0.0))
         # Merge/insert into return cart
         for iid in self.cart.get_children():
@@ -1158,51 +1372,23 @@ class ReturnFrame(tk.Frame):
         except Exception:
             self.status_var.set("Geçersiz Satış #.")
             return
-        conn = sqlite3.connect(DB_NAME)
-        cur = conn.cursor()
-        try:
-            # Verify sale exists
-            cur.execute("SELECT id, date, total FROM sales WHERE id = ?", (sid,))
-            sale = cur.fetchone()
-            if not sale:
-                self.sale_info_var.set("")
-                self.status_var.set("Satış bulunamadı.")
-                return
-            # Load purchased quantities and prices
-            cur.execute("SELECT product_id, SUM(quantity), price FROM sale_items WHERE sale_id = ? GROUP BY product_id", (sid,))
-            purchased = {int(pid): float(qty or 0.0) for pid, qty, _price in cur.fetchall()}
-            # Prefer original price per product as last price in that sale
-            cur.execute("SELECT product_id, price FROM sale_items WHERE sale_id = ?", (sid,))
-            self._orig_price = {}
-            for pid, price in cur.fetchall():
-                self._orig_price[int(pid)] = float(price)
-            # Subtract previous returns linked to this sale
-            self._ensure_returns_table(cur)
-            cur.execute("SELECT return_sale_id FROM returns WHERE original_sale_id = ?", (sid,))
-            ret_ids = [r[0] for r in cur.fetchall()]
-            returned = {}
-            if ret_ids:
-                qmarks = ",".join(["?"] * len(ret_ids))
-                cur.execute(f"SELECT product_id, SUM(quantity) FROM sale_items WHERE sale_id IN ({qmarks}) GROUP BY product_id", ret_ids)
-                for pid, qty in cur.fetchall():
-                    # qty are negative; add to compute net remaining
-                    returned[int(pid)] = float(qty or 0.0)
-            # Compute remaining refundable
-            self._allowed_qty = {}
-            for pid, qty in purchased.items():
-                prev = returned.get(pid, 0.0)
-                remaining = float(qty) + float(prev)  # prev is negative
-                if remaining > 0:
-                    self._allowed_qty[pid] = remaining
-            # Update info
-            date_s = sale[1]
-            total_s = float(sale[2])
-            self.sale_info_var.set(f"Tarih: {date_s}, Toplam: {total_s:.2f}")
-            self.status_var.set("Satış yüklendi. Ürünleri ekleyin.")
-            # Clear current cart
-            self.clear_cart()
-        finally:
-            conn.close()
+        # Verify sale exists
+        sale = returns.sale_header(sid)
+        if not sale:
+            self.sale_info_var.set("")
+            self.status_var.set("Satış bulunamadı.")
+            return
+        # Purchased minus previously returned, per product, in one query
+        lines = returns.returnable_for_sale(sid)
+        self._orig_price = {pid: r.price for pid, r in lines.items()}
+        self._allowed_qty = {pid: r.remaining for pid, r in lines.items() if r.remaining > 0}
+        # Update info
+        date_s = sale[1]
+        total_s = float(sale[2])
+        self.sale_info_var.set(f"Tarih: {date_s}, Toplam: {total_s:.2f}")
+        self.status_var.set("Satış yüklendi. Ürünleri ekleyin.")
+        # Clear current cart
+        self.clear_cart()
 
     def _update_change(self, _e=None) -> None:
         try:
@@ -1275,11 +1461,11 @@ class ReturnFrame(tk.Frame):
         self.status_var.set("Sepete eklendi.")
 
     def complete_return(self) -> None:
-        items = [self.cart.item(iid, "values") for iid in self.cart.get_children()]
-        if not items:
+        lines = _tree_lines(self.cart, self.cart.get_children())
+        if not lines:
             self.status_var.set("Sepet boş.")
             return
-        total = float(self.total_var.get())
+        total = checkout.cart_total(lines)
         paid = self._parse_money(self.entry_paid.get())
         if paid != paid:
             self.status_var.set("Geçersiz verilen tutar.")
@@ -1287,46 +1473,18 @@ class ReturnFrame(tk.Frame):
         if paid < total:
             self.status_var.set("Verilen tutar yetersiz.")
             return
-        conn = sqlite3.connect(DB_NAME)
-        cur = conn.cursor()
+        date_str = self.entry_date.get().strip() or None
+        # Link this return with original sale
         try:
-            date_str = (self.entry_date.get().strip() or datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
-            # Record return as negative sale
-            cur.execute("INSERT INTO sales (date, total) VALUES (?, ?)", (date_str, -total))
-            sale_id = cur.lastrowid
-            for pid, _name, _barcode, price, qty, _line_total in items:
-                # Negative quantity represents return
-                cur.execute(
-                    "INSERT INTO sale_items (sale_id, product_id, quantity, price) VALUES (?, ?, ?, ?)",
-                    (sale_id, int(pid), -float(qty), float(price)),
-                )
-                # Put items back to stock
-                cur.execute("UPDATE products SET stock = stock + ? WHERE id = ?", (float(qty), int(pid)))
-            # Ledger as expense (money leaves the till)
-            cur.execute(
-                "INSERT INTO ledger (type, amount, description) VALUES ('gider', ?, ?)",
-                (total, f"İade #{sale_id}"),
-            )
-            # Cashbook as cash-out
-            cur.execute(
-                "INSERT INTO cashbook (type, amount, description) VALUES ('out', ?, ?)",
-                (total, f"İade #{sale_id}"),
-            )
-            # Link this return with original sale
-            self._ensure_returns_table(cur)
-            try:
-                orig_sid = int((self.sale_id_var.get() or "").strip())
-            except Exception:
-                orig_sid = None
-            if orig_sid:
-                cur.execute("INSERT INTO returns (original_sale_id, return_sale_id) VALUES (?, ?)", (orig_sid, sale_id))
-            conn.commit()
+            orig_sid = int((self.sale_id_var.get() or "").strip())
+        except Exception:
+            orig_sid = None
+        try:
+            returns.complete_return(lines, orig_sid, date_str)
         except Exception as e:
-            conn.rollback()
             self.status_var.set(f"İade tamamlanamadı: {e}")
             return
-        finally:
-            conn.close()
+        catalog.refresh(l.product_id for l in lines)
         self.clear_cart()
         diff = paid - total
         self.entry_paid.delete(0, tk.END)
@@ -1407,11 +1565,11 @@ class ReturnFrame(tk.Frame):
         self.status_var.set("")
 
     def complete_sale(self) -> None:
-        items = [self.cart.item(iid, "values") for iid in self.cart.get_children()]
-        if not items:
+        lines = _tree_lines(self.cart, self.cart.get_children())
+        if not lines:
             self.status_var.set("Sepet boş.")
             return
-        total = float(self.total_var.get())
+        total = checkout.cart_total(lines)
         paid = self._parse_money(self.entry_paid.get())
         if paid != paid:
             self.status_var.set("Geçersiz ödenen tutar.")
@@ -1419,37 +1577,13 @@ class ReturnFrame(tk.Frame):
         if paid < total:
             self.status_var.set("Ödenen tutar yetersiz.")
             return
-        conn = sqlite3.connect(DB_NAME)
-        cur = conn.cursor()
+        date_str = (self.entry_date.get().strip() if hasattr(self, 'entry_date') else "") or None
         try:
-            # Create sale
-            date_str = (self.entry_date.get().strip() if hasattr(self, 'entry_date') else "") or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            cur.execute("INSERT INTO sales (date, total) VALUES (?, ?)", (date_str, total))
-            sale_id = cur.lastrowid
-            # Insert items and update stock
-            for pid, _name, _barcode, price, qty, _line_total in items:
-                cur.execute(
-                    "INSERT INTO sale_items (sale_id, product_id, quantity, price) VALUES (?, ?, ?, ?)",
-                    (sale_id, int(pid), float(qty), float(price)),
-                )
-                cur.execute("UPDATE products SET stock = stock - ? WHERE id = ?", (float(qty), int(pid)))
-            # Add to ledger as income
-            cur.execute(
-                "INSERT INTO ledger (type, amount, description) VALUES ('gelir', ?, ?)",
-                (total, f"Satış #{sale_id}"),
-            )
-            # Add to cashbook as cash-in
-            cur.execute(
-                "INSERT INTO cashbook (type, amount, description) VALUES ('in', ?, ?)",
-                (total, f"Satış #{sale_id}"),
-            )
-            conn.commit()
+            checkout.complete_sale(lines, date_str)
         except Exception as e:
-            conn.rollback()
             self.status_var.set(f"Satış tamamlanamadı: {e}")
             return
-        finally:
-            conn.close()
+        catalog.refresh(l.product_id for l in lines)
         self.clear_cart()
         change = paid - total
         self.entry_paid.delete(0, tk.END)
@@ -0,0 +1,166 @@
+"""Product search backed by an FTS5 trigram index.
+
+products_fts holds a Turkish-folded copy of products.name/barcode (rowid =
+products.id) and is kept in sync by triggers, so "%q%"-style lookups become
+index probes instead of full scans. Folding maps the Turkish letters to
+their ASCII base and lowercases, so "ŞEKER", "seker" and "Şeker" all match.
+The table and its triggers are created by migration 3.
+
+Trigrams need at least three characters; shorter queries (and SQLite
+builds without FTS5/trigram) fall back to plain LIKE.
+"""
+import sqlite3
+from collections import OrderedDict
+from typing import List, Optional, Sequence, Tuple
+
+import db
+
+# Turkish letters -> ASCII base. Upper and lower case are listed explicitly
+# because SQLite's lower() only handles ASCII and Python's lower() turns
+# 'İ' into 'i' + combining dot.
+_FOLD_MAP = {
+    'İ': 'i', 'I': 'i', 'ı': 'i',
+    'Ş': 's', 'ş': 's',
+    'Ğ': 'g', 'ğ': 'g',
+    'Ü': 'u', 'ü': 'u',
+    'Ö': 'o', 'ö': 'o',
+    'Ç': 'c', 'ç': 'c',
+    'Â': 'a', 'â': 'a',
+    'Î': 'i', 'î': 'i',
+    'Û': 'u', 'û': 'u',
+}
+_FOLD_TABLE = str.maketrans(_FOLD_MAP)
+
+MIN_FTS_LEN = 3
+
+
+def fold_text(text) -> str:
+    """Turkish-aware case and diacritic folding used for indexing and queries."""
+    return str(text or '').translate(_FOLD_TABLE).lower()
+
+
+def fold_sql(expr: str) -> str:
+    """SQL expression equivalent of fold_text(expr). Pure built-ins, so the
+    sync triggers also work from connections that did not load this module
+    (e.g. the sqlite3 shell)."""
+    out = f"COALESCE({expr}, '')"
+    for src, dst in _FOLD_MAP.items():
+        out = f"replace({out}, '{src}', '{dst}')"
+    return f"lower({out})"
+
+
+def fts_supported() -> bool:
+    """True if this SQLite build has FTS5 with the trigram tokenizer (3.34+)."""
+    try:
+        conn = sqlite3.connect(":memory:")
+        try:
+            conn.execute("CREATE VIRTUAL TABLE t USING fts5(x, tokenize='trigram')")
+        finally:
+            conn.close()
+        return True
+    except sqlite3.Error:
+        return False
+
+
+def rebuild_fts(cur) -> None:
+    cur.execute("DELETE FROM products_fts")
+    cur.execute(
+        f"INSERT INTO products_fts(rowid, name, barcode) "
+        f"SELECT id, {fold_sql('name')}, {fold_sql('barcode')} FROM products"
+    )
+
+
+def fts_available() -> bool:
+    try:
+        return db.query_one("SELECT 1 FROM sqlite_master WHERE name='products_fts'") is not None
+    except sqlite3.Error:
+        return False
+
+
+def _phrase(folded: str) -> str:
+    return '"' + folded.replace('"', '""') + '"'
+
+
+def product_filter(q: str, columns: Sequence[str] = ('name', 'barcode'), alias: str = 'p') -> Tuple[str, tuple]:
+    """Return (sql condition, params) matching products whose given columns
+    contain q. The condition refers to products under `alias`."""
+    q = (q or '').strip()
+    folded = fold_text(q)
+    if len(folded) >= MIN_FTS_LEN and fts_available():
+        match = "{" + " ".join(columns) + "} : " + _phrase(folded)
+        return f"{alias}.id IN (SELECT rowid FROM products_fts WHERE products_fts MATCH ?)", (match,)
+    like = f"%{q}%"
+    cond = " OR ".join(f"{alias}.{c} LIKE ?" for c in columns)
+    return f"({cond})", (like,) * len(columns)
+
+
+def search_products(q: str, limit: int = 10, columns: Sequence[str] = ('name', 'barcode'), order: str = 'p.name') -> List[tuple]:
+    """(id, name, barcode, price, stock, unit) rows matching q."""
+    cond, params = product_filter(q, columns)
+    return db.query(
+        f"SELECT p.id, p.name, p.barcode, p.price, p.stock, p.unit FROM products p "
+        f"WHERE {cond} ORDER BY {order} LIMIT ?",
+        params + (int(limit),),
+    )
+
+
+class SuggestCache:
+    """LRU of typeahead query -> search_products() rows, in result order.
+
+    An entry holding fewer than `rows` rows is the complete match set for
+    its query. With the FTS index, matching is "folded text contains the
+    folded query", so a longer query that contains a complete entry's key
+    is answered by filtering that entry here instead of querying again.
+    (Without FTS, or below MIN_FTS_LEN, queries use LIKE and only exact
+    repeats are served.)
+    """
+
+    def __init__(self, size: int = 64, rows: int = 200, fts: bool = True) -> None:
+        self.size = size
+        self.rows = rows
+        self.fts = fts
+        # key -> (rows, folded "name\nbarcode" per row, complete)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def _key(self, q: str) -> Tuple[str, bool]:
+        q = (q or '').strip()
+        folded = fold_text(q)
+        if self.fts and len(folded) >= MIN_FTS_LEN:
+            return folded, True
+        return q, False
+
+    def get(self, q: str) -> Optional[List[tuple]]:
+        """Rows for q, or None if the database has to be asked."""
+        key, narrowable = self._key(q)
+        hit = self._entries.get(key)
+        if hit is not None:
+            self._entries.move_to_end(key)
+            return hit[0]
+        if not narrowable:
+            return None
+        best = None
+        for k, (_rows, _hay, complete) in self._entries.items():
+            if complete and len(k) >= MIN_FTS_LEN and k in key and (best is None or len(k) > len(best)):
+                best = k
+        if best is None:
+            return None
+        rows, hay, _complete = self._entries[best]
+        keep = [i for i, h in enumerate(hay) if key in h]
+        self._store(key, [rows[i] for i in keep], [hay[i] for i in keep], True)
+        return self._entries[key][0]
+
+    def put(self, q: str, rows: List[tuple]) -> None:
+        """Remember rows from search_products(q, limit=self.rows)."""
+        key, _narrowable = self._key(q)
+        rows = list(rows[:self.rows])
+        hay = [fold_text(r[1]) + "\n" + fold_text(r[2]) for r in rows]
+        self._store(key, rows, hay, len(rows) < self.rows)
+
+    def _store(self, key: str, rows: list, hay: list, complete: bool) -> None:
+        self._entries[key] = (rows, hay, complete)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
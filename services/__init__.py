@@ -0,0 +1,14 @@
+"""Tk-free business logic, shared by the frames, scripts and benchmarks.
+
+    catalog    in-process product lookups (scan, by id)
+    checkout   sales: one transaction per basket
+    returns    returns and "how much can still come back"
+    cash       till/bank movements (cashbook, bankbook)
+    ledger     income/expense entries
+    investors  investors, their transactions and pool shares
+
+Functions take plain values, validate them (ValueError with a message fit
+for the user) and open their own db.transaction(), which nests as a
+SAVEPOINT when a caller already holds one. Frames parse widgets, call in
+here (through worker.call for anything slow) and render the result.
+"""
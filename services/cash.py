@@ -0,0 +1,48 @@
+"""Till and bank movements.
+
+Rows go into cashbook/bankbook as 'in'/'out' amounts; running balances are
+kept by triggers (balances.py).
+"""
+from typing import Optional
+
+import balances
+import db
+
+
+def _amount(amount) -> float:
+    amount = float(amount)
+    if amount != amount or amount <= 0:  # NaN or non-positive
+        raise ValueError("Pozitif bir tutar girin.")
+    return amount
+
+
+def post_cash(cur, direction: str, amount: float, description: str) -> None:
+    """Post a till movement: 'in' is income + cash-in, 'out' is expense + cash-out."""
+    ledger_type = "gelir" if direction == "in" else "gider"
+    cur.execute("INSERT INTO ledger (type, amount, description) VALUES (?, ?, ?)", (ledger_type, amount, description))
+    cur.execute("INSERT INTO cashbook (type, amount, description) VALUES (?, ?, ?)", (direction, amount, description))
+
+
+def book_entry(book: str, direction: str, amount, description: Optional[str] = None) -> int:
+    """Add one 'in'/'out' row to cashbook or bankbook; returns its id."""
+    if book not in balances.BOOKS:
+        raise ValueError(f"unknown book: {book}")
+    if direction not in ("in", "out"):
+        raise ValueError(f"unknown direction: {direction}")
+    amount = _amount(amount)
+    with db.transaction() as cur:
+        cur.execute(f"INSERT INTO {book} (type, amount, description) VALUES (?, ?, ?)",
+                    (direction, amount, description or None))
+        return cur.lastrowid
+
+
+def transfer_to_bank(amount, description: Optional[str] = None) -> None:
+    """Move cash from the till to the bank (cash out + bank in, one transaction)."""
+    amount = _amount(amount)
+    with db.transaction() as cur:
+        cur.execute("INSERT INTO cashbook (type, amount, description) VALUES ('out', ?, ?)", (amount, description or None))
+        cur.execute("INSERT INTO bankbook (type, amount, description) VALUES ('in', ?, ?)", (amount, description or None))
+
+
+def balance(book: str) -> float:
+    return balances.balance(book)
@@ -0,0 +1,129 @@
+"""In-process product catalog.
+
+Barcode scans and id lookups on the sales/returns screens resolve from two
+dicts (by barcode, by id) instead of hitting SQLite. The full table is
+loaded lazily on first use; writers keep it current by calling
+invalidate()/refresh() after they commit a change to products. Changes
+made by another till or process show up through the change bus: the
+screens that scan watch products and call reload() off the Tk thread.
+"""
+import threading
+from typing import Dict, Iterable, NamedTuple, Optional
+
+import db
+
+
+class ProductRow(NamedTuple):
+    id: int
+    name: str
+    barcode: Optional[str]
+    price: float
+    stock: float
+    unit: str
+
+
+_SELECT = "SELECT id, name, barcode, price, stock, unit FROM products"
+
+_lock = threading.RLock()
+_by_id: Dict[int, ProductRow] = {}
+_by_barcode: Dict[str, ProductRow] = {}
+_loaded = False
+
+
+def _put(row: ProductRow) -> None:
+    old = _by_id.get(row.id)
+    if old is not None and old.barcode and _by_barcode.get(old.barcode) is old:
+        del _by_barcode[old.barcode]
+    _by_id[row.id] = row
+    if row.barcode:
+        _by_barcode[row.barcode] = row
+
+
+def _drop(pid: int) -> None:
+    old = _by_id.pop(pid, None)
+    if old is not None and old.barcode and _by_barcode.get(old.barcode) is old:
+        del _by_barcode[old.barcode]
+
+
+def _ensure_loaded() -> None:
+    global _loaded
+    if _loaded:
+        return
+    with _lock:
+        if _loaded:
+            return
+        _by_id.clear()
+        _by_barcode.clear()
+        for r in db.query(_SELECT):
+            _put(ProductRow(*r))
+        _loaded = True
+
+
+def reload() -> None:
+    """Re-read the whole table (on a worker thread) and swap it in; until
+    then lookups are served from the previous dicts without waiting."""
+    global _by_id, _by_barcode, _loaded
+    rows = [ProductRow(*r) for r in db.query(_SELECT)]
+    by_id = {r.id: r for r in rows}
+    by_barcode = {r.barcode: r for r in rows if r.barcode}
+    with _lock:
+        _by_id, _by_barcode = by_id, by_barcode
+        _loaded = True
+
+
+def by_barcode(code: str) -> Optional[ProductRow]:
+    code = (code or "").strip()
+    if not code:
+        return None
+    _ensure_loaded()
+    row = _by_barcode.get(code)
+    if row is None:
+        # Might have been added by another till since we loaded
+        r = db.query_one(_SELECT + " WHERE barcode = ?", (code,))
+        if r is not None:
+            row = ProductRow(*r)
+            with _lock:
+                _put(row)
+    return row
+
+
+def by_id(pid: int) -> Optional[ProductRow]:
+    try:
+        pid = int(pid)
+    except (TypeError, ValueError):
+        return None
+    _ensure_loaded()
+    row = _by_id.get(pid)
+    if row is None:
+        r = db.query_one(_SELECT + " WHERE id = ?", (pid,))
+        if r is not None:
+            row = ProductRow(*r)
+            with _lock:
+                _put(row)
+    return row
+
+
+def refresh(ids: Iterable[int]) -> None:
+    """Re-read the given product ids (after a sale, return or edit)."""
+    if not _loaded:
+        return
+    for pid in {int(i) for i in ids}:
+        r = db.query_one(_SELECT + " WHERE id = ?", (pid,))
+        with _lock:
+            if r is None:
+                _drop(pid)
+            else:
+                _put(ProductRow(*r))
+
+
+def invalidate(pid: Optional[int] = None) -> None:
+    """Forget one product (re-read now) or, with no id, the whole catalog
+    (reloaded on next lookup)."""
+    global _loaded
+    if pid is not None:
+        refresh([pid])
+        return
+    with _lock:
+        _loaded = False
+        _by_id.clear()
+        _by_barcode.clear()
@@ -0,0 +1,67 @@
+"""Checkout write path for sales.
+
+A sale is one transaction with a constant number of statements whatever
+the basket size:
+- the header row;
+- one executemany for the lines;
+- one set-based stock UPDATE driven by those lines;
+- the ledger/cashbook posting.
+Returns (services/returns.py) use the same path with negative quantities.
+"""
+from datetime import datetime
+from typing import Iterable, List, NamedTuple, Optional
+
+import db
+from services.cash import post_cash
+
+
+class CartLine(NamedTuple):
+    product_id: int
+    quantity: float
+    price: float
+
+
+# Stock moves by the sum of the sale's lines per product; returns carry
+# negative quantities, so the same statement puts items back.
+_APPLY_STOCK = """
+    UPDATE products
+       SET stock = stock - (SELECT SUM(si.quantity) FROM sale_items si
+                             WHERE si.sale_id = ? AND si.product_id = products.id)
+     WHERE id IN (SELECT product_id FROM sale_items WHERE sale_id = ?)
+"""
+
+
+def _now() -> str:
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _clean(lines: Iterable) -> List[CartLine]:
+    out = [CartLine(int(pid), float(qty), float(price)) for pid, qty, price in lines]
+    if not out:
+        raise ValueError("Sepet boş.")
+    return out
+
+
+def cart_total(lines: Iterable[CartLine]) -> float:
+    return round(sum(l.quantity * l.price for l in lines), 2)
+
+
+def _write(cur, lines: List[CartLine], sign: float, date: str) -> int:
+    total = cart_total(lines)
+    cur.execute("INSERT INTO sales (date, total) VALUES (?, ?)", (date, sign * total))
+    sale_id = cur.lastrowid
+    cur.executemany(
+        "INSERT INTO sale_items (sale_id, product_id, quantity, price) VALUES (?, ?, ?, ?)",
+        [(sale_id, l.product_id, sign * l.quantity, l.price) for l in lines],
+    )
+    cur.execute(_APPLY_STOCK, (sale_id, sale_id))
+    return sale_id
+
+
+def complete_sale(lines: Iterable, date: Optional[str] = None) -> int:
+    """Record a sale of (product_id, quantity, price) lines; returns the sale id."""
+    lines = _clean(lines)
+    with db.transaction("IMMEDIATE") as cur:
+        sale_id = _write(cur, lines, 1.0, date or _now())
+        post_cash(cur, "in", cart_total(lines), f"Satış #{sale_id}")
+    return sale_id
@@ -0,0 +1,137 @@
+"""Investors, their contributions/withdrawals and pool shares.
+
+An investor's current capital is the initial capital plus contributions
+minus withdrawals. The investor pool owns `investor_pool_percent` of the
+shop; each investor's pool share is their capital over the pool's total,
+and their shop share is that times the pool percent.
+"""
+from typing import List, NamedTuple, Optional, Tuple
+
+import db
+
+POOL_SETTING = "investor_pool_percent"
+TX_TYPES = ("contribution", "withdrawal")
+_BAD_CAPITAL = "Geçersiz başlangıç sermayesi."
+
+# Investors with the net of their transactions, in one pass
+_INVESTORS = """
+    SELECT i.id, i.name, COALESCE(i.phone,''), i.initial_capital,
+           COALESCE(i.initial_date,''),
+           COALESCE((SELECT SUM(CASE WHEN t.type='contribution' THEN t.amount WHEN t.type='withdrawal' THEN -t.amount ELSE 0 END)
+                    FROM investor_transactions t WHERE t.investor_id = i.id), 0)
+    FROM investors i
+    ORDER BY i.id
+"""
+
+
+class InvestorShare(NamedTuple):
+    id: int
+    name: str
+    phone: str
+    initial_capital: float
+    initial_date: str
+    current_capital: float
+    pool_share: float  # percent of the investor pool
+    shop_share: float  # percent of the shop
+
+
+def _amount(amount, allow_zero: bool = False, message: str = "Pozitif bir tutar girin.") -> float:
+    amount = float(amount)
+    if amount != amount or amount < 0 or (amount == 0 and not allow_zero):  # NaN, negative
+        raise ValueError(message)
+    return amount
+
+
+def pool_percent() -> float:
+    val = db.scalar("SELECT value FROM settings WHERE key = ?", (POOL_SETTING,))
+    return float(val) if val else 0.0
+
+
+def set_pool_percent(value) -> None:
+    value = float(value)
+    if value != value or value < 0 or value > 100:
+        raise ValueError("Havuz % 0 ile 100 arası olmalıdır.")
+    db.set_setting(POOL_SETTING, f"{value}")
+
+
+def shares(rows, pool: float) -> List[InvestorShare]:
+    """Share math over (id, name, phone, initial, date, tx_sum) rows."""
+    caps = [float(r[3]) + float(r[5]) for r in rows]
+    total = sum(caps)
+    out = []
+    for r, cap in zip(rows, caps):
+        pool_share = cap / total * 100.0 if total > 0 else 0.0
+        out.append(InvestorShare(r[0], r[1], r[2], float(r[3]), r[4], cap, pool_share, pool_share * pool / 100.0))
+    return out
+
+
+def load() -> Tuple[float, List[InvestorShare]]:
+    """(pool percent, every investor with their shares)."""
+    pool = pool_percent()
+    return pool, shares(db.query(_INVESTORS), pool)
+
+
+def add_investor(name: str, phone: Optional[str] = None, initial_capital=0.0,
+                 initial_date: Optional[str] = None, notes: Optional[str] = None) -> int:
+    name = (name or "").strip()
+    if not name:
+        raise ValueError("İsim gerekli.")
+    cap = _amount(initial_capital, allow_zero=True, message=_BAD_CAPITAL)
+    with db.transaction() as cur:
+        cur.execute(
+            "INSERT INTO investors (name, phone, initial_capital, initial_date, notes) "
+            "VALUES (?, ?, ?, COALESCE(?, date('now')), ?)",
+            (name, phone or None, cap, initial_date or None, notes or None),
+        )
+        return cur.lastrowid
+
+
+def update_investor(investor_id: int, name: str, phone: Optional[str] = None, initial_capital=0.0,
+                    initial_date: Optional[str] = None, notes: Optional[str] = None) -> None:
+    name = (name or "").strip()
+    if not name:
+        raise ValueError("İsim gerekli.")
+    cap = _amount(initial_capital, allow_zero=True, message=_BAD_CAPITAL)
+    with db.transaction() as cur:
+        cur.execute(
+            "UPDATE investors SET name = ?, phone = ?, initial_capital = ?, "
+            "initial_date = COALESCE(?, date('now')), notes = ? WHERE id = ?",
+            (name, phone or None, cap, initial_date or None, notes or None, int(investor_id)),
+        )
+
+
+def delete_investor(investor_id: int) -> None:
+    with db.transaction() as cur:
+        cur.execute("DELETE FROM investors WHERE id = ?", (int(investor_id),))
+
+
+def notes(investor_id: int) -> str:
+    return db.scalar("SELECT COALESCE(notes,'') FROM investors WHERE id = ?", (int(investor_id),), "")
+
+
+def transactions(investor_id: int) -> List[tuple]:
+    """(id, date, type, amount, notes), newest first."""
+    return db.query(
+        "SELECT id, COALESCE(date,''), type, amount, COALESCE(notes,'') FROM investor_transactions "
+        "WHERE investor_id = ? ORDER BY date DESC, id DESC",
+        (int(investor_id),),
+    )
+
+
+def add_transaction(investor_id: int, tx_type: str, amount, date: Optional[str] = None,
+                    notes: Optional[str] = None) -> int:
+    if tx_type not in TX_TYPES:
+        raise ValueError(f"unknown transaction type: {tx_type}")
+    amount = _amount(amount)
+    with db.transaction() as cur:
+        cur.execute(
+            "INSERT INTO investor_transactions (investor_id, date, type, amount, notes) "
+            "VALUES (?, COALESCE(?, date('now')), ?, ?, ?)",
+            (int(investor_id), date or None, tx_type, amount, notes or None),
+        )
+        return cur.lastrowid
+
+
+def delete_transaction(tx_id: int) -> None:
+    with db.transaction() as cur:
+        cur.execute("DELETE FROM investor_transactions WHERE id = ?", (int(tx_id),))
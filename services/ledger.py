@@ -0,0 +1,60 @@
+"""Income (gelir) / expense (gider) entries."""
+from typing import NamedTuple, Optional
+
+import db
+
+TYPES = ("gelir", "gider")
+
+
+class Entry(NamedTuple):
+    type: str
+    amount: float
+    date: Optional[str] = None  # None: today (the column default)
+    description: Optional[str] = None
+    invoice_no: Optional[str] = None  # expenses only
+    company: Optional[str] = None  # expenses only
+
+
+def _clean(e: Entry) -> Entry:
+    if e.type not in TYPES:
+        raise ValueError(f"unknown ledger type: {e.type}")
+    amount = float(e.amount)
+    if amount != amount or amount <= 0:  # NaN or non-positive
+        raise ValueError("Pozitif bir tutar girin.")
+    expense = e.type == "gider"
+    return Entry(
+        e.type, amount, (e.date or "").strip() or None, e.description or None,
+        (e.invoice_no or None) if expense else None, (e.company or None) if expense else None,
+    )
+
+
+def add_entry(entry: Entry) -> int:
+    """Insert an entry; returns its id."""
+    e = _clean(entry)
+    with db.transaction() as cur:
+        if e.date:
+            cur.execute(
+                "INSERT INTO ledger (date, type, amount, description, invoice_no, company) VALUES (?, ?, ?, ?, ?, ?)",
+                (e.date, e.type, e.amount, e.description, e.invoice_no, e.company),
+            )
+        else:
+            cur.execute(
+                "INSERT INTO ledger (type, amount, description, invoice_no, company) VALUES (?, ?, ?, ?, ?)",
+                (e.type, e.amount, e.description, e.invoice_no, e.company),
+            )
+        return cur.lastrowid
+
+
+def update_entry(entry_id: int, entry: Entry) -> None:
+    e = _clean(entry)
+    with db.transaction() as cur:
+        cur.execute(
+            "UPDATE ledger SET date = COALESCE(?, date('now')), type = ?, amount = ?, description = ?, "
+            "invoice_no = ?, company = ? WHERE id = ?",
+            (e.date, e.type, e.amount, e.description, e.invoice_no, e.company, int(entry_id)),
+        )
+
+
+def delete_entry(entry_id: int) -> None:
+    with db.transaction() as cur:
+        cur.execute("DELETE FROM ledger WHERE id = ?", (int(entry_id),))
@@ -0,0 +1,79 @@
+"""Returns: a sale with negative quantities linked to the one it refunds.
+
+returnable_for_product/returnable_for_sale answer "how much can still come
+back" in one query each.
+"""
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+import db
+from services.cash import post_cash
+from services.checkout import _clean, _now, _write, cart_total
+
+
+def complete_return(lines: Iterable, original_sale_id: Optional[int] = None, date: Optional[str] = None) -> int:
+    """Record a return (a sale with negative quantities and total), put the
+    items back in stock and link it to the original sale; returns its id."""
+    lines = _clean(lines)
+    with db.transaction("IMMEDIATE") as cur:
+        sale_id = _write(cur, lines, -1.0, date or _now())
+        post_cash(cur, "out", cart_total(lines), f"İade #{sale_id}")
+        if original_sale_id:
+            cur.execute(
+                "INSERT INTO returns (original_sale_id, return_sale_id) VALUES (?, ?)",
+                (int(original_sale_id), sale_id),
+            )
+    return sale_id
+
+
+class Returnable(NamedTuple):
+    sale_id: int
+    date: str
+    product_id: int
+    purchased: float
+    returned: float
+    remaining: float
+    price: float
+
+
+# Purchased vs. already returned per (sale, product). Returns are sales
+# with negative quantities linked through `returns`; {where} narrows the
+# purchases to one product or one sale before anything is joined.
+_RETURNABLE = """
+    WITH bought AS (
+        SELECT si.sale_id, si.product_id, SUM(si.quantity) AS qty, MAX(si.price) AS price
+          FROM sale_items si
+         WHERE si.quantity > 0 AND {where}
+         GROUP BY si.sale_id, si.product_id
+    ), back AS (
+        SELECT r.original_sale_id AS sale_id, ri.product_id, -SUM(ri.quantity) AS qty
+          FROM returns r JOIN sale_items ri ON ri.sale_id = r.return_sale_id
+         WHERE r.original_sale_id IN (SELECT sale_id FROM bought)
+         GROUP BY r.original_sale_id, ri.product_id
+    )
+    SELECT bought.sale_id, s.date, bought.product_id, bought.qty, COALESCE(back.qty, 0.0),
+           bought.qty - COALESCE(back.qty, 0.0), bought.price
+      FROM bought
+      JOIN sales s ON s.id = bought.sale_id
+      LEFT JOIN back ON back.sale_id = bought.sale_id AND back.product_id = bought.product_id
+"""
+
+
+def returnable_for_product(product_id: int, only_open: bool = True) -> List[Returnable]:
+    """Every sale of the product with purchased/returned/remaining
+    quantities, newest first."""
+    sql = _RETURNABLE.format(where="si.product_id = ?")
+    if only_open:
+        sql += " WHERE bought.qty - COALESCE(back.qty, 0.0) > 0"
+    rows = db.query(sql + " ORDER BY s.date DESC, bought.sale_id DESC", (int(product_id),))
+    return [Returnable(*r) for r in rows]
+
+
+def returnable_for_sale(sale_id: int) -> Dict[int, Returnable]:
+    """product_id -> Returnable for every product of the sale."""
+    rows = db.query(_RETURNABLE.format(where="si.sale_id = ?"), (int(sale_id),))
+    return {r[2]: Returnable(*r) for r in rows}
+
+
+def sale_header(sale_id: int) -> Optional[tuple]:
+    """(id, date, total) of a sale, or None."""
+    return db.query_one("SELECT id, date, total FROM sales WHERE id = ?", (int(sale_id),))
@@ -1,15 +1,17 @@
-import sqlite3
 import tkinter as tk
 from tkinter import ttk, messagebox
-from ui import make_back_arrow, apply_theme, rounded_outline, smart_tinted_bg, create_card, refresh_card_tints, ensure_card_control_backgrounds, ensure_ttk_contrast_styles, ensure_ttk_label_contrast
+from ui import sync_tree, make_back_arrow, apply_theme, rounded_outline, smart_tinted_bg, create_card, refresh_card_tints, ensure_card_control_backgrounds, ensure_ttk_contrast_styles, ensure_ttk_label_contrast
 from tkinter import ttk
 import os
-import shutil
 from datetime import datetime
-import importlib
 import sys
-
-DB_NAME = "coop.db"
+import db
+import migrations
+import balances
+import changes
+import querylog
+import worker
+from services import catalog
 
 
 class IOSSwitch(tk.Frame):
@@ -242,13 +244,24 @@ class SettingsFrame(tk.Frame):
         ttk.Button(btn_row, text="Sıfırla", command=self.reset_db, style='Solid.TButton').pack(side='left', padx=6)
         # Restart button (hidden until reset)
         self.btn_restart = ttk.Button(btn_row, text="Uygulamayı Yeniden Başlat", command=self.restart_app, style='Solid.TButton')
+        # Storage profile (journal/sync trade-off), see db.STORAGE_PROFILES
+        prof_row = tk.Frame(db_inner, bg=tint)
+        prof_row.pack(pady=(8, 0), anchor='center')
+        tk.Label(prof_row, text="Depolama profili:", bg=tint).pack(side='left')
+        self.var_profile = tk.StringVar(value=db.DEFAULT_PROFILE)
+        self.cmb_profile = ttk.Combobox(prof_row, textvariable=self.var_profile, values=list(db.STORAGE_PROFILES), state='readonly', width=10)
+        self.cmb_profile.pack(side='left', padx=(6, 0))
+        self.cmb_profile.bind('<<ComboboxSelected>>', lambda _e: self.on_profile_change())
+        ttk.Button(prof_row, text="Hız Testi", command=self.run_profile_bench, style='Solid.TButton').pack(side='left', padx=(12, 0))
+        ttk.Button(prof_row, text="Sorgu İstatistikleri", command=self.show_query_stats, style='Solid.TButton').pack(side='left', padx=(6, 0))
+        self.var_profile_info = tk.StringVar(value="")
+        tk.Label(db_inner, textvariable=self.var_profile_info, bg=tint, justify='left').pack(pady=(4, 0), anchor='center')
 
         _autosize_card(db_card, db_inner, min_w=560, pad=12, min_h=180)
         db_card.pack_propagate(False)
         self.status_var = tk.StringVar(value="")
         tk.Label(self, textvariable=self.status_var, fg="#444").pack(fill='x', padx=20, pady=(4, 0))
 
-        self._ensure_table()
         self._load()
 
     def _update_tabs_for_login_state(self) -> None:
@@ -467,49 +480,39 @@ class SettingsFrame(tk.Frame):
         else:
             self.controller.logout()
 
-    def _ensure_table(self) -> None:
-        conn = sqlite3.connect(DB_NAME)
-        cur = conn.cursor()
-        cur.execute("CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT)")
-        conn.commit()
-        conn.close()
-
     def _load(self) -> None:
-        conn = sqlite3.connect(DB_NAME)
-        cur = conn.cursor()
-        cur.execute("CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT)")
+        cur = db.get_conn().cursor()
         # school name
         cur.execute("SELECT value FROM settings WHERE key='report_school_name'")
         row = cur.fetchone()
-        conn.close()
         self.entry_school.delete(0, tk.END)
         if row and row[0]:
             self.entry_school.insert(0, row[0])
         # theme switch
-        conn = sqlite3.connect(DB_NAME)
-        cur = conn.cursor()
+        cur = db.get_conn().cursor()
         cur.execute("SELECT value FROM settings WHERE key='ui_theme'")
         r_theme = cur.fetchone()
-        conn.close()
         self._set_theme_var_safely(bool(r_theme and (str(r_theme[0]).lower() == 'dark')))
         # scale value
         try:
-            conn = sqlite3.connect(DB_NAME)
-            cur = conn.cursor()
+            cur = db.get_conn().cursor()
             cur.execute("SELECT value FROM settings WHERE key='ui_scale'")
             r_scale = cur.fetchone()
-            conn.close()
             if hasattr(self, 'var_scale'):
                 self.var_scale.set(str(r_scale[0]) if r_scale and r_scale[0] else '2.0')
         except Exception:
             pass
+        # storage profile
+        try:
+            self.var_profile.set(db.storage_profile())
+            self._show_profile_info()
+        except Exception:
+            pass
         # base font point size
         try:
-            conn = sqlite3.connect(DB_NAME)
-            cur = conn.cursor()
+            cur = db.get_conn().cursor()
             cur.execute("SELECT value FROM settings WHERE key='ui_base_pt'")
             r_base = cur.fetchone()
-            conn.close()
             val = str(r_base[0]) if r_base and r_base[0] else '12'
             if hasattr(self, 'var_base_pt'):
                 try:
@@ -529,15 +532,7 @@ class SettingsFrame(tk.Frame):
     def save(self) -> None:
         # Only save the school name
         name = (self.entry_school.get() or "").strip()
-        conn = sqlite3.connect(DB_NAME)
-        cur = conn.cursor()
-        cur.execute("CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT)")
-        cur.execute(
-            "INSERT INTO settings(key, value) VALUES(?, ?) ON CONFLICT(key) DO UPDATE SET value=excluded.value",
-            ('report_school_name', name),
-        )
-        conn.commit()
-        conn.close()
+        db.set_setting('report_school_name', name)
         self.status_var.set("Okul adı kaydedildi.")
 
     def on_theme_toggle(self) -> None:
@@ -545,15 +540,7 @@ class SettingsFrame(tk.Frame):
         theme_key = 'dark' if self.var_dark.get() else 'light'
         # Kaydet
         try:
-            conn = sqlite3.connect(DB_NAME)
-            cur = conn.cursor()
-            cur.execute("CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT)")
-            cur.execute(
-                "INSERT INTO settings(key, value) VALUES(?, ?) ON CONFLICT(key) DO UPDATE SET value=excluded.value",
-                ('ui_theme', theme_key),
-            )
-            conn.commit()
-            conn.close()
+            db.set_setting('ui_theme', theme_key)
         except Exception:
             pass
         # Anında uygula: önce controller kayıtlarını güncelle, sonra refresh_theme çağır
@@ -584,15 +571,7 @@ class SettingsFrame(tk.Frame):
         # Save theme and apply live; show info that full effect is on restart
         theme_key = 'dark' if self.var_dark.get() else 'light'
         try:
-            conn = sqlite3.connect(DB_NAME)
-            cur = conn.cursor()
-            cur.execute("CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT)")
-            cur.execute(
-                "INSERT INTO settings(key, value) VALUES(?, ?) ON CONFLICT(key) DO UPDATE SET value=excluded.value",
-                ('ui_theme', theme_key),
-            )
-            conn.commit()
-            conn.close()
+            db.set_setting('ui_theme', theme_key)
         except Exception:
             pass
         try:
@@ -636,15 +615,7 @@ class SettingsFrame(tk.Frame):
             scale_val = 1.5
         # Save to DB
         try:
-            conn = sqlite3.connect(DB_NAME)
-            cur = conn.cursor()
-            cur.execute("CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT)")
-            cur.execute(
-                "INSERT INTO settings(key, value) VALUES(?, ?) ON CONFLICT(key) DO UPDATE SET value=excluded.value",
-                ('ui_scale', str(scale_val)),
-            )
-            conn.commit()
-            conn.close()
+            db.set_setting('ui_scale', str(scale_val))
         except Exception:
             pass
         # Set scale in controller before applying theme
@@ -683,16 +654,8 @@ class SettingsFrame(tk.Frame):
             new_scale = float(getattr(self.controller, 'saved_scale', 1.5))
         # Persist both settings
         try:
-            conn = sqlite3.connect(DB_NAME)
-            cur = conn.cursor()
-            cur.execute("CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT)")
-            cur.execute(
-                "INSERT INTO settings(key, value) VALUES(?, ?) ON CONFLICT(key) DO UPDATE SET value=excluded.value",
-                ('ui_base_pt', str(new_base)),
-            )
             # Persisted scale remains unchanged here
-            conn.commit()
-            conn.close()
+            db.set_setting('ui_base_pt', str(new_base))
         except Exception:
             pass
         # Update controller memory and apply theme
@@ -717,18 +680,105 @@ class SettingsFrame(tk.Frame):
         self.status_var.set(f"Temel yazı: {new_base} pt, ölçek: {new_scale}x")
 
     # --- DB Utils ---
+    def _show_profile_info(self) -> None:
+        try:
+            mode = db.scalar("PRAGMA journal_mode", default="?")
+            sync = {0: 'OFF', 1: 'NORMAL', 2: 'FULL', 3: 'EXTRA'}.get(db.scalar("PRAGMA synchronous"), '?')
+            self.var_profile_info.set(f"Aktif: {db.storage_profile()} (journal={mode}, synchronous={sync})")
+        except Exception:
+            pass
+
+    def on_profile_change(self) -> None:
+        name = self.var_profile.get()
+        if name == 'fast' and not messagebox.askyesno(
+                "Depolama Profili",
+                "'fast' profili diske yazmayı beklemez; elektrik kesintisinde son işlemler kaybolabilir.\nDevam edilsin mi?"):
+            self.var_profile.set(db.storage_profile())
+            return
+        try:
+            db.set_storage_profile(name)
+            self.status_var.set(f"Depolama profili: {name}")
+        except Exception as e:
+            messagebox.showerror("Depolama Profili", str(e))
+            self.var_profile.set(db.storage_profile())
+        self._show_profile_info()
+
+    def run_profile_bench(self) -> None:
+        import bench
+        self.status_var.set("Hız testi çalışıyor...")
+
+        def _done(results):
+            self.status_var.set("Hız testi: " + ", ".join(f"{n} {cps:.0f} işlem/sn" for n, cps in results))
+
+        def _failed(e):
+            self.status_var.set(f"Hız testi başarısız: {e}")
+
+        # Scratch files only; never touches the live database
+        worker.call(self, bench.bench_profiles, on_done=_done, on_error=_failed, key="settings.bench")
+
+    def show_query_stats(self) -> None:
+        """Per-statement counters from querylog, slowest total first."""
+        dlg = tk.Toplevel(self)
+        dlg.title("Sorgu İstatistikleri")
+        dlg.transient(self)
+        container = tk.Frame(dlg, padx=14, pady=12)
+        container.pack(fill='both', expand=True)
+        info = tk.StringVar(value="")
+        tk.Label(container, textvariable=info, justify='left').pack(anchor='w', pady=(0, 6))
+        cols = ("tag", "count", "total", "avg", "max", "slow", "sql")
+        tree = ttk.Treeview(container, columns=cols, show='headings', height=16)
+        for c, lbl, w, anc in (
+            ("tag", "Kaynak", 220, 'w'),
+            ("count", "Adet", 70, 'e'),
+            ("total", "Toplam ms", 90, 'e'),
+            ("avg", "Ort. ms", 80, 'e'),
+            ("max", "En uzun ms", 90, 'e'),
+            ("slow", "Yavaş", 60, 'e'),
+            ("sql", "SQL", 480, 'w'),
+        ):
+            tree.heading(c, text=lbl)
+            tree.column(c, width=w, anchor=anc)
+        sb = ttk.Scrollbar(container, orient='vertical', command=tree.yview)
+        tree.configure(yscrollcommand=sb.set)
+        tree.pack(side='left', fill='both', expand=True)
+        sb.pack(side='left', fill='y')
+
+        def _fill() -> None:
+            stats = querylog.summary()
+            rows = [
+                (f"{s.tag}\x1f{s.sql}", (s.tag, s.count, f"{s.total_ms:.1f}", f"{s.avg_ms:.2f}", f"{s.max_ms:.1f}", s.slow, s.sql))
+                for s in stats
+            ]
+            sync_tree(tree, rows, key=lambda r: r[0], values=lambda r: r[1])
+            info.set(
+                f"Eşik: {querylog.SLOW_MS:g} ms — yavaş sorgular ve planları: "
+                f"{os.path.abspath(querylog.LOG_PATH)}"
+            )
+
+        def _reset() -> None:
+            querylog.reset()
+            _fill()
+
+        btns = tk.Frame(dlg, padx=14)
+        btns.pack(fill='x', pady=(0, 10))
+        ttk.Button(btns, text="Yenile", command=_fill).pack(side='left')
+        ttk.Button(btns, text="Sıfırla", command=_reset).pack(side='left', padx=6)
+        ttk.Button(btns, text="Kapat", command=dlg.destroy).pack(side='right')
+        _fill()
+
     def backup_db(self) -> None:
         try:
-            if not os.path.exists(DB_NAME):
+            db_file = db.db_path()
+            if not os.path.exists(db_file):
                 messagebox.showwarning("Yedekleme", "VeriTabanı bulunamadı.")
                 return
             # ensure backups folder
             bdir = os.path.join(os.getcwd(), 'backups')
             os.makedirs(bdir, exist_ok=True)
-            base, ext = os.path.splitext(os.path.basename(DB_NAME))
+            base, ext = os.path.splitext(os.path.basename(db_file))
             ts = datetime.now().strftime('%Y%m%d_%H%M%S')
             dst = os.path.join(bdir, f"{base}_{ts}{ext or ''}")
-            shutil.copy2(DB_NAME, dst)
+            db.backup_to(dst)
             messagebox.showinfo("Yedekleme", f"Yedek alındı:\n{dst}")
         except Exception as e:
             messagebox.showerror("Yedekleme Hatası", str(e))
@@ -738,21 +788,27 @@ class SettingsFrame(tk.Frame):
             return
         try:
             # Backup first
-            if os.path.exists(DB_NAME):
+            db_file = db.db_path()
+            if os.path.exists(db_file):
                 bdir = os.path.join(os.getcwd(), 'backups')
                 os.makedirs(bdir, exist_ok=True)
-                base, ext = os.path.splitext(os.path.basename(DB_NAME))
+                base, ext = os.path.splitext(os.path.basename(db_file))
                 ts = datetime.now().strftime('%Y%m%d_%H%M%S')
                 dst = os.path.join(bdir, f"{base}_backup_{ts}{ext or ''}")
-                shutil.copy2(DB_NAME, dst)
-                os.remove(DB_NAME)
-            # Re-initialize
+                db.backup_to(dst)
+                # Shared connections hold the file open; close them first
+                db.close_all()
+                for path in (db_file, db_file + '-wal', db_file + '-shm'):
+                    if os.path.exists(path):
+                        os.remove(path)
+            # Re-initialize: fresh file starts at user_version 0
             try:
-                main = importlib.import_module('main')
-                if hasattr(main, 'init_db'):
-                    main.init_db()
+                migrations.migrate()
             except Exception:
                 pass
+            catalog.invalidate()
+            # A new file: the change counters restarted, so flag everything
+            changes.notify(self, *changes.TABLES)
             messagebox.showinfo("Sıfırlama", "Veri Tabanı Sıfırlandı.")
             try:
                 # Show restart button after reset (centered row)
@@ -900,73 +956,63 @@ def _settings_show_clear_data_dialog(self):
 
 
 def _settings_clear_selected_data(self, *, users: bool, products: bool, sales: bool, ledger: bool, cashbook: bool, bankbook: bool) -> None:
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
     summary = []
     try:
-        # Single transaction for consistency; relax FK to avoid blockage
-        try:
-            cur.execute("PRAGMA foreign_keys=OFF")
-        except Exception:
-            pass
-        cur.execute("BEGIN IMMEDIATE")
-
-        # Users (keep admin)
-        if users:
-            # user_permissions is optional; ignore if missing
-            if _table_exists(cur, 'user_permissions'):
-                cur.execute("DELETE FROM user_permissions WHERE LOWER(username) <> 'admin'")
-            cur.execute("DELETE FROM users WHERE LOWER(username) <> 'admin'")
-            summary.append("Kullanicilar (admin haric)")
-
-        # Sales and items (and returns if present)
-        if sales:
-            # Delete children first, then parents
-            if _table_exists(cur, 'sale_items'):
-                cur.execute("DELETE FROM sale_items")
-            if _table_exists(cur, 'returns'):
-                cur.execute("DELETE FROM returns")
-            if _table_exists(cur, 'sales'):
-                cur.execute("DELETE FROM sales")
-            summary.append("Satislar")
-
-        # Products
-        if products:
-            if _table_exists(cur, 'products'):
-                cur.execute("DELETE FROM products")
-            summary.append("Urunler")
-
-        # Ledger / Cashbook / Bankbook
-        if ledger:
-            if _table_exists(cur, 'ledger'):
-                cur.execute("DELETE FROM ledger")
-            summary.append("Gelir/Gider")
-        if cashbook:
-            if _table_exists(cur, 'cashbook'):
-                cur.execute("DELETE FROM cashbook")
-            summary.append("Kasa Hareketleri")
-        if bankbook:
-            if _table_exists(cur, 'bankbook'):
-                cur.execute("DELETE FROM bankbook")
-            summary.append("Banka Hareketleri")
-
-        conn.commit()
-    except Exception as e:
+        # Relax FK to avoid blockage (must be set outside a transaction)
         try:
-            conn.rollback()
+            db.execute("PRAGMA foreign_keys=OFF")
         except Exception:
             pass
+        # Single transaction for consistency
+        with db.transaction("IMMEDIATE") as cur:
+            # Users (keep admin)
+            if users:
+                # user_permissions is optional; ignore if missing
+                if _table_exists(cur, 'user_permissions'):
+                    cur.execute("DELETE FROM user_permissions WHERE LOWER(username) <> 'admin'")
+                cur.execute("DELETE FROM users WHERE LOWER(username) <> 'admin'")
+                summary.append("Kullanicilar (admin haric)")
+
+            # Sales and items (and returns if present)
+            if sales:
+                # Delete children first, then parents
+                if _table_exists(cur, 'sale_items'):
+                    cur.execute("DELETE FROM sale_items")
+                if _table_exists(cur, 'returns'):
+                    cur.execute("DELETE FROM returns")
+                if _table_exists(cur, 'sales'):
+                    cur.execute("DELETE FROM sales")
+                summary.append("Satislar")
+
+            # Products
+            if products:
+                if _table_exists(cur, 'products'):
+                    cur.execute("DELETE FROM products")
+                summary.append("Urunler")
+
+            # Ledger / Cashbook / Bankbook
+            if ledger:
+                if _table_exists(cur, 'ledger'):
+                    cur.execute("DELETE FROM ledger")
+                summary.append("Gelir/Gider")
+            if cashbook:
+                if _table_exists(cur, 'cashbook'):
+                    balances.clear_book(cur, 'cashbook')
+                summary.append("Kasa Hareketleri")
+            if bankbook:
+                if _table_exists(cur, 'bankbook'):
+                    balances.clear_book(cur, 'bankbook')
+                summary.append("Banka Hareketleri")
+    except Exception as e:
         messagebox.showerror("Silme Hatasi", str(e))
         return
-    finally:
-        try:
-            conn.close()
-        except Exception:
-            pass
+    if products:
+        catalog.invalidate()
     if summary:
         messagebox.showinfo("Verileri Temizle", "Silinen: " + ", ".join(summary))
         try:
-            _refresh_related_views(self)
+            # Screens showing the cleared tables reload now or on next show
+            changes.notify(self)
         except Exception:
             pass
 
@@ -977,28 +1023,6 @@ def _table_exists(cur, name: str) -> bool:
     except Exception:
         return False
 
-def _refresh_related_views(self) -> None:
-    ctrl = getattr(self, 'controller', None)
-    if ctrl is None:
-        return
-    try:
-        frames = dict(getattr(ctrl, 'frames', {}))
-    except Exception:
-        frames = {}
-    for fr in frames.values():
-        try:
-            cname = type(fr).__name__
-        except Exception:
-            continue
-        # Refresh reports/products/ledger if loaded
-        if cname in ("ReportsFrame", "ProductsFrame", "LedgerFrame"):
-            try:
-                if hasattr(fr, 'refresh') and callable(getattr(fr, 'refresh')):
-                    fr.refresh()
-            except Exception:
-                pass
-        # SalesFrame is volatile and rebuilt on show; no action needed here
-
 # Bind as methods and override reset action
 try:
     SettingsFrame.show_clear_data_dialog = _settings_show_clear_data_dialog  # type: ignore[attr-defined]
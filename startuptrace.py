@@ -0,0 +1,171 @@
+"""Startup time trace: where the seconds before the login screen go.
+
+Off unless COOP_STARTUP_TRACE is set (1, or the output path) or the app is
+started with --trace-startup. While on, every module import that actually
+loads a module and every phase main.py wraps in span() (init_db,
+_load_ui_settings, apply_theme, show_frame(LoginFrame), ...) is timed,
+nested as it happened. finish() writes logs/startup_trace.txt:
+
+    startup;App.__init__;apply_theme 10234
+    startup;import reports;import rollup 812
+
+one "stack self-microseconds" line per span (the folded format that
+flamegraph.pl and speedscope read), followed by a readable tree with
+total and self milliseconds as comment lines.
+
+With --startup-exit (or COOP_STARTUP_EXIT=1) the app quits once the trace
+is written, so it can run headless (e.g. under xvfb-run) and be compared
+across versions. To see which phase regressed between two runs:
+
+    python startuptrace.py old_trace.txt new_trace.txt
+"""
+import builtins
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Dict, List, Optional, Tuple
+
+_env = os.environ.get("COOP_STARTUP_TRACE", "")
+ENABLED = "--trace-startup" in sys.argv or _env not in ("", "0")
+EXIT_AFTER = "--startup-exit" in sys.argv or os.environ.get("COOP_STARTUP_EXIT", "") not in ("", "0")
+LOG_PATH = _env if _env not in ("", "0", "1") else os.path.join("logs", "startup_trace.txt")
+
+_t0 = time.perf_counter()
+# Open spans: [name, start, seconds spent in children]
+_stack: List[list] = [["startup", _t0, 0.0]]
+# Path from the root -> [total seconds, self seconds], in the order spans began
+_spans: Dict[Tuple[str, ...], List[float]] = {}
+_finished = False
+_real_import = builtins.__import__
+# Only the Tk thread is traced; worker threads import on their own stacks
+_main_thread = threading.get_ident()
+
+
+def _enter(name: str) -> Tuple[str, ...]:
+    _stack.append([name, time.perf_counter(), 0.0])
+    path = tuple(s[0] for s in _stack)
+    _spans.setdefault(path, [0.0, 0.0])
+    return path
+
+
+def _leave(path: Tuple[str, ...]) -> None:
+    _name, started, children = _stack.pop()
+    took = time.perf_counter() - started
+    _stack[-1][2] += took
+    entry = _spans[path]
+    entry[0] += took
+    entry[1] += max(took - children, 0.0)
+
+
+@contextmanager
+def _span(name: str):
+    path = _enter(name)
+    try:
+        yield
+    finally:
+        _leave(path)
+
+
+def span(name: str):
+    """Context manager timing a startup phase; a no-op when tracing is off."""
+    if not ENABLED or _finished or threading.get_ident() != _main_thread:
+        return nullcontext()
+    return _span(name)
+
+
+def _import(name, globals=None, locals=None, fromlist=(), level=0):
+    # Only imports that load something are timed; repeats are a dict lookup
+    if _finished or level or name in sys.modules or threading.get_ident() != _main_thread:
+        return _real_import(name, globals, locals, fromlist, level)
+    path = _enter("import " + name)
+    try:
+        return _real_import(name, globals, locals, fromlist, level)
+    finally:
+        _leave(path)
+
+
+def report() -> str:
+    """Folded stacks, then the same spans as an indented tree."""
+    total = time.perf_counter() - _t0
+    own = max(total - _stack[0][2], 0.0)
+    lines = [f"startup {round(own * 1e6)}"]
+    lines += [f"{';'.join(p)} {round(t[1] * 1e6)}" for p, t in _spans.items()]
+    lines.append("")
+    lines.append(f"# {'total ms':>9} {'self ms':>9}  span")
+    lines.append(f"# {total * 1000:9.1f} {own * 1000:9.1f}  startup")
+    # Depth-first: each span followed by its children, in the order they ran
+    def walk(parent: Tuple[str, ...]) -> None:
+        for p, t in _spans.items():
+            if p[:-1] == parent:
+                lines.append(f"# {t[0] * 1000:9.1f} {t[1] * 1000:9.1f}  {'  ' * (len(p) - 1)}{p[-1]}")
+                walk(p)
+    walk(("startup",))
+    return "\n".join(lines) + "\n"
+
+
+def finish(app=None, path: Optional[str] = None) -> Optional[str]:
+    """Stop tracing and write the report; returns its path. With an app,
+    its pending idle work (the first paint) is included first, and the app
+    is closed afterwards if EXIT_AFTER is set."""
+    global _finished
+    if not ENABLED or _finished:
+        return None
+    if app is not None:
+        with span("first paint"):
+            try:
+                app.update_idletasks()
+            except Exception:
+                pass
+    _finished = True
+    builtins.__import__ = _real_import
+    path = path or LOG_PATH
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(report())
+    except Exception:
+        path = None
+    if app is not None and EXIT_AFTER:
+        app.after(0, app.destroy)
+    return path
+
+
+def load(path: str) -> Dict[str, float]:
+    """Total milliseconds per span path (';'-joined) from a written trace."""
+    totals: Dict[str, float] = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            stack, _, us = line.rstrip("\n").rpartition(" ")
+            if not stack or stack.startswith("#"):
+                continue
+            # Self time counts toward the span and every span above it
+            parts = stack.split(";")
+            for i in range(1, len(parts) + 1):
+                key = ";".join(parts[:i])
+                totals[key] = totals.get(key, 0.0) + int(us) / 1000.0
+    return totals
+
+
+def compare(old: Dict[str, float], new: Dict[str, float], min_delta_ms: float = 1.0) -> str:
+    """Spans whose total changed by at least min_delta_ms, biggest change first."""
+    rows = []
+    for key in set(old) | set(new):
+        a, b = old.get(key, 0.0), new.get(key, 0.0)
+        if abs(b - a) >= min_delta_ms:
+            rows.append((b - a, key, a, b))
+    rows.sort(key=lambda r: -abs(r[0]))
+    lines = [f"{'old ms':>9} {'new ms':>9} {'delta':>9}  span"]
+    lines += [f"{a:9.1f} {b:9.1f} {d:+9.1f}  {key}" for d, key, a, b in rows]
+    return "\n".join(lines)
+
+
+if ENABLED:
+    builtins.__import__ = _import
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("usage: python startuptrace.py OLD_TRACE NEW_TRACE")
+        sys.exit(2)
+    print(compare(load(sys.argv[1]), load(sys.argv[2])))
@@ -1494,3 +1494,45 @@ def apply_button_margins(container: tk.Misc, pady: int = 12, padx: int = 12) ->
             except Exception:
                 pass
         apply_button_margins(w, pady=pady, padx=padx)
+
+
+def sync_tree(tree, rows, key=lambda r: r[0], values=tuple) -> int:
+    """Make the top-level items of a ttk.Treeview match `rows`, in order,
+    issuing only the inserts, updates, moves and deletes that differ.
+
+    Items are identified by str(key(row)), so selection, focus and scroll
+    position survive a refresh. Values last written by sync_tree are
+    remembered on the widget, which makes "unchanged" a dict lookup
+    instead of a Tcl round trip. Returns the number of Tk calls made.
+    """
+    cache = tree.__dict__.setdefault('_sync_values', {})
+    new = [(str(key(r)), tuple(values(r))) for r in rows]
+    want = {iid for iid, _v in new}
+    current = list(tree.get_children())
+    ops = 0
+    gone = [iid for iid in current if iid not in want]
+    if gone:
+        tree.delete(*gone)
+        ops += 1
+        for iid in gone:
+            cache.pop(iid, None)
+        current = [iid for iid in current if iid in want]
+    present = set(current)
+    for idx, (iid, vals) in enumerate(new):
+        if iid not in present:
+            tree.insert('', idx if idx < len(current) else 'end', iid=iid, values=vals)
+            current.insert(idx, iid)
+            present.add(iid)
+            cache[iid] = vals
+            ops += 1
+            continue
+        if current[idx] != iid:
+            tree.move(iid, '', idx)
+            current.remove(iid)
+            current.insert(idx, iid)
+            ops += 1
+        if cache.get(iid) != vals:
+            tree.item(iid, values=vals)
+            cache[iid] = vals
+            ops += 1
+    return ops
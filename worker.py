@@ -0,0 +1,205 @@
+"""Background SQLite executor for the Tk UI.
+
+Jobs run on worker threads, each with its own connection from db.py: a
+small pool for reads and a single writer thread, so commits are serialized
+and never wait behind the Tk event loop. Results are handed back to the Tk
+thread by a pump driven by after(), so on_done/on_error callbacks may touch
+widgets freely.
+
+    worker.call(self, load_rows, day, on_done=self._render_rows, key="reports.daily")
+
+When the same key is submitted again before the previous job finishes,
+only the newest result is delivered (a fast double refresh never paints
+stale data over fresh data).
+"""
+import queue
+import sys
+import threading
+import traceback
+from typing import Any, Callable, Dict, Optional
+
+import db
+import querylog
+
+POLL_MS = 20
+
+querylog.skip_file(__file__)
+
+
+class Job:
+    """Handle for a submitted job (a minimal future)."""
+
+    __slots__ = ("fn", "args", "kwargs", "on_done", "on_error", "widget", "key", "seq",
+                 "tag", "result", "error", "done", "cancelled", "_event")
+
+    def __init__(self, fn, args, kwargs, on_done, on_error, widget, key, seq) -> None:
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.on_done = on_done
+        self.on_error = on_error
+        self.widget = widget
+        self.key = key
+        self.seq = seq
+        # Frame method that submitted the job, for querylog
+        self.tag = querylog.caller()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.done = False
+        self.cancelled = False
+        self._event = threading.Event()
+
+    def cancel(self) -> None:
+        """Drop the callbacks; the job itself may still run."""
+        self.cancelled = True
+
+    def wait(self, timeout: Optional[float] = None) -> Any:
+        """Block until finished (for tests/CLI; never call on the Tk thread)."""
+        self._event.wait(timeout)
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class DbWorker:
+    def __init__(self, root=None, readers: int = 2, poll_ms: int = POLL_MS) -> None:
+        self.root = root
+        self.poll_ms = poll_ms
+        self._read_q: "queue.Queue[Optional[Job]]" = queue.Queue()
+        self._write_q: "queue.Queue[Optional[Job]]" = queue.Queue()
+        self._done_q: "queue.SimpleQueue[Job]" = queue.SimpleQueue()
+        self._latest: Dict[str, int] = {}
+        self._seq = 0
+        self._seq_lock = threading.Lock()
+        self._threads = []
+        self._closed = False
+        for i in range(max(1, readers)):
+            self._start(self._read_q, f"db-read-{i}")
+        self._start(self._write_q, "db-write")
+        self._pump_id = None
+        if root is not None:
+            self._pump_id = root.after(self.poll_ms, self._pump)
+
+    def _start(self, q, name: str) -> None:
+        t = threading.Thread(target=self._run, args=(q,), name=name, daemon=True)
+        t.start()
+        self._threads.append((t, q))
+
+    def _run(self, q) -> None:
+        try:
+            while True:
+                job = q.get()
+                if job is None:
+                    break
+                querylog.set_context(job.tag)
+                try:
+                    job.result = job.fn(*job.args, **job.kwargs)
+                except BaseException as e:  # delivered to on_error
+                    job.error = e
+                finally:
+                    querylog.set_context(None)
+                job.done = True
+                job._event.set()
+                self._done_q.put(job)
+        finally:
+            db.close()
+
+    def submit(self, fn: Callable, *args, on_done: Optional[Callable] = None,
+               on_error: Optional[Callable] = None, widget=None, key: Optional[str] = None,
+               write: bool = False, **kwargs) -> Job:
+        """Run fn(*args, **kwargs) on a worker thread. Writes go to the single
+        writer thread. Callbacks run on the Tk thread, and only while
+        `widget` (if given) still exists."""
+        if self._closed:
+            raise RuntimeError("DbWorker is shut down")
+        with self._seq_lock:
+            self._seq += 1
+            seq = self._seq
+            if key is not None:
+                self._latest[key] = seq
+        job = Job(fn, args, kwargs, on_done, on_error, widget, key, seq)
+        (self._write_q if write else self._read_q).put(job)
+        return job
+
+    def _deliver(self, job: Job) -> None:
+        if job.cancelled:
+            return
+        if job.key is not None and self._latest.get(job.key) != job.seq:
+            return
+        w = job.widget
+        if w is not None:
+            try:
+                if not w.winfo_exists():
+                    return
+            except Exception:
+                return
+        try:
+            if job.error is not None:
+                if job.on_error is not None:
+                    job.on_error(job.error)
+                else:
+                    traceback.print_exception(type(job.error), job.error, job.error.__traceback__, file=sys.stderr)
+            elif job.on_done is not None:
+                job.on_done(job.result)
+        except Exception:
+            traceback.print_exc()
+
+    def _pump(self) -> None:
+        """Deliver finished jobs on the Tk thread, then re-arm."""
+        while True:
+            try:
+                job = self._done_q.get_nowait()
+            except queue.Empty:
+                break
+            self._deliver(job)
+        if not self._closed and self.root is not None:
+            try:
+                self._pump_id = self.root.after(self.poll_ms, self._pump)
+            except Exception:
+                self._pump_id = None
+
+    def process_pending(self) -> None:
+        """Deliver finished jobs now (headless use without a Tk root)."""
+        while True:
+            try:
+                job = self._done_q.get_nowait()
+            except queue.Empty:
+                break
+            self._deliver(job)
+
+    def shutdown(self, timeout: float = 5.0) -> None:
+        """Stop accepting jobs and let queued writes finish."""
+        if self._closed:
+            return
+        self._closed = True
+        if self._pump_id is not None and self.root is not None:
+            try:
+                self.root.after_cancel(self._pump_id)
+            except Exception:
+                pass
+        for _t, q in self._threads:
+            q.put(None)
+        for t, q in self._threads:
+            if q is self._write_q:
+                t.join(timeout)
+
+
+def call(frame, fn: Callable, *args, on_done: Optional[Callable] = None,
+         on_error: Optional[Callable] = None, key: Optional[str] = None,
+         write: bool = False, **kwargs) -> Optional[Job]:
+    """Submit fn through frame.controller.db_worker. Frames created without
+    an App (or after shutdown) run fn inline with the same callbacks."""
+    w = getattr(getattr(frame, "controller", None), "db_worker", None)
+    if w is not None and not w._closed:
+        return w.submit(fn, *args, on_done=on_done, on_error=on_error, widget=frame,
+                        key=key, write=write, **kwargs)
+    try:
+        result = fn(*args, **kwargs)
+    except Exception as e:
+        if on_error is None:
+            raise
+        on_error(e)
+        return None
+    if on_done is not None:
+        on_done(result)
+    return None